@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Accumulate (field_name, timestamp, value) rows read from a database
+into per-field columns, for connectors' read_columns() methods.
+
+Timestamps are kept in an array('d'), as are values as long as every value
+seen for the field is numeric (ints and bools are stored as floats). Once
+a non-numeric value (e.g. a string) turns up, that field's values are kept
+in a plain list instead. If NumPy is installed, result() converts the
+arrays to NumPy arrays without copying them.
+
+    builder = ColumnBuilder()
+    for field_name, timestamp, value in rows:
+        builder.add(field_name, timestamp, value)
+    columns = builder.result()
+    timestamps, values = columns['S330Latitude']
+"""
+from array import array
+
+try:
+    import numpy
+    NUMPY_ENABLED = True
+except ImportError:
+    NUMPY_ENABLED = False
+
+
+################################################################################
+class ColumnBuilder:
+    """Build per-field (timestamps, values) columns from rows."""
+
+    ############################
+    def __init__(self):
+        # Map from field name to [timestamps, values]
+        self.columns = {}
+
+    ############################
+    def add(self, field_name, timestamp, value):
+        """Append a value to field_name's columns. None values are skipped."""
+        if value is None:
+            return
+        column = self.columns.get(field_name)
+        if column is None:
+            column = self.columns[field_name] = [array('d'), array('d')]
+        timestamps, values = column
+
+        if type(values) is array:
+            if type(value) in (float, int, bool):
+                value = float(value)
+            else:
+                # First non-numeric value - switch to a list
+                values = column[1] = values.tolist()
+        timestamps.append(timestamp)
+        values.append(value)
+
+    ############################
+    def result(self):
+        """Return a dict mapping each field name to a (timestamps, values)
+        pair, as NumPy arrays if NumPy is available."""
+        if not NUMPY_ENABLED:
+            return {field: tuple(column) for field, column in self.columns.items()}
+
+        result = {}
+        for field, (timestamps, values) in self.columns.items():
+            if type(values) is array:
+                values = numpy.frombuffer(values, dtype=numpy.float64)
+            result[field] = (numpy.frombuffer(timestamps, dtype=numpy.float64), values)
+        return result
@@ -28,13 +28,18 @@ TODO: Allow wildcarding field selection, so client can specify 'S330*,Knud*'
 """
 import logging
 import sys
-import json
+
+from collections import OrderedDict
 
 sys.path.append('.')
+from database.record_batcher import RecordBatcher  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 
 try:
     import pymongo
+    from bson import ObjectId
+    from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+    from pymongo.write_concern import WriteConcern
     MONGO_ENABLED = True
 except ImportError:
     MONGO_ENABLED = False
@@ -48,9 +53,32 @@ class MongoConnector:
     FIELD_TABLE = 'fields'
     SOURCE_TABLE = 'source'
 
+    # Errors that mean the database is unreachable, rather than that it
+    # won't take the records we're trying to write; worth retrying later.
+    # (ConnectionFailure covers AutoReconnect and network timeouts.)
+    RETRYABLE_ERRORS = (ConnectionFailure,) if MONGO_ENABLED else ()
+
+    # Error code MongoDB gives when a document's _id is already taken
+    DUPLICATE_KEY = 11000
+
+    # Most records whose documents we'll remember while they're unwritten
+    MAX_UNWRITTEN = 10000
+
     def __init__(self, database, host, user, password,
-                 tail=False, save_source=True):
-        """Interface to MongoConnector, to be imported by, e.g. DatabaseWriter."""
+                 tail=False, save_source=True, batch_size=1, batch_interval=0,
+                 write_concern=None):
+        """Interface to MongoConnector, to be imported by, e.g. DatabaseWriter.
+
+        If batch_size is greater than one, write_record() buffers records and
+        writes up to batch_size of them at a time with unordered bulk
+        inserts. If batch_interval is non-zero, a timer writes a partial
+        batch once its oldest record has waited that many seconds (see
+        database/record_batcher.py). Call flush() (or close()) to write
+        whatever is buffered.
+
+        write_concern, if not None, is a dict of pymongo WriteConcern
+        arguments to use for writes, e.g. {'w': 1, 'j': False}.
+        """
         if not MONGO_ENABLED:
             logging.warning('MongoClient not found, so MongoDB functionality not available.')
             return
@@ -60,6 +88,23 @@ class MongoConnector:
 
         self.save_source = save_source
 
+        # Collections to write to, with the requested write concern
+        write_options = {}
+        if write_concern is not None:
+            write_options['write_concern'] = WriteConcern(**write_concern)
+        self.source_collection = self.db[self.SOURCE_TABLE].with_options(**write_options)
+        self.data_collection = self.db[self.DATA_TABLE].with_options(**write_options)
+
+        # Records waiting to be written
+        self.batcher = RecordBatcher(self.write_records, batch_size, batch_interval,
+                                     errors=(PyMongoError,),
+                                     retryable=self.RETRYABLE_ERRORS)
+
+        # Documents built for records that haven't been written yet, by
+        # id(record), so that if they have to be written again they keep
+        # the same _ids (see write_records()).
+        self.unwritten = OrderedDict()
+
         # What's the next id we're supposed to read? Or if we've been
         # reading by timestamp, what's the last timestamp we've seen?
         self.next_id = 0
@@ -74,7 +119,11 @@ class MongoConnector:
 
     ############################
     def write_record(self, record):
-        """Write record to table."""
+        """Write record to table. If batch_size is greater than one, buffer
+        the record and write it when the batch fills, or when batch_interval
+        seconds (if non-zero) have passed since the oldest buffered record
+        arrived. Records the database won't accept are logged and dropped;
+        if it can't be reached, raises one of RETRYABLE_ERRORS."""
 
         # First, check that we've got something we can work with
         if not record:
@@ -85,26 +134,92 @@ class MongoConnector:
                           'Type: %s', type(record))
             return
 
-        # If we're saving source records, we have to do a little
-        # legerdemain: after we've saved the record, we need to retrieve
-        # the id of the record we've just saved so that we can attach it
-        # to the data values we're about to save.
-        if self.save_source:
-            logging.debug('Inserting source into table')
-            logging.debug(record)
+        self.batcher.add(record)
+
+    ############################
+    def flush(self):
+        """Write any buffered records to the database. If it can't be
+        reached, raise one of RETRYABLE_ERRORS, leaving the records buffered
+        to be retried; use self.batcher.take_pending() to collect them
+        instead."""
+        self.batcher.flush()
 
-            result = self.db[self.SOURCE_TABLE].insert_one(json.loads(record.as_json()))
+    ############################
+    def write_records(self, records):
+        """Write a list of DASRecords with (at most) two unordered bulk
+        inserts, raising PyMongoError on failure.
+
+        An unordered insert that fails may still have inserted some of its
+        documents, so every document gets its _id from us, and a record
+        keeps its documents (and their _ids) until it has been written.
+        When a batch is tried again, documents already inserted are refused
+        as duplicates rather than inserted twice, and that counts as
+        success."""
+        source_docs = []
+        data_docs = []
+        for record in records:
+            source_doc, field_docs = self._documents(record)
+            if source_doc is not None:
+                source_docs.append(source_doc)
+            data_docs.extend(field_docs)
+
+        if source_docs:
+            logging.debug('Inserting %d sources into table', len(source_docs))
+            self._insert(self.source_collection, source_docs)
+        if data_docs:
+            logging.debug('Inserting %d values into table', len(data_docs))
+            self._insert(self.data_collection, data_docs)
+
+        for record in records:
+            self.unwritten.pop(id(record), None)
 
-            # Get the id of the saved source record. Note: documentation
-            # *claims* that this is kept on a per-client basis, so it's safe
-            # even if another client does an intervening write.
-            source_id = result.inserted_id
-        else:
-            source_id = None
+    ############################
+    def _documents(self, record):
+        """Return the source document (or None, if we're not saving
+        sources) and the list of data documents for a record, reusing those
+        we built last time if it hasn't been written yet."""
+        # The entry holds on to its record, so its id can't be reused
+        entry = self.unwritten.get(id(record))
+        if entry is not None and entry[0] is record:
+            return entry[1], entry[2]
+
+        # If we're saving source records, we give each one its id
+        # ourselves, so that we can attach it to the data values we're
+        # about to save without waiting for the source to be inserted.
+        source_doc = source_id = None
+        if self.save_source:
+            source_doc = record.as_dict()
+            source_id = source_doc['_id'] = ObjectId()
 
+        data_docs = []
         if not record.fields:
             logging.info('DASRecord has no parsed fields. Skipping record.')
-            return
+        else:
+            data_docs = self._field_documents(record, source_id)
+            for data_doc in data_docs:
+                data_doc['_id'] = ObjectId()
+
+        self.unwritten[id(record)] = (record, source_doc, data_docs)
+        if len(self.unwritten) > self.MAX_UNWRITTEN:
+            self.unwritten.popitem(last=False)  # given up on, most likely
+        return source_doc, data_docs
+
+    ############################
+    def _insert(self, collection, docs):
+        """Insert documents, ignoring any that were inserted by an earlier
+        try, and raising PyMongoError if any others fail."""
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            details = e.details or {}
+            failures = [error for error in details.get('writeErrors', [])
+                        if error.get('code') != self.DUPLICATE_KEY]
+            if failures or details.get('writeConcernErrors'):
+                raise
+
+    ############################
+    def _field_documents(self, record, source_id=None):
+        """Return one document for each field-value pair in record."""
 
         # Write one row for each field-value pair. Columns are:
         #     timestamp
@@ -146,34 +261,17 @@ class MongoConnector:
             if source_id:
                 data_record['source_id'] = source_id
 
-            # Join entries into a string, append to list of other values
-            # we've already saved.
             values.append(data_record)
 
-        # Build the SQL query
-        # fields = ['timestamp',
-        #           'field_name',
-        #           'int_value',
-        #           'float_value',
-        #           'str_value',
-        #           'bool_value']
-        # if source_id:
-        #   fields.append('source')
-
         if not values:
             logging.warning('No values found in record %s', str(record))
-
-        # write_cmd = 'insert into `%s` (%s) values %s' % \
-        #               (self.DATA_TABLE, ','.join(fields), ','.join(values))
-        logging.debug('Inserting record into table')
-        result = self.db[self.DATA_TABLE].insert_many(values)
-
-        # self.exec_sql_command(write_cmd)
+        return values
 
     ############################
     def read(self, field_list=None, start=None, num_records=1):
         """Read the next record from table. If start is specified, reset read
         to start at that position."""
+        self.flush()
 
         query = {}
         projection = {'_id': 0}
@@ -223,6 +321,7 @@ class MongoConnector:
         """Read the next records from table based on timestamps. If start_time
         is None, use the timestamp of the last read record. If stop_time is None,
         read all records since then."""
+        self.flush()
 
         query = {}
 
@@ -314,6 +413,8 @@ class MongoConnector:
 
     ############################
     def close(self):
-        """Close connection."""
-        # self.connection.close()
-        self.client.close()
+        """Write any buffered records and close connection."""
+        try:
+            self.flush()
+        finally:
+            self.client.close()
@@ -31,6 +31,8 @@ import sys
 
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(realpath(__file__))))
+from database.columns import ColumnBuilder  # noqa: E402
+from database.record_batcher import RecordBatcher  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 
 try:
@@ -48,9 +50,22 @@ class MySQLConnector:
     FIELD_TABLE = 'fields'
     SOURCE_TABLE = 'source'
 
+    # Errors that mean the database is unreachable, rather than that it
+    # won't take the records we're trying to write; worth retrying later.
+    RETRYABLE_ERRORS = (mysql.connector.errors.OperationalError,
+                        mysql.connector.errors.InterfaceError) if MYSQL_ENABLED else ()
+
     def __init__(self, database, host, user, password,
-                 tail=False, save_source=True):
-        """Interface to MySQLConnector, to be imported by, e.g. DatabaseWriter."""
+                 tail=False, save_source=True, batch_size=1, batch_interval=0):
+        """Interface to MySQLConnector, to be imported by, e.g. DatabaseWriter.
+
+        If batch_size is greater than one, write_record() buffers records and
+        writes up to batch_size of them at a time in a single transaction.
+        If batch_interval is non-zero, a timer writes a partial batch once
+        its oldest record has waited that many seconds (see
+        database/record_batcher.py). Call flush() (or close()) to write
+        whatever is buffered.
+        """
         if not MYSQL_ENABLED:
             logging.warning('MySQL not found, so MySQL functionality not available.')
             return
@@ -60,6 +75,11 @@ class MySQLConnector:
                                                   auth_plugin='mysql_native_password')
         self.save_source = save_source
 
+        # Records waiting to be written
+        self.batcher = RecordBatcher(self.write_records, batch_size, batch_interval,
+                                     errors=(mysql.connector.errors.Error,),
+                                     retryable=self.RETRYABLE_ERRORS)
+
         # What's the next id we're supposed to read? Or if we've been
         # reading by timestamp, what's the last timestamp we've seen?
         self.next_id = 1
@@ -122,7 +142,11 @@ class MySQLConnector:
 
     ############################
     def write_record(self, record):
-        """Write record to table."""
+        """Write record to table. If batch_size is greater than one, buffer
+        the record and write it when the batch fills, or when batch_interval
+        seconds (if non-zero) have passed since the oldest buffered record
+        arrived. Records the database won't accept are logged and dropped;
+        if it can't be reached, raises one of RETRYABLE_ERRORS."""
 
         # First, check that we've got something we can work with
         if not record:
@@ -132,55 +156,89 @@ class MySQLConnector:
                           'Type: %s', type(record))
             return
 
-        # If we're saving source records, we have to do a little
-        # legerdemain: after we've saved the record, we need to retrieve
-        # the id of the record we've just saved so that we can attach it
-        # to the data values we're about to save.
-        if self.save_source:
-            write_cmd = 'insert into `%s` (record) values (\'%s\')' % \
-                        (self.SOURCE_TABLE, record.as_json())
-            logging.debug('Inserting source into table with command: %s', write_cmd)
-            self.exec_sql_command(write_cmd)
-
-            # Get the id of the saved source record. Note: documentation
-            # *claims* that this is kept on a per-client basis, so it's safe
-            # even if another client does an intervening write.
-            query = 'select last_insert_id()'
-            cursor = self.connection.cursor()
-            cursor.execute(query)
-            # source_field = ', source'
-            source_id = next(cursor)[0]
-        else:
-            # source_field = ''
-            source_id = None
+        self.batcher.add(record)
 
-        if not record.fields:
-            logging.info('DASRecord has no parsed fields. Skipping record.')
-            return
+    ############################
+    def flush(self):
+        """Write any buffered records to the database. If it can't be
+        reached, raise one of RETRYABLE_ERRORS, leaving the records buffered
+        to be retried; use self.batcher.take_pending() to collect them
+        instead."""
+        self.batcher.flush()
 
-        # Write one row for each field-value pair. Columns are:
-        #     timestamp
-        #     field_name
-        #     int_value   \
-        #     float_value, \ Only one of these fields will be non-NULL,
-        #     str_value    / depending on the type of the value.
-        #     bool_value  /
+    ############################
+    def write_records(self, records):
+        """Write a list of DASRecords in a single transaction, raising
+        mysql.connector.errors.Error (after rolling back) on failure."""
+        self.connection.start_transaction()
+        cursor = self.connection.cursor()
+        try:
+            rows = []
+            for record in records:
+                # If we're saving source records, we need the id of each
+                # one we save so that we can attach it to its data values.
+                # The driver hands it back with the insert's response, so
+                # there's no need for a separate 'select last_insert_id()'.
+                source_id = None
+                if self.save_source:
+                    cursor.execute('insert into `%s` (record) values (%%s)'
+                                   % self.SOURCE_TABLE, (record.as_json(),))
+                    source_id = cursor.lastrowid
+
+                if not record.fields:
+                    logging.info('DASRecord has no parsed fields. Skipping record.')
+                    continue
+                rows.extend(self._field_rows(record, source_id))
+
+            # Build the SQL query. The driver rewrites executemany() of a
+            # simple insert into a single multi-row insert.
+            if rows:
+                fields = ['timestamp',
+                          'field_name',
+                          'int_value',
+                          'float_value',
+                          'str_value',
+                          'bool_value']
+                if self.save_source:
+                    fields.append('source')
+                write_cmd = 'insert into `%s` (%s) values (%s)' % \
+                    (self.DATA_TABLE, ','.join(fields), ','.join(['%s'] * len(fields)))
+                logging.debug('Inserting %d rows into table with command: %s',
+                              len(rows), write_cmd)
+                cursor.executemany(write_cmd, rows)
+            self.connection.commit()
+        except mysql.connector.errors.Error:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
 
+    ############################
+    def _field_rows(self, record, source_id=None):
+        """Return one row of column values for each field-value pair in record.
+        Columns are:
+            timestamp
+            field_name
+            int_value   \\
+            float_value, \\ Only one of these fields will be non-NULL,
+            str_value    / depending on the type of the value.
+            bool_value  /
+            source       (only if we're saving source records)
+        """
         timestamp = record.timestamp
-        values = []
+        rows = []
         for field_name, value in record.fields.items():
-            value_array = ['%f' % timestamp, '"%s"' % field_name,
-                           'NULL', 'NULL', 'NULL', 'NULL']
+            row = [timestamp, field_name, None, None, None, None]
             if type(value) is int:
-                value_array[2] = '%d' % value
+                row[2] = value
             elif type(value) is float:
-                value_array[3] = '%f' % value
+                row[3] = value
             elif type(value) is str:
-                value_array[4] = '"%s"' % value
+                row[4] = value
             elif type(value) is bool:
-                value_array[5] = '%d' % ('1' if value else '0')
+                row[5] = 1 if value else 0
             elif value is None:
-                value_array[4] = '""'
+                row[4] = ''
             else:
                 logging.error('Unknown record value type (%s) for %s: %s',
                               type(value), field_name, value)
@@ -188,36 +246,19 @@ class MySQLConnector:
 
             # If we've saved this field's source record, append source's
             # foreign key to row so we can look it up.
-            if source_id:
-                value_array.append('%d' % source_id)
-
-            # Join entries into a string, append to list of other values
-            # we've already saved.
-            value_str = '(%s)' % ','.join(value_array)
-            values.append(value_str)
-
-        # Build the SQL query
-        fields = ['timestamp',
-                  'field_name',
-                  'int_value',
-                  'float_value',
-                  'str_value',
-                  'bool_value']
-        if source_id:
-            fields.append('source')
-
-        if not values:
-            logging.warning('No values found in record %s', str(record))
+            if self.save_source:
+                row.append(source_id)
+            rows.append(tuple(row))
 
-        write_cmd = 'insert into `%s` (%s) values %s' % \
-            (self.DATA_TABLE, ','.join(fields), ','.join(values))
-        logging.debug('Inserting record into table with command: %s', write_cmd)
-        self.exec_sql_command(write_cmd)
+        if not rows:
+            logging.warning('No values found in record %s', str(record))
+        return rows
 
     ############################
     def read(self, field_list=None, start=None, num_records=1):
         """Read the next record from table. If start is specified, reset read
         to start at that position."""
+        self.flush()
 
         if start is None:
             start = self.next_id
@@ -242,6 +283,7 @@ class MySQLConnector:
         """Read the next records from table based on timestamps. If start_time
         is None, use the timestamp of the last read record. If stop_time is None,
         read all records since then."""
+        self.flush()
 
         if start_time is None:
             condition = 'timestamp > %f' % self.last_timestamp
@@ -262,6 +304,81 @@ class MySQLConnector:
         logging.debug('read query: %s', query)
         return self._process_query(query)
 
+    ############################
+    def read_columns(self, field_list=None, start_time=None, stop_time=None,
+                     bucket=None, chunk_size=10000):
+        """Read values with timestamps in [start_time, stop_time) and return
+        them as a dict mapping each field name to a (timestamps, values)
+        pair of columns, as NumPy arrays if NumPy is installed (see
+        database/columns.py). Rows are fetched chunk_size at a time.
+
+        If bucket is a number of seconds, the database downsamples each
+        field into time buckets of that width, returning the average of
+        each bucket's values, timestamped with the start of the bucket.
+        Only numeric values are returned when downsampling.
+        """
+        self.flush()
+
+        conditions = []
+        params = []
+        if start_time is not None:
+            conditions.append('timestamp >= %s')
+            params.append(start_time)
+        if stop_time is not None:
+            conditions.append('timestamp < %s')
+            params.append(stop_time)
+
+        # If they haven't given us any fields, retrieve everything
+        if field_list:
+            if isinstance(field_list, str):
+                field_list = field_list.split(',')
+            conditions.append('field_name in (%s)' % ','.join(['%s'] * len(field_list)))
+            params.extend(field_list)
+        where = ' where ' + ' and '.join(conditions) if conditions else ''
+
+        if bucket:
+            query = ('select field_name, floor(timestamp / %s) * %s as bucket, '
+                     'avg(coalesce(float_value, int_value, bool_value)) as value '
+                     'from `' + self.DATA_TABLE + '`' + where +
+                     ' group by field_name, bucket order by bucket')
+            params = [bucket, bucket] + params
+        else:
+            query = ('select field_name, timestamp, int_value, float_value, '
+                     'str_value, bool_value from `' + self.DATA_TABLE + '`' + where +
+                     ' order by timestamp')
+        logging.debug('read_columns query: %s', query)
+
+        builder = ColumnBuilder()
+        # The default (unbuffered) cursor streams rows from the server
+        # as we fetch them, rather than reading the whole result set first.
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if bucket:
+                    for field_name, timestamp, value in rows:
+                        builder.add(field_name, timestamp, value)
+                    continue
+                for (field_name, timestamp,
+                     int_value, float_value, str_value, bool_value) in rows:
+                    if int_value is not None:
+                        val = int_value
+                    elif float_value is not None:
+                        val = float_value
+                    elif str_value is not None:
+                        val = str_value
+                    elif bool_value is not None:
+                        val = bool(bool_value)
+                    else:
+                        continue
+                    builder.add(field_name, timestamp, val)
+        finally:
+            cursor.close()
+        return builder.result()
+
     ############################
     def seek(self, offset=0, origin='current'):
         """Behavior is intended to mimic file seek() behavior but with
@@ -329,5 +446,8 @@ class MySQLConnector:
 
     ############################
     def close(self):
-        """Close connection."""
-        self.connection.close()
+        """Write any buffered records and close connection."""
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Buffer records for a connector's write_records() method, so that they
+are written N records or T seconds at a time, whichever comes first.
+
+    batcher = RecordBatcher(connector.write_records, batch_size=100,
+                            batch_interval=0.5, errors=(DatabaseError,))
+    batcher.add(record)   # writes once 100 records are waiting
+    ...
+    batcher.flush()       # write whatever is left
+
+If batch_interval is non-zero, a timer thread writes a partial batch once
+its oldest record has waited that long, so the last records before a lull
+in traffic aren't held back indefinitely. Writes are serialized by the
+batcher's lock, so the timer never writes at the same time as add() or
+flush().
+
+Records are only dropped from the buffer once they've been written. If
+write_records() raises one of the given errors, add() and flush() re-raise
+it, leaving the records buffered; a caller that would rather journal them
+than retry can collect them with take_pending(). If a timed write fails,
+the error is logged and the write is retried after another batch_interval.
+
+Not every error is worth retrying, though: a record the database will
+never accept (say, a string too long for its column) would hold up every
+batch after it. If the batcher is told which errors are retryable - those
+meaning the database is unreachable - then any other error is blamed on
+the records, and the batch is split up (see write_or_reject()) so that the
+good records get written and only the bad ones are dropped.
+"""
+import logging
+import threading
+
+
+############################
+def write_or_reject(write_records, records, retryable=(Exception,), errors=(Exception,)):
+    """Write records with write_records(). If that raises one of the given
+    errors that isn't retryable, blame the records: write each half of the
+    batch separately, and so on down to single records, and drop (and log)
+    those that still fail. Return the list of dropped records. Retryable
+    errors are raised, leaving the caller to retry the whole batch.
+
+    Note that write_records() must write all of a batch or none of it (or
+    be able to rewrite records it has already written) for this to work."""
+    try:
+        write_records(records)
+        return []
+    except retryable:
+        raise
+    except errors as e:
+        if len(records) == 1:
+            logging.error('Unable to write record; dropping it: %s: %s', e, records[0])
+            return list(records)
+    middle = len(records) // 2
+    return (write_or_reject(write_records, records[:middle], retryable, errors)
+            + write_or_reject(write_records, records[middle:], retryable, errors))
+
+
+################################################################################
+class RecordBatcher:
+    """Hand records to a write function in batches."""
+
+    ############################
+    def __init__(self, write_records, batch_size=1, batch_interval=0,
+                 errors=(Exception,), retryable=None):
+        """
+        ```
+        write_records   Function that takes a list of records and writes them
+                        all, raising an exception on failure.
+
+        batch_size      Write once this many records are waiting.
+
+        batch_interval  If non-zero, also write once the oldest waiting record
+                        has waited this many seconds.
+
+        errors          Tuple of exception types that write_records() raises on
+                        failure, for logging failed timed writes.
+
+        retryable       If not None, the tuple of those errors that mean the
+                        database is unreachable. Batches failing with other
+                        errors are split up to find and drop the records at
+                        fault. If None, all errors are retried.
+        ```
+        """
+        self.write_records = write_records
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.errors = errors
+        self.retryable = errors if retryable is None else retryable
+        self.rejected = 0  # how many bad records we've dropped
+
+        self.pending = []
+        self.timer = None
+        self.lock = threading.RLock()
+
+    ############################
+    def add(self, record):
+        """Buffer a record, writing the batch if it's full."""
+        with self.lock:
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self._write()
+            elif self.batch_interval and self.timer is None:
+                self._start_timer()
+
+    ############################
+    def flush(self):
+        """Write any buffered records."""
+        with self.lock:
+            self._write()
+
+    ############################
+    def take_pending(self):
+        """Remove and return the buffered records, without writing them."""
+        with self.lock:
+            self._cancel_timer()
+            records, self.pending = self.pending, []
+            return records
+
+    ############################
+    def _write(self):
+        """Write the buffered records. Call with lock held."""
+        self._cancel_timer()
+        if not self.pending:
+            return
+        rejected = write_or_reject(self.write_records, self.pending,
+                                   self.retryable, self.errors)
+        self.rejected += len(rejected)
+        self.pending = []
+
+    ############################
+    def _start_timer(self):
+        self.timer = threading.Timer(self.batch_interval, self._write_on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    ############################
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    ############################
+    def _write_on_timer(self):
+        with self.lock:
+            if threading.current_thread() is not self.timer:
+                return  # superseded by a write that happened meanwhile
+            self.timer = None
+            try:
+                self._write()
+            except self.errors as e:
+                logging.error('Unable to write %d records: %s; will retry',
+                              len(self.pending), e)
+                self._start_timer()
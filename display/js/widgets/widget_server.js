@@ -110,7 +110,9 @@ function WidgetServer(widget_list, websocket_server) {
 //
 // where num_sec is the number of seconds of back data we want for
 // that data field. If a field is required by multiple sources,
-// use the max of number of seconds requested.
+// use the max of number of seconds requested. A widget's field may
+// also specify min_interval, max_points and aggregate to have the
+// server downsample its values before sending them.
 function build_data_request(widget_list) {
   var field_array = {};
   for (var widget_i = 0; widget_i < widget_list.length; widget_i++) {
@@ -127,6 +129,12 @@ function build_data_request(widget_list) {
       if (widget.fields[field_name].subsample) {
         field_array[field_name].subsample = widget.fields[field_name].subsample;
       }
+      // Server-side downsampling options (see server/downsampler.py)
+      ['min_interval', 'max_points', 'aggregate'].forEach(function(option) {
+        if (widget.fields[field_name][option] !== undefined) {
+          field_array[field_name][option] = widget.fields[field_name][option];
+        }
+      });
     }
   }
   var request = {'type':'subscribe', 'fields':field_array}
@@ -2,7 +2,9 @@
 
 import logging
 import logging.handlers
+import queue
 import sys
+import threading
 import time
 import traceback
 
@@ -26,7 +28,9 @@ class Listener:
     ############################
 
     def __init__(self, readers=[], transforms=[], writers=[], stderr_writers=[],
-                 host_id='', interval=0, name=None):
+                 host_id='', interval=0, name=None, reader_queue_size=0,
+                 writer_queue_size=0, writer_overflow_policy='block',
+                 max_batch=0, max_latency=0.5):
         """listener = Listener(readers, transforms=[], writers=[],
                             interval=0)
 
@@ -43,6 +47,27 @@ class Listener:
 
         name           Optional human-readable short name to be used in displays
 
+        reader_queue_size  If non-zero, run each reader continuously in its
+                       own thread, letting up to this many of its records
+                       queue up. See ComposedReader.
+
+        writer_queue_size  If non-zero, give each writer a persistent worker
+                       thread with an input queue of this size rather than
+                       a new thread per record. See ComposedWriter.
+
+        writer_overflow_policy  When writer_queue_size is non-zero, what to do
+                       when a writer falls behind: 'block', 'drop_oldest' or
+                       'drop_newest'. See ComposedWriter.
+
+        max_batch      If greater than 1, run in batch mode: accumulate up to
+                       this many records before passing them through the
+                       transforms' transform_batch() and writers' write_batch()
+                       methods in a single call.
+
+        max_latency    In batch mode, the longest (in seconds) a record may
+                       wait for its batch to fill before the batch is passed
+                       along anyway.
+
         Sample use:
 
         listener = Listener(readers=[NetworkReader(':6221'),
@@ -60,9 +85,13 @@ class Listener:
 
         ###########
         # Create readers, writers, etc.
-        self.reader = ComposedReader(readers=readers)
-        self.writer = ComposedWriter(transforms=transforms, writers=writers)
+        self.reader = ComposedReader(readers=readers, queue_size=reader_queue_size)
+        self.writer = ComposedWriter(transforms=transforms, writers=writers,
+                                     queue_size=writer_queue_size,
+                                     overflow_policy=writer_overflow_policy)
         self.interval = interval
+        self.max_batch = max_batch
+        self.max_latency = max_latency
         self.name = name or 'Unnamed listener'
         self.last_read = 0
 
@@ -91,16 +120,22 @@ class Listener:
 
         record = ''
         try:
-            while not self.quit_signalled and record is not None:
-                record = self.reader.read()
-                self.last_read = time.time()
-                logging.debug('ComposedReader read: "%s"', record)
-                if record:
-                    self.writer.write(record)
-
-                if self.interval:
-                    time_to_sleep = self.interval - (time.time() - self.last_read)
-                    time.sleep(max(time_to_sleep, 0))
+            if self.max_batch > 1:
+                self._run_batched()
+            else:
+                while not self.quit_signalled and record is not None:
+                    record = self.reader.read()
+                    self.last_read = time.time()
+                    logging.debug('ComposedReader read: "%s"', record)
+                    if record:
+                        self.writer.write(record)
+
+                    if self.interval:
+                        time_to_sleep = self.interval - (time.time() - self.last_read)
+                        time.sleep(max(time_to_sleep, 0))
+
+            # If writers are queued, let them finish what they've been given
+            self.writer.flush()
 
         # Exit in an orderly fashion if someone hits Ctl-C
         except KeyboardInterrupt:
@@ -110,3 +145,71 @@ class Listener:
             logging.info('Listener %s received exception: %s',
                          self.name, traceback.format_exc())
             raise e
+
+    ############################
+    def _read_into_queue(self, record_queue):
+        """
+        Batch mode: read records in a separate thread and put them on the
+        passed queue, so that run() can stop waiting when a batch's deadline
+        arrives. A None on the queue means EOF; an exception means that the
+        reader raised one.
+        """
+        record = ''
+        try:
+            while not self.quit_signalled and record is not None:
+                record = self.reader.read()
+                self.last_read = time.time()
+                record_queue.put(record)
+
+                if self.interval:
+                    time_to_sleep = self.interval - (time.time() - self.last_read)
+                    time.sleep(max(time_to_sleep, 0))
+        except Exception as e:
+            record_queue.put(e)
+
+    ############################
+    def _run_batched(self):
+        """
+        Batch mode: accumulate records until we have max_batch of them, or
+        until the first of them has been waiting max_latency seconds, then
+        hand them to the writer as a single batch.
+        """
+        record_queue = queue.SimpleQueue()
+        reader_thread = threading.Thread(target=self._read_into_queue,
+                                         args=(record_queue,), daemon=True)
+        reader_thread.start()
+
+        batch = []
+        deadline = None
+        while not self.quit_signalled:
+            # Wake up periodically even with nothing pending so we notice quit()
+            timeout = self.max_latency
+            if batch:
+                timeout = max(deadline - time.time(), 0)
+            try:
+                record = record_queue.get(timeout=timeout)
+            except queue.Empty:
+                record = ''
+
+            if record is None:
+                break
+            if isinstance(record, Exception):
+                raise record
+
+            if record:
+                logging.debug('ComposedReader read: "%s"', record)
+                if not batch:
+                    deadline = time.time() + self.max_latency
+                # A reader may hand us several records at once
+                if isinstance(record, list):
+                    batch.extend(record)
+                else:
+                    batch.append(record)
+
+            if batch and (len(batch) >= self.max_batch or time.time() >= deadline):
+                self.writer.write_batch(batch)
+                batch = []
+
+        # Don't leave anything behind when we exit
+        if batch:
+            self.writer.write_batch(batch)
@@ -19,6 +19,7 @@ from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.readers.reader import Reader  # noqa: E402
 from logger.utils.das_record import to_das_record_list  # noqa: E402
+from logger.utils import wire_format  # noqa: E402
 
 DEFAULT_SERVER_WEBSOCKET = 'localhost:8766'
 
@@ -31,7 +32,7 @@ class CachedDataReader(Reader):
 
     def __init__(self, subscription, data_server=DEFAULT_SERVER_WEBSOCKET,
                  bundle_seconds=0, return_das_record=False, data_id=None,
-                 use_wss=False, check_cert=False, **kwargs):
+                 use_wss=False, check_cert=False, encoding=wire_format.JSON, **kwargs):
         """
         ```
         subscription - a dictionary corresponding to the full
@@ -64,6 +65,10 @@ class CachedDataReader(Reader):
         check_cert  - If True and use_wss is True, check the server's TLS certificate
                       for validity; if a str, use as local filepath location of .pem
                       file to check against.
+
+        encoding    - 'json' (default) or, if the msgpack module is installed,
+                      'msgpack' to have the server send data in a compact
+                      binary encoding. See logger/utils/wire_format.py.
         ```
         When invoked in a config file, this would be:
         ```
@@ -99,8 +104,11 @@ class CachedDataReader(Reader):
             new_fields = {field: {'seconds': 0} for field in subscription_fields}
             subscription['fields'] = new_fields
 
+        wire_format.check_encoding(encoding)
         self.subscription = subscription
         subscription['type'] = 'subscribe'
+        if encoding != wire_format.JSON:
+            subscription['encoding'] = encoding
         self.data_server = data_server
         self.bundle_seconds = bundle_seconds
         self.return_das_record = return_das_record
@@ -116,6 +124,9 @@ class CachedDataReader(Reader):
         self.queue = queue.Queue()
         self.quit_flag = False
 
+        # Field ids the server has assigned, if we're using msgpack
+        self.field_ids = wire_format.FieldIdDecoder()
+
     ############################
     def _parse_response(self, response):
         """Parse a CachedDataServer response and enqueue the resulting data."""
@@ -195,19 +206,26 @@ class CachedDataReader(Reader):
                     async with websockets.connect(ws_data_server, ssl=ssl_context) as ws:
                         logging.info(f'Connected to data server {ws_data_server}')
                         # Send our subscription request
+                        self.field_ids.reset()
                         await ws.send(json.dumps(self.subscription))
                         result = await ws.recv()
-                        response = json.loads(result)
+                        response = wire_format.decode(result)
+                        if response.get('status') != 200:
+                            logging.warning('CachedDataReader subscription failed: %s',
+                                            response)
 
                         while not self.quit_flag:
                             await ws.send(json.dumps({'type': 'ready'}))
                             result = await ws.recv()
-                            response = json.loads(result)
+                            response = self.field_ids.expand(wire_format.decode(result))
                             logging.debug('Got CachedDataServer response: %s', response)
                             self._parse_response(response)
 
                 except BrokenPipeError:
                     pass
+                except wire_format.DecodeError as e:
+                    logging.warning('CachedDataReader got undecodable response: %s', e)
+                    await asyncio.sleep(0.2)
                 except AttributeError as e:
                     logging.info('CachedDataReader websocket loop error: %s', e)
                 except websockets.exceptions.ConnectionClosed:
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
 import logging
+import queue
 import sys
 import threading
+import time
+
+from collections import deque
 
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
@@ -46,10 +50,17 @@ class ComposedReader(Reader):
 
     It's important to have the run_reader threads time out, or any process
     using a ComposedReader will never naturally terminate.
+
+    If a non-zero queue_size is specified, all of the above is bypassed in
+    favor of a simpler "continuous" mode: each reader gets a long-lived
+    daemon thread that reads as fast as it can into a shared SimpleQueue,
+    blocking only when it already has queue_size records waiting to be
+    consumed. This avoids the per-record wakeup handshake at the cost of
+    reading ahead of demand.
     """
     ############################
 
-    def __init__(self, readers, transforms=[], **kwargs):
+    def __init__(self, readers, transforms=[], queue_size=0, **kwargs):
         """
         Instantiation:
         ```
@@ -58,6 +69,10 @@ class ComposedReader(Reader):
         readers        A single Reader or a list of Readers.
 
         transforms     A single Transform or list of zero or more Transforms.
+
+        queue_size     If non-zero, run each reader continuously in its own
+                       thread, allowing at most this many of its records to
+                       be waiting in the queue before it blocks.
         ```
         Use:
         ```
@@ -94,7 +109,7 @@ class ComposedReader(Reader):
 
         # Queue where we'll store extra records, and lock so only one
         # thread can touch queue at a time
-        self.queue = []
+        self.queue = deque()
         self.queue_lock = threading.Lock()
 
         # The two events, queue_has_record and queue_needs_record interact
@@ -111,6 +126,19 @@ class ComposedReader(Reader):
         # Set when a reader adds something to the queue
         self.queue_has_record = threading.Event()
 
+        # Continuous mode: readers push (index, record) tuples onto a shared
+        # SimpleQueue. Each reader may have at most queue_size records
+        # outstanding, enforced by its semaphore. We keep per-reader counts
+        # of records waiting and the most that have ever been waiting.
+        self.queue_size = queue_size
+        if self.queue_size > 0:
+            self.record_queue = queue.SimpleQueue()
+            self.reader_slots = [threading.BoundedSemaphore(self.queue_size)
+                                 for i in range(self.num_readers)]
+            self.queued = [0] * self.num_readers
+            self.high_water = [0] * self.num_readers
+            self.count_lock = threading.Lock()
+
     ############################
     def read(self):
         """
@@ -121,6 +149,9 @@ class ComposedReader(Reader):
         if len(self.readers) == 1:
             return self._apply_transforms(self.readers[0].read())
 
+        if self.queue_size > 0:
+            return self._read_continuous()
+
         # Do we have anything in the queue? Note: safe to check outside of
         # lock, because we're the only method that actually *removes*
         # anything. So if tests True here, we're assured that there's
@@ -131,7 +162,7 @@ class ComposedReader(Reader):
             logging.debug('read() - read requested; queue len is %d',
                           len(self.queue))
             with self.queue_lock:
-                record = self.queue.pop(0)
+                record = self.queue.popleft()
                 return self._apply_transforms(record)
 
         # If here, nothing's in the queue. Note that, if we wanted to be
@@ -164,7 +195,7 @@ class ComposedReader(Reader):
                 logging.debug('read() - acquired queue lock, queue length is %d',
                               len(self.queue))
                 if self.queue:
-                    record = self.queue.pop(0)
+                    record = self.queue.popleft()
                     if not self.queue:
                         self.queue_has_record.clear()  # only set/clear inside queue_lock
 
@@ -231,6 +262,64 @@ class ComposedReader(Reader):
             # Now clear of queue_lock
             logging.debug('    Reader #%d released queue_lock - looping', index)
 
+    ############################
+    def _read_continuous(self):
+        """
+        Get the next record from the continuously-fed record queue, starting
+        the reader threads if they haven't been started yet.
+        """
+        for i in range(self.num_readers):
+            if not self.reader_threads[i]:
+                logging.info('read() - starting continuous thread for Reader #%d', i)
+                thread = threading.Thread(target=self._run_reader_continuous,
+                                          args=(i,), daemon=True)
+                self.reader_threads[i] = thread
+                thread.start()
+
+        while False in self.reader_returned_eof:
+            index, record = self.record_queue.get()
+            with self.count_lock:
+                self.queued[index] -= 1
+            self.reader_slots[index].release()
+
+            # A None means that reader is done
+            if record is None:
+                self.reader_returned_eof[index] = True
+                continue
+            return self._apply_transforms(record)
+
+        # All readers have given us an EOF
+        logging.debug('read() - all threads returned None; returning None')
+        return None
+
+    ############################
+    def _run_reader_continuous(self, index):
+        """
+        Read records from readers[index] and put them on the record queue
+        until the reader returns None, blocking if the reader already has
+        queue_size records waiting.
+        """
+        reader = self.readers[index]
+        while True:
+            self.reader_slots[index].acquire()
+            try:
+                record = reader.read()
+            except Exception as e:
+                logging.error('    Reader #%d raised exception: %s', index, e)
+                self.reader_slots[index].release()
+                time.sleep(READER_TIMEOUT_WAIT)
+                continue
+
+            with self.count_lock:
+                self.queued[index] += 1
+                if self.queued[index] > self.high_water[index]:
+                    self.high_water[index] = self.queued[index]
+            self.record_queue.put((index, record))
+
+            if record is None:
+                logging.info('    Reader #%d returned None, is done', index)
+                return
+
     ############################
     def _apply_transforms(self, record):
         """
@@ -80,3 +80,13 @@ class DatabaseReader(TimestampedReader):
         read all records since then."""
         return self.db.read_time(self.fields, start_time=start_time,
                                  stop_time=stop_time)
+
+    ############################
+    def read_columns(self, start_time=None, stop_time=None, bucket=None):
+        """Read values with timestamps in [start_time, stop_time) and return
+        them as a dict mapping each field name to a (timestamps, values)
+        pair of columns. If bucket is a number of seconds, have the database
+        downsample values into averages over buckets of that width. See the
+        connector's read_columns() for details."""
+        return self.db.read_columns(self.fields, start_time=start_time,
+                                    stop_time=stop_time, bucket=bucket)
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
+import bisect
+import glob
 import json
 import logging
+import os
 import sys
 import time
 
@@ -13,10 +16,15 @@ except ImportError:
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils import timestamp  # noqa: E402
+from logger.utils import logfile_index  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.readers.text_file_reader import TextFileReader  # noqa: E402
 from logger.readers.reader import TimestampedReader  # noqa: E402
 
+# When bisecting a file for a timestamp, once we've narrowed the search to
+# this many bytes, just read forward.
+SCAN_BYTES = 8192
+
 
 ################################################################################
 # Open and read single-line records from one or more text files.
@@ -123,6 +131,12 @@ class LogfileReader(TimestampedReader):
         self._first_msec_timestamp = None
         self.prev_record = None
 
+        # A record we've read but not yet returned (e.g. while peeking)
+        self._pushback = None
+
+        # Cache of timestamp of first record in each file, for seek_time()
+        self._file_first_msec = {}
+
         # If they give us a filebase, add wildcard to match its suffixes;
         # otherwise, we'll pass on the empty string to TextFileReader so
         # that it uses stdin. NOTE: we should really use a pattern that
@@ -154,7 +168,7 @@ class LogfileReader(TimestampedReader):
         # NOTE: It feels like we should check here that the reader's
         # current file really does match our logfile name format...
         while True:
-            record = self.reader.read()
+            record = self._next_record()
             if not record:  # None means we're out of records
                 return record
 
@@ -232,21 +246,176 @@ class LogfileReader(TimestampedReader):
         self.prev_record = record
         return record
 
+    ############################
+    def _next_record(self):
+        """Return any record we've pushed back, else the reader's next one."""
+        if self._pushback is not None:
+            record, self._pushback = self._pushback, None
+            return record
+        return self.reader.read()
+
     ############################
     def _read_until(self, desired_time_msec):
+        """Position ourselves so that the next record read is the first one
+        with a timestamp at or after desired_time_msec. If records are
+        newline-delimited, find it by bisecting the logfiles (see
+        _seek_file_time()); otherwise read forward from where we are."""
+        if self.eol is None:
+            self._seek_file_time(desired_time_msec)
+            return
         while True:
-            record = self.reader.read()
+            record = self._next_record()
             if record is None:
                 return
             self.prev_record = record
             if self._get_msec_timestamp(record) >= desired_time_msec:
-                self.reader.seek(-1, 'current')
+                self._pushback = record
                 return
 
     ############################
     def _reset(self):
+        self._pushback = None
         self.reader.seek(0, 'start')
 
+    ############################
+    def _line_msec(self, line):
+        """Return the msec timestamp of a raw (bytes) line from a logfile, or
+        None if it doesn't start with one."""
+        try:
+            return self._get_msec_timestamp(line.decode())
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+    ############################
+    def _first_msec_in_file(self, filename):
+        """Return the timestamp of the first record in filename, or None if
+        we can't find one."""
+        if filename not in self._file_first_msec:
+            try:
+                with open(filename, 'rb') as f:
+                    msec = self._line_msec(f.readline())
+            except OSError:
+                return None
+            if msec is None:
+                return None  # Don't cache: file may still be getting written
+            self._file_first_msec[filename] = msec
+        return self._file_first_msec[filename]
+
+    ############################
+    def _last_record_in_file(self, filename):
+        """Return the last non-empty line in filename, or None if it has none,
+        reading backwards from the end of the file a block at a time."""
+        with open(filename, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            data = b''
+            while pos > 0:
+                step = min(SCAN_BYTES, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+                if b'\n' in data.rstrip(b'\r\n'):
+                    break
+        data = data.rstrip(b'\r\n')
+        if not data:
+            return None
+        return data.rsplit(b'\n', 1)[-1].decode(errors='replace')
+
+    ############################
+    def _find_time_in_file(self, filename, desired_time_msec):
+        """Return the byte offset and text of the first record in filename
+        with a timestamp at or after desired_time_msec, or (None, None) if
+        there isn't one.
+
+        Start from the sidecar index written by LogfileWriter, if there is
+        one, then bisect on byte offsets: seek to the midpoint, skip the
+        partial line we land in, and compare the timestamp of the next full
+        line. Once the window is small, read forward line by line.
+        """
+        with open(filename, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+
+            # Invariant: 'low' is the start of a line, and all records
+            # before it are earlier than the time we want.
+            low = 0
+            entries = logfile_index.read_index(filename)
+            if entries:
+                index_times = [ts * 1000 for ts, offset in entries]
+                i = bisect.bisect_left(index_times, desired_time_msec)
+                if i and entries[i - 1][1] <= size:
+                    low = entries[i - 1][1]
+            high = size
+
+            while high - low > SCAN_BYTES:
+                mid = (low + high) // 2
+                f.seek(mid)
+                f.readline()
+                line_start = f.tell()
+                if line_start >= high:
+                    high = mid
+                    continue
+                msec = self._line_msec(f.readline())
+                if msec is None:
+                    break  # Something unexpected - just read forward
+                if msec < desired_time_msec:
+                    low = line_start
+                else:
+                    high = mid
+
+            f.seek(low)
+            offset = low
+            for line in f:
+                msec = self._line_msec(line)
+                if msec is not None and msec >= desired_time_msec:
+                    return offset, line.decode(errors='replace').rstrip('\r\n')
+                offset += len(line)
+        return None, None
+
+    ############################
+    def _seek_file_time(self, desired_time_msec):
+        """Position the reader at the first record with a timestamp at or
+        after desired_time_msec without reading the records before it. The
+        logfiles are named by date, so first bisect on the timestamps of
+        their first records to find the last file starting no later than
+        the desired time, then look for the time within it (and, if it's
+        not there, in the files that follow).
+        """
+        self._pushback = None
+        file_list = sorted(glob.glob(self.file_spec))
+        low, high = 0, len(file_list)
+        while low < high:
+            mid = (low + high) // 2
+            first_msec = self._first_msec_in_file(file_list[mid])
+            if first_msec is None or first_msec <= desired_time_msec:
+                low = mid + 1
+            else:
+                high = mid
+
+        for filename in file_list[max(0, low - 1):]:
+            offset, record = self._find_time_in_file(filename, desired_time_msec)
+            if record is not None:
+                self.reader.seek_offset(filename, offset)
+                self.prev_record = record
+                return
+
+        # No such record - go to the end
+        self._seek_end(file_list)
+
+    ############################
+    def _seek_end(self, file_list=None):
+        """Position the reader after the last record, noting that record as
+        prev_record."""
+        self._pushback = None
+        if file_list is None:
+            file_list = sorted(glob.glob(self.file_spec))
+        for filename in reversed(file_list):
+            record = self._last_record_in_file(filename)
+            if record is not None:
+                self.prev_record = record
+                break
+        if file_list:
+            last_file = file_list[-1]
+            self.reader.seek_offset(last_file, os.path.getsize(last_file))
+
     ############################
     def _get_msec_timestamp(self, record):
         time_str = record.split(' ', 1)[0]
@@ -254,10 +423,10 @@ class LogfileReader(TimestampedReader):
 
     ############################
     def _peek_msec(self):
-        record = self.reader.read()
+        record = self._next_record()
         if record is None:
             return None
-        self.reader.seek(-1, 'current')
+        self._pushback = record
         return self._get_msec_timestamp(record)
 
     ############################
@@ -266,7 +435,7 @@ class LogfileReader(TimestampedReader):
     def _get_first_msec_timestamp(self):
         if self._first_msec_timestamp is None:
             self._reset()
-            record = self.reader.read()
+            record = self._next_record()
             if record is None:
                 return None
             self._first_msec_timestamp = self._get_msec_timestamp(record)
@@ -336,8 +505,15 @@ class LogfileReader(TimestampedReader):
             return desired_time
 
         elif origin == 'end':
-            while self.read() is not None:
-                pass
+            if self.eol is None:
+                self._seek_end()
+            else:
+                while True:
+                    record = self._next_record()
+                    if record is None:
+                        break
+                    if record:
+                        self.prev_record = record
             if self.prev_record is None:
                 return None
             end_timestamp = self._get_msec_timestamp(self.prev_record)
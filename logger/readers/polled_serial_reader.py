@@ -190,7 +190,7 @@ class PolledSerialReader(SerialReader):
 
                 logging.debug('read() is being called')
                 record = super().read()
-                logging.debug(f'Returned from read() with: {record}')
+                logging.debug('Returned from read() with: %s', record)
                 if record is not None:
                     return record
                 logging.debug('Serial read returned None; trying again.')
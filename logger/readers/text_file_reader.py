@@ -9,6 +9,94 @@ from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.readers.reader import StorageReader  # noqa: E402
 
+# How many bytes at a time to read when counting the records in a file
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+# How many bytes at a time to read when reading records from a file
+READ_CHUNK_SIZE = 64 * 1024
+
+# Note the byte offset of every RECORD_INDEX_INTERVAL'th record of each file
+# we read, so that seeking back to a record doesn't have to reread the file.
+RECORD_INDEX_INTERVAL = 100
+
+
+################################################################################
+class BufferedRecordFile:
+    """Read records from a file, keeping track of the offset of the next
+    record so that we can seek() back to it later. If eol is None, records
+    are lines, read as open() and readline() would read them. Otherwise,
+    read the file a chunk at a time and split records on eol, which may be
+    any (possibly multi-byte) string.
+    """
+    def __init__(self, filename, eol=None, chunk_size=READ_CHUNK_SIZE):
+        self.filename = filename
+        self.eol = eol.encode('utf-8') if eol else None
+        self.chunk_size = chunk_size
+
+        if self.eol is None:
+            self.file = open(filename, 'r')
+            self.read_record = self._read_line
+            self.tell = self.file.tell
+            return
+
+        self.file = open(filename, 'rb')
+        self.buffer = b''
+        self.buffer_pos = 0     # position in buffer of next record
+        self.buffer_offset = 0  # offset in file of start of buffer
+
+    ############################
+    def tell(self):
+        """Return the offset of the next record."""
+        return self.buffer_offset + self.buffer_pos
+
+    ############################
+    def seek(self, offset):
+        """Make the record starting at offset the next one read."""
+        self.file.seek(offset)
+        if self.eol is not None:
+            self.buffer = b''
+            self.buffer_pos = 0
+            self.buffer_offset = offset
+
+    ############################
+    def read_record(self):
+        """Return the next record, without its eol, or None if there are no
+        more. As with readline(), a partial record at the end of the file is
+        returned as it is."""
+        while True:
+            end = self.buffer.find(self.eol, self.buffer_pos)
+            if end >= 0:
+                record = self.buffer[self.buffer_pos:end]
+                self.buffer_pos = end + len(self.eol)
+                return record.decode('utf-8')
+
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                if self.buffer_pos == len(self.buffer):
+                    return None
+                record = self.buffer[self.buffer_pos:]
+                self.buffer_offset += len(self.buffer)
+                self.buffer = b''
+                self.buffer_pos = 0
+                return record.decode('utf-8')
+
+            # Keep any partial record we have and append the new chunk
+            self.buffer_offset += self.buffer_pos
+            self.buffer = self.buffer[self.buffer_pos:] + chunk
+            self.buffer_pos = 0
+
+    ############################
+    def _read_line(self):
+        """read_record() when records are lines."""
+        line = self.file.readline()
+        if not line:
+            return None
+        return line[:-1] if line[-1] == '\n' else line
+
+    ############################
+    def close(self):
+        self.file.close()
+
 
 ################################################################################
 # Open and read single-line records from one or more text files.
@@ -66,10 +154,20 @@ class TextFileReader(StorageReader):
         # The file we're currently using
         self.current_file = None
 
+        # Set by close() to stop us tailing
+        self.closed = False
+
+        # Number of records read so far. None if we don't know because
+        # we've been positioned by seek_offset().
         self.pos = 0
         self.start_pos = {}
         self.end_pos = {}
 
+        # Byte offsets of every RECORD_INDEX_INTERVAL'th record, by file,
+        # and the record number (pos) whose offset we'll note next.
+        self.record_offsets = {}
+        self.next_indexed_pos = None
+
         # Special case if file_spec is None
         if file_spec is None:
             self.current_file = sys.stdin
@@ -105,14 +203,15 @@ class TextFileReader(StorageReader):
         # Are there any more files? If so, get the next one and open it
         if self.unused_file_list:
             # First, save the record count for the file we're about to close.
-            if self.used_file_list:
+            if self.used_file_list and self.pos is not None:
                 prev_filename = self.used_file_list[-1]
                 self.end_pos[prev_filename] = self.pos
 
             next_filename = self.unused_file_list.pop(0)
             logging.info('TextFileReader opening next file "%s"', next_filename)
-            self.start_pos[next_filename] = self.pos
-            self.current_file = open(next_filename, 'r')
+            if self.pos is not None:
+                self.start_pos[next_filename] = self.pos
+            self._open_file(next_filename)
             self.used_file_list.append(next_filename)
             return self.current_file
 
@@ -132,6 +231,9 @@ class TextFileReader(StorageReader):
           if not record:
             could be EOF or simply an empty next line
         """
+        if self.closed:
+            return None
+
         if self.interval:
             now = time.time()
             sleep_time = max(0, self.interval - (now - self.last_read))
@@ -139,20 +241,14 @@ class TextFileReader(StorageReader):
             if sleep_time:
                 time.sleep(sleep_time)
 
-        record = None
-        while not record:
+        while True:
             # If we've got a current file, or if _get_next_file() gets one
             # for us, try to read a record.
             if self.current_file or self._get_next_file():
-                if not self.eol:
-                    record = self.current_file.readline()
-                else:
-                    record = self._read_until_eol()
-                if record:
+                record = self._read_record()
+                if record is not None:
                     self.last_read = time.time()
-                    record = record.rstrip('\n')
                     logging.debug('TextFileReader got record "%s"', record)
-                    self.pos += 1
                     return record
 
                 # No record: our current_file has reached EOF. See if more
@@ -170,14 +266,84 @@ class TextFileReader(StorageReader):
             if not self.refresh_file_spec and not self.tail:
                 return None
 
+            # If we've been closed while waiting, stop
+            if self.closed:
+                self._close_file()
+                return None
+
             # User wants refresh or tail, so sleep and try again.
             logging.debug('TextFileReader - tail/refresh specified, so sleeping '
                           '%f seconds before trying again', self.retry_interval)
             time.sleep(self.retry_interval)
 
+    ############################
+    def close(self):
+        """Stop reading: a read() that's waiting for more records (or
+        files) to show up closes its file and returns None, as will any
+        later read(). May be called from another thread."""
+        self.closed = True
+
+    ############################
+    def _close_file(self):
+        """Close our current file, if any."""
+        if self.current_file and self.current_file is not sys.stdin:
+            self.current_file.close()
+        self.current_file = None
+
+    ############################
+    def _open_file(self, filename):
+        """Close our current file, if any, and open filename."""
+        self._close_file()
+        self.current_file = BufferedRecordFile(filename, eol=self.eol)
+        self._update_next_indexed_pos()
+        return self.current_file
+
+    ############################
+    def _update_next_indexed_pos(self):
+        """Work out the number of the next record in our current file whose
+        offset we should note, or None if we don't know where we are."""
+        filename = self.current_file.filename
+        start_pos = self.start_pos.get(filename)
+        if self.pos is None or start_pos is None:
+            self.next_indexed_pos = None
+            return
+        offsets = self.record_offsets.setdefault(filename, [])
+        self.next_indexed_pos = start_pos + len(offsets) * RECORD_INDEX_INTERVAL
+
+    ############################
+    def _read_record(self):
+        """Read the next record from our current file, noting its offset if
+        it's one we index. Return None if at the end of the file."""
+        record_file = self.current_file
+
+        # Reading from stdin, we can't read ahead without blocking
+        if record_file is sys.stdin:
+            record = self.current_file.readline() if not self.eol else self._read_until_eol()
+            if not record:
+                return None
+            if self.pos is not None:
+                self.pos += 1
+            return record.rstrip('\n')
+
+        pos = self.pos
+        if pos is not None and pos == self.next_indexed_pos:
+            offset = record_file.tell()
+            record = record_file.read_record()
+            if record is not None:
+                self.record_offsets[record_file.filename].append(offset)
+                self.next_indexed_pos += RECORD_INDEX_INTERVAL
+        else:
+            record = record_file.read_record()
+        if record is None:
+            return None
+        if pos is not None:
+            self.pos = pos + 1
+        return record.rstrip('\n') if self.eol else record
+
     ############################
     # If self.eol is a string instead of None, read until we've consumed that
-    # string or reached eof, and return that as a record.
+    # string or reached eof, and return that as a record. Only used when
+    # reading from stdin.
     def _read_until_eol(self):
         if not self.eol:
             logging.fatal('Code error: called _read_until_eof, but no eof string specified')
@@ -218,9 +384,8 @@ class TextFileReader(StorageReader):
         i = 0
         while i < offset:
             if self.current_file or self._get_next_file():
-                if self.current_file.readline():
+                if self._read_record() is not None:
                     i += 1
-                    self.pos += 1
                 else:
                     if self._get_next_file() is None:
                         break
@@ -233,6 +398,9 @@ class TextFileReader(StorageReader):
             return
         if offset > 0:
             return self._seek_forward_from_current(offset)
+        if self.pos is None:
+            raise ValueError("Record position unknown after seek_offset(); "
+                             "seek from 'start' or 'end' instead")
         target = self.pos + offset
         if target < 0:
             raise ValueError("Can't back up past earliest record")
@@ -244,12 +412,20 @@ class TextFileReader(StorageReader):
             self.used_file_list.pop()
             current_filename = self.used_file_list[-1]
 
-        self.current_file = open(current_filename, 'r')
-
-        # TODO: implement backwards search within the file
-        for _ in range(target - self.start_pos[current_filename]):
-            self.current_file.readline()
+        self._open_file(current_filename)
+
+        # Jump to the closest record at or before the target whose offset
+        # we noted, then read forward to the target.
+        count = target - self.start_pos[current_filename]
+        offsets = self.record_offsets.get(current_filename, [])
+        index = min(count // RECORD_INDEX_INTERVAL, len(offsets) - 1)
+        if index >= 0:
+            self.current_file.seek(offsets[index])
+            count -= index * RECORD_INDEX_INTERVAL
+        for _ in range(count):
+            self.current_file.read_record()
         self.pos = target
+        self._update_next_indexed_pos()
 
     ############################
     def _save_state(self):
@@ -267,12 +443,12 @@ class TextFileReader(StorageReader):
     def _restore_state(self, state):
         self.used_file_list = state['used_file_list']
         self.unused_file_list = state['unused_file_list']
+        self.pos = state['pos']
         if 'current_filename' in state:
-            self.current_file = open(state['current_filename'], 'r')
+            self._open_file(state['current_filename'])
             self.current_file.seek(state['current_file_pos'])
         else:
             self.current_file = None
-        self.pos = state['pos']
 
     ############################
     # Behavior is intended to mimic file seek() behavior but with
@@ -307,13 +483,7 @@ class TextFileReader(StorageReader):
                         pos = self.end_pos[filename]
                     else:
                         self.start_pos[filename] = pos
-
-                        # TODO: this can be made faster, if needed
-                        with open(filename) as f:
-                            for n, _ in enumerate(f, 1):
-                                pass
-
-                        pos += n
+                        pos += self._count_records(filename)
                         self.end_pos[filename] = pos
 
                 self.used_file_list = file_list
@@ -331,6 +501,53 @@ class TextFileReader(StorageReader):
 
         return self.pos
 
+    ############################
+    def _count_records(self, filename):
+        """Count the records in filename. If they're lines, just count
+        newlines a chunk at a time."""
+        if self.eol:
+            record_file = BufferedRecordFile(filename, eol=self.eol)
+            count = 0
+            while record_file.read_record() is not None:
+                count += 1
+            record_file.close()
+            return count
+
+        count = 0
+        last_chunk = b''
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(COUNT_CHUNK_SIZE), b''):
+                count += chunk.count(b'\n')
+                last_chunk = chunk
+        # A last line with no newline still counts
+        if last_chunk and not last_chunk.endswith(b'\n'):
+            count += 1
+        return count
+
+    ############################
+    def seek_offset(self, filename, offset=0):
+        """Position the reader so that the next record read is the one
+        beginning at byte offset in filename, which must be one of the files
+        matching our file_spec. Used by readers, such as LogfileReader, that
+        can work out where in a file they want to be without counting
+        records. Because we don't know how many records precede the offset,
+        subsequent record-relative seeks must be from 'start' or 'end'.
+        """
+        if self.file_spec is None:
+            raise ValueError('seek_offset() not allowed on stdin')
+        file_list = sorted(glob.glob(self.file_spec))
+        if filename not in file_list:
+            raise ValueError('File "%s" does not match file_spec "%s"'
+                             % (filename, self.file_spec))
+        index = file_list.index(filename)
+
+        self.used_file_list = file_list[:index + 1]
+        self.unused_file_list = file_list[index + 1:]
+        self._open_file(filename)
+        self.current_file.seek(offset)
+        self.pos = self.start_pos.get(filename) if offset == 0 else None
+        self._update_next_indexed_pos()
+
     ############################
     def read_range(self, start=None, stop=None):
         """
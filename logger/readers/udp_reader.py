@@ -2,6 +2,7 @@
 
 import logging
 import socket
+import struct
 import sys
 
 from os.path import dirname, realpath
@@ -35,6 +36,15 @@ READ_BUFFER_SIZE = 65535
 # (over and over until we get a datagram that doesn't end with the marker).
 FRAGMENT_MARKER = b'\xff\xffTOOBIG\xff\xff'
 
+# Linux can tell us, with each datagram we receive, how many datagrams the
+# kernel has had to drop on this socket because its receive buffer was
+# full. Python's socket module doesn't define the option, so fall back to
+# its value from <asm-generic/socket.h> on Linux.
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40 if sys.platform.startswith('linux') else None)
+
+# Flag for reading from the socket without waiting, where available
+MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', None)
+
 
 ################################################################################
 class UDPReader(Reader):
@@ -42,7 +52,8 @@ class UDPReader(Reader):
     ############################
     def __init__(self, interface=None, port=None, mc_group=None,
                  reuseaddr=False, reuseport=False, eol=None,
-                 allow_empty=False, this_is_a_test=False, **kwargs):
+                 allow_empty=False, this_is_a_test=False, max_batch=0, rcvbuf=None,
+                 **kwargs):
         """
         ```
         interface    IP (or resolvable name) of interface to listen on.  None or ''
@@ -68,7 +79,24 @@ class UDPReader(Reader):
 
         this_is_a_test - If True, recognize that this is being called in a unittest, so
                 don't output warnings about not using loopback addresses.
+
+        max_batch    If greater than 1, read in high-rate mode: each read() waits
+                     for a datagram, then also takes any further datagrams already
+                     waiting on the socket, up to max_batch records in all, and
+                     returns them as a list. Pairs well with a Listener in batch
+                     mode when sensors send thousands of datagrams per second.
+                     If splitting by eol takes a datagram's records past
+                     max_batch, the extras are held over to the next read().
+
+        rcvbuf       If specified, size in bytes to request for the socket's
+                     receive buffer (SO_RCVBUF), which holds datagrams that have
+                     arrived but not yet been read. The kernel drops datagrams
+                     that arrive when it's full, so a bigger buffer rides out
+                     longer bursts. Linux caps it at net.core.rmem_max.
         ```
+        Where supported (Linux), the number of datagrams the kernel has
+        dropped because the receive buffer was full is tracked in the
+        reader's 'dropped' attribute, and a warning is logged when it grows.
         """
         super().__init__(**kwargs)
 
@@ -115,8 +143,24 @@ class UDPReader(Reader):
 
         self.this_is_a_test = this_is_a_test
 
+        self.max_batch = max_batch
+        self.overflow = []  # records held over from the last batch
+        if max_batch > 1 and MSG_DONTWAIT is None:
+            logging.warning('UDPReader: non-blocking reads unsupported on this '
+                            'platform; reading one datagram at a time.')
+        self.rcvbuf = rcvbuf
+
+        # Every datagram is received into this one preallocated buffer
+        self.buffer = bytearray(READ_BUFFER_SIZE)
+        self.buffer_view = memoryview(self.buffer)
+
+        # Kernel's count of datagrams dropped, if we can get it
+        self.count_drops = False
+        self.dropped = 0
+
         # socket gets initialized on-demand in read()
         self.socket = None
+        self.closed = False
 
     ############################
     def __del__(self):
@@ -126,6 +170,18 @@ class UDPReader(Reader):
         except AttributeError:
             pass
 
+    ############################
+    def close(self):
+        """Close the socket, waking up any read() that's waiting on it, so
+        that the port is free for someone else."""
+        self.closed = True
+        if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # (Linux complains, but wakes readers anyway)
+            self.socket.close()
+
     ############################
     def _open_socket(self):
         """Do socket prep so we're ready to read().  Returns socket object or None on
@@ -141,6 +197,19 @@ class UDPReader(Reader):
                 sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, True)
             except AttributeError:
                 logging.warning('Unable to set socket REUSEPORT; may be unsupported.')
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, int(self.rcvbuf))
+            granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            # (Linux reports double what it was asked for, to allow for overhead)
+            if granted < int(self.rcvbuf):
+                logging.warning('UDPReader: asked for receive buffer of %s bytes, '
+                                'got %d', self.rcvbuf, granted)
+        if SO_RXQ_OVFL is not None and hasattr(sock, 'recvmsg_into'):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+                self.count_drops = True
+            except OSError:
+                pass
 
         # If mc_group is specified, subscribe to it as a multicast group
         if self.mc_group:
@@ -180,38 +249,47 @@ class UDPReader(Reader):
         return sock
 
     ############################
-    def read(self):
-        """
-        Read the next UDP packet.
-        """
-        # If socket isn't ready, set it up.  If something fails, return w/out reading.
-        if not self.socket:
-            self.socket = self._open_socket()
-        if not self.socket:
-            logging.error('UDPReader.read: unable to open UDP socket')
-            return
+    def _read_datagram(self, flags=0):
+        """Receive the next datagram and return it as bytes. If flags
+        include MSG_DONTWAIT and none is waiting, raise BlockingIOError."""
+        if not self.count_drops:
+            nbytes = self.socket.recv_into(self.buffer_view, 0, flags)
+            return bytes(self.buffer_view[:nbytes])
+
+        nbytes, ancdata, _, _ = self.socket.recvmsg_into(
+            [self.buffer_view], socket.CMSG_SPACE(4), flags)
+        for level, cmsg_type, data in ancdata:
+            if level == socket.SOL_SOCKET and cmsg_type == SO_RXQ_OVFL:
+                dropped = struct.unpack('=I', data[:4])[0]
+                if dropped > self.dropped:
+                    logging.warning('UDPReader: %d datagrams dropped on port %d (%d in all); '
+                                    'consider a larger rcvbuf or max_batch',
+                                    dropped - self.dropped, self.port, dropped)
+                    self.dropped = dropped
+        return bytes(self.buffer_view[:nbytes])
 
-        # Read datagrams until we get one that doesn't end with a FRAGMENT_MARKER
-        record_buffer = b''
+    ############################
+    def _read_record(self, flags=0):
+        """Read datagrams until we get one that doesn't end with a
+        FRAGMENT_MARKER, and return the decoded record (or list of records,
+        if we're splitting by eol). Once we've started reading a fragmented
+        record, wait for the rest of it, whatever the flags say."""
+        fragments = []
         while True:
-            try:
-                record = self.socket.recv(READ_BUFFER_SIZE)
-            except OSError as e:
-                logging.error('UDPReader error: %s', str(e))
-                return None
+            record = self._read_datagram(0 if fragments else flags)
             logging.debug('UDPReader.read: received %d bytes', len(record))
 
             if record.endswith(FRAGMENT_MARKER):
                 # UDPWriter fragmented this record because it was too large to
                 # send as a single datagram
-                logging.info('UDPrader.read: detected fragmented packet')
-                record_buffer += record.rsplit(FRAGMENT_MARKER, maxsplit=1)[0]
-                logging.debug('record_buffer: %s', record_buffer)
+                logging.info('UDPReader.read: detected fragmented packet')
+                fragments.append(record[:-len(FRAGMENT_MARKER)])
             else:
-                record_buffer += record
+                fragments.append(record)
                 break
 
-        # we've got a whole record in our record_buffer, decode it
+        # we've got a whole record, decode it
+        record_buffer = fragments[0] if len(fragments) == 1 else b''.join(fragments)
 
         # if eol == None, return the record as is
         if not self.eol:
@@ -224,3 +302,54 @@ class UDPReader(Reader):
         # if there was only one record, return just the first element in the
         # list, otherwise return the whole list.
         return decoded_records[0] if len(decoded_records) == 1 else decoded_records
+
+    ############################
+    def read(self):
+        """
+        Read the next UDP packet. In high-rate mode (max_batch > 1), return
+        a list of all the records waiting to be read, up to max_batch.
+        Return None once the reader has been closed.
+        """
+        if self.closed:
+            return None
+
+        # If socket isn't ready, set it up.  If something fails, return w/out reading.
+        if not self.socket:
+            self.socket = self._open_socket()
+        if not self.socket:
+            logging.error('UDPReader.read: unable to open UDP socket')
+            return
+
+        if self.max_batch <= 1 or MSG_DONTWAIT is None:
+            try:
+                return self._read_record()
+            except OSError as e:
+                logging.error('UDPReader error: %s', str(e))
+                return None
+
+        # Start with any records held over from the last batch, only
+        # waiting for a datagram if there are none
+        records, self.overflow = self.overflow, []
+        flags = MSG_DONTWAIT if records else 0
+
+        # Then drain whatever else is waiting, without blocking
+        while len(records) < self.max_batch and not self.closed:
+            try:
+                record = self._read_record(flags)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logging.error('UDPReader error: %s', str(e))
+                if not records:
+                    return None
+                break
+            if isinstance(record, list):
+                records.extend(record)
+            elif record is not None:
+                records.append(record)
+            flags = MSG_DONTWAIT
+
+        # Splitting by eol may have taken us past max_batch
+        if len(records) > self.max_batch:
+            records, self.overflow = records[:self.max_batch], records[self.max_batch:]
+        return records
@@ -86,7 +86,7 @@ class WebsocketReader():
 
                         while not self.quit_flag:
                             record = await ws.recv()
-                            logging.debug(f'WebsocketReader got record {record}')
+                            logging.debug('WebsocketReader got record %s', record)
                             self.queue.put(record)
 
                 except BrokenPipeError:
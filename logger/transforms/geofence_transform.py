@@ -39,6 +39,16 @@ Some questions:
   first fires up, should it send the "entering_boundary_message" if the first record
   it receives indicates it's inside? DECISION: Yes.
 
+Boundaries are indexed when the transform is created: their polygons go
+into a spatial index (an STRtree) for a bounding box precheck, and are
+"prepared" so that point-in-polygon tests don't have to walk every edge.
+After each full check we also note how far the position is from the
+nearest boundary edge; until the ship has moved at least that far, it
+can't have crossed the boundary, and no further checks are needed. This
+makes it cheap to check every position we receive, so the
+seconds_between_checks parameter is no longer needed for performance.
+Lists of records are checked as a batch.
+
 NOTE: optional parameter distance_from_boundary is in degrees. Computing the appropriate
 value in km/nm is nontrivial and requires figuring out the right UTM projection for each
 location and recomputing it for each point and switching when lat/lon moved to a new UTM
@@ -50,6 +60,8 @@ import os
 import sys
 import time
 
+from math import isnan
+
 from typing import Union
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
@@ -63,7 +75,10 @@ try:
 except ImportError:
     import_errors = True
 try:
+    import numpy
+    import shapely
     from shapely.geometry import Point
+    from shapely.strtree import STRtree
 except ImportError:
     import_errors = True
 
@@ -73,6 +88,11 @@ try:
 except ImportError:
     import_pandas_errors = True
 
+# Number of segments in each piece of boundary edge that we index for
+# computing distance from the boundary; keeps each distance computation
+# short, even for boundaries with many thousands of vertices.
+EDGE_CHUNK_SIZE = 64
+
 
 ################################################################################
 class GeofenceTransform(Transform):
@@ -113,8 +133,9 @@ class GeofenceTransform(Transform):
                 Optional message to emit when boundary is crossed, inbound
 
         seconds_between_checks
-                Optional number of seconds to wait between doing checks,
-                computation overhead
+                Optional number of seconds to wait between doing checks.
+                Originally meant to limit computation overhead; no longer
+                needed for that, as checks are now cheap.
         """
         # Only throw this error if user tries to actually use this code
         if import_errors:
@@ -180,6 +201,42 @@ class GeofenceTransform(Transform):
 
         # Buffer the country's EEZ by distance in degrees
         self.buffered_eez = eez_data.buffer(distance_from_boundary_in_degrees)
+        self._index_boundary()
+
+    ############################
+    def _index_boundary(self):
+        """Build the spatial indexes we use to check positions against the
+        buffered boundary."""
+        # Split multipolygons into their parts, so that each gets its own
+        # (tighter) bounding box in the index.
+        geometries = numpy.array(list(self.buffered_eez), dtype=object)
+        geometries = geometries[~(shapely.is_missing(geometries) | shapely.is_empty(geometries))]
+        self.polygons = shapely.get_parts(geometries)
+        shapely.prepare(self.polygons)
+        self.polygon_tree = STRtree(self.polygons)
+        self.bounds = shapely.total_bounds(self.polygons)  # NaN if no polygons
+
+        # Index the boundary edges in short pieces for distance queries
+        edges = []
+        for ring in shapely.get_rings(self.polygons):
+            coords = shapely.get_coordinates(ring)
+            for start in range(0, len(coords) - 1, EDGE_CHUNK_SIZE):
+                edges.append(shapely.linestrings(coords[start:start + EDGE_CHUNK_SIZE + 1]))
+        self.edge_tree = STRtree(edges)
+
+        # Position (lon, lat) of our last full check, whether it was inside
+        # and its distance from the nearest edge of the boundary.
+        self.safe_center = None
+        self.safe_inside = None
+        self.safe_radius = 0
+
+    ############################
+    def _distance_to_edge(self, lon, lat):
+        """Distance in degrees from the position to the nearest boundary edge."""
+        if not len(self.edge_tree):
+            return float('inf')
+        _, distances = self.edge_tree.query_nearest(Point(lon, lat), return_distance=True)
+        return float(distances[0])
 
     ############################
     def _get_lat_lon(self, record: Union[DASRecord, dict]):
@@ -212,11 +269,68 @@ class GeofenceTransform(Transform):
             else:
                 return (None, None)
 
-    # Define a function to check if a point is within N nautical miles of the geofenced area
+    ############################
     def _is_inside_boundary(self, lat, lon):
-        # Note that Point() takes longitude as first arg, not latitude
-        point = Point(lon, lat)
-        return self.buffered_eez.contains(point).any()
+        """Is the position inside the (buffered) boundary?"""
+        # Fast path for a position near our last full check
+        if self.safe_center is not None and \
+           (lon - self.safe_center[0])**2 + (lat - self.safe_center[1])**2 \
+           < self.safe_radius * self.safe_radius:
+            return self.safe_inside
+        return self.is_inside_boundary([lat], [lon])[0]
+
+    ############################
+    def is_inside_boundary(self, latitudes, longitudes):
+        """Check a batch of positions against the (buffered) boundary,
+        returning a list of bools saying which are inside it.
+
+        latitudes
+        longitudes
+                Equal-length sequences of decimal latitudes and longitudes
+        """
+        # Which positions are provably on the same side as our last check?
+        inside = [self.safe_inside] * len(latitudes)
+        to_check = list(range(len(latitudes)))
+        if self.safe_center is not None:
+            center_lon, center_lat = self.safe_center
+            radius_squared = self.safe_radius * self.safe_radius
+            to_check = [i for i, (lat, lon) in enumerate(zip(latitudes, longitudes))
+                        if (lon - center_lon)**2 + (lat - center_lat)**2 >= radius_squared]
+
+        if to_check:
+            check_index = numpy.array(to_check, dtype=numpy.intp)
+            lats = numpy.asarray(latitudes, dtype=float)[check_index]
+            lons = numpy.asarray(longitudes, dtype=float)[check_index]
+            is_inside = numpy.zeros(len(check_index), dtype=bool)
+
+            # Anything outside the bounding box of all boundaries is outside
+            min_lon, min_lat, max_lon, max_lat = self.bounds
+            in_bounds = numpy.flatnonzero((lons >= min_lon) & (lons <= max_lon)
+                                          & (lats >= min_lat) & (lats <= max_lat))
+            if len(in_bounds):
+                # Pair positions with the polygons whose bounding boxes
+                # contain them, and only check those pairs.
+                points = shapely.points(lons[in_bounds], lats[in_bounds])
+                point_index, polygon_index = self.polygon_tree.query(points)
+                point_index = in_bounds[point_index]
+                contained = shapely.contains_xy(self.polygons[polygon_index],
+                                                lons[point_index], lats[point_index])
+                is_inside[point_index[contained]] = True
+
+            for i, value in zip(to_check, is_inside.tolist()):
+                inside[i] = value
+
+        # Remember where and how far from the boundary our latest
+        # position was, so nearby positions needn't be checked.
+        if to_check and to_check[-1] == len(latitudes) - 1:
+            lon, lat = float(longitudes[-1]), float(latitudes[-1])
+            if not (isnan(lon) or isnan(lat)):
+                self.safe_center = (lon, lat)
+                self.safe_inside = inside[-1]
+                # (Shaving off a hair in case of rounding error)
+                self.safe_radius = self._distance_to_edge(lon, lat) * (1 - 1e-9)
+
+        return inside
 
     ############################
     def transform(self, record: Union[DASRecord, dict]):
@@ -231,6 +345,12 @@ class GeofenceTransform(Transform):
                 DASRecords/dicts in which to look for the specified latitude_field_name
                 and longitude_field_name.
         """
+        # Check a list of positions in one go, unless we're meant to be
+        # skipping some of them.
+        if type(record) is list and not self.seconds_between_checks and \
+           all(type(r) in (DASRecord, dict) for r in record):
+            return self._transform_list(record)
+
         # See if it's something we can process, and if not, try digesting
         if not self.can_process_record(record):  # BaseModule
             return self.digest_record(record)  # BaseModule
@@ -241,8 +361,9 @@ class GeofenceTransform(Transform):
         now = time.time()
         time_since_last = now - self.last_check
         if self.seconds_between_checks and time_since_last < self.seconds_between_checks:
-            logging.debug(f'Only {time_since_last} seconds since last GeofenceTransform check; '
-                          f'less than the {self.seconds_between_checks} required.')
+            logging.debug('Only %s seconds since last GeofenceTransform check; '
+                          'less than the %s required.',
+                          time_since_last, self.seconds_between_checks)
             return None
 
         # Does this record have a lat/lon?
@@ -252,8 +373,27 @@ class GeofenceTransform(Transform):
 
         # We have a lat and lon, so we're going ahead and checking
         self.last_check = now
+        return self._update_position(self._is_inside_boundary(lat, lon))
+
+    ############################
+    def _transform_list(self, records):
+        """Check the positions in a list of records as a batch, and return
+        a list of the messages, if any, for the crossings among them."""
+        positions = [self._get_lat_lon(record) for record in records]
+        positions = [(lat, lon) for lat, lon in positions
+                     if lat is not None and lon is not None]
+        if not positions:
+            return []
+        self.last_check = time.time()
+        latitudes, longitudes = zip(*positions)
+        messages = [self._update_position(is_inside)
+                    for is_inside in self.is_inside_boundary(latitudes, longitudes)]
+        return [message for message in messages if message is not None]
 
-        is_inside = self._is_inside_boundary(lat, lon)
+    ############################
+    def _update_position(self, is_inside):
+        """Note whether our latest position is inside the boundary, and
+        return the appropriate message if that means we've crossed it."""
         if is_inside == self.last_position_inside:
             return None
 
@@ -1,22 +1,81 @@
 #!/usr/bin/env python3
 """Compute interpolations of input data.
+
+Each source field's values are cached as a TimeSeries: parallel arrays
+of timestamps and values, kept in time order. In-order values (the usual
+case) are simply appended, and the values within any window are found by
+bisection rather than by scanning. Each time the transform has new output
+timestamps to emit, it computes each field's values for all of them at
+once with interpolate_series(), which uses NumPy if it's installed.
 """
 
 import logging
 import sys
 import bisect
 
-from math import degrees, radians, sin, cos, atan2
-from statistics import mean
+from array import array
+from math import degrees, radians, sin, cos, atan2, fsum, isnan
 from typing import Union, Any
 
 from os.path import dirname, realpath
 
+try:
+    import numpy
+    NUMPY_ENABLED = True
+except ImportError:
+    NUMPY_ENABLED = False
+
+NAN = float('nan')
+
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.transforms.derived_data_transform import DerivedDataTransform  # noqa: E402
 
 
+################################################################################
+class TimeSeries:
+    """Time-ordered (timestamp, value) pairs for a single field, held as
+    an array of timestamps and a parallel list of values. Alongside them,
+    the values as floats (NaN for non-numeric values), ready for NumPy to
+    use without conversion or copying."""
+
+    ############################
+    def __init__(self, pairs=None):
+        self.timestamps = array('d')
+        self.values = []
+        self.floats = array('d')
+        for timestamp, value in pairs or []:
+            self.insert(timestamp, value)
+
+    ############################
+    def __len__(self):
+        return len(self.values)
+
+    ############################
+    def insert(self, timestamp: float, value: Any) -> None:
+        """Add a (timestamp, value) pair, maintaining time order."""
+        as_float = value if type(value) in (int, float, bool) else NAN
+        timestamps = self.timestamps
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            self.values.append(value)
+            self.floats.append(as_float)
+            return
+        pos = bisect.bisect_left(timestamps, timestamp)
+        timestamps.insert(pos, timestamp)
+        self.values.insert(pos, value)
+        self.floats.insert(pos, as_float)
+
+    ############################
+    def discard_before(self, timestamp: float) -> None:
+        """Throw away all values earlier than timestamp."""
+        pos = bisect.bisect_left(self.timestamps, timestamp)
+        if pos:
+            del self.timestamps[:pos]
+            del self.values[:pos]
+            del self.floats[:pos]
+
+
 ################################################################################
 class InterpolationTransform(DerivedDataTransform):
     """Transform that computes interpolations of the specified variables.
@@ -125,9 +184,8 @@ class InterpolationTransform(DerivedDataTransform):
         self.data_id = data_id
         self.metadata_interval = metadata_interval
 
-        # A dict of the cached values we're hanging onto - use sorted
-        # lists of (timestamp, value) pairs
-        self.cached_values = {f: [] for f in self.source_fields}
+        # A dict of the cached values we're hanging onto, as TimeSeries
+        self.cached_values = {f: TimeSeries() for f in self.source_fields}
 
         # The next timestamp we'd like to emit. Is set the first time we
         # call transform().
@@ -186,14 +244,12 @@ class InterpolationTransform(DerivedDataTransform):
             # Examine the value we've gotten. If list, we assume it's [(ts,
             # value), (ts, value),...]
             if type(new_value) is list:
-                for ts, val in new_value.items():
-                    self._insert_sorted(field, ts, val)
-                    logging.debug(f'adding {ts}: {field} - {val}')
+                for ts, val in new_value:
+                    self.cached_values[field].insert(ts, val)
 
             # If not list, assume DASRecord or simple field dict; add tuple
             elif timestamp:
-                self._insert_sorted(field, timestamp, new_value)
-                logging.debug(f'adding {timestamp}: {field} - {new_value}')
+                self.cached_values[field].insert(timestamp, new_value)
             else:
                 logging.warning('Interpolation found no timestamp in '
                                 'record: %s', record)
@@ -206,31 +262,12 @@ class InterpolationTransform(DerivedDataTransform):
         return timestamp
 
     ############################
-    def _insert_sorted(self, field: str, timestamp: float, value: Any) -> None:
-        """Insert a (timestamp, value) pair into the sorted cached values for a field."""
-        cache = self.cached_values[field]
-
-        # Use binary search to find insertion position to maintain sorted order
-        timestamps = [ts for ts, _ in cache]
-        pos = bisect.bisect_left(timestamps, timestamp)
-
-        # Insert at correct position to maintain sort order
-        cache.insert(pos, (timestamp, value))
-
-    ############################
-    def _clean_cache(self):
-        """Remove values from cache that are too old to be useful."""
-        for field in self.source_fields:
-            # Iterate forward through field cache until we find a timestamp
-            # that is recent enough to keep
-            cache = self.cached_values[field]
-            lower_limit = self.next_timestamp - self.window / 2
-            keep_index = 0
-            while keep_index < len(cache) and cache[keep_index][0] < lower_limit:
-                keep_index += 1
-
-            # Throw away everything before that index
-            self.cached_values[field] = cache[keep_index:]
+    def _clean_cache(self, timestamp):
+        """Remove values from cache that are too old to be useful for
+        computing values at timestamp or later."""
+        lower_limit = timestamp - self.window / 2
+        for cache in self.cached_values.values():
+            cache.discard_before(lower_limit)
 
     ############################
     def transform(self, record: Union[DASRecord, dict]):
@@ -266,45 +303,177 @@ class InterpolationTransform(DerivedDataTransform):
         if not self.next_timestamp:
             self.next_timestamp = self.earliest_timestamp
 
-        # What fields do we have data for in our cache?
-        non_empty = {}
-        for dest, spec in self.field_spec.items():
-            source = spec.get('source')
-            if source:
-                values = self.cached_values.get(source, [])
-                if len(values):
-                    non_empty[dest] = [source, len(values)]
-
-        # Iterate through all timestamps up to the edge of what we can fit
-        # in our window without running into the edge of our latest timestamp.
-        results = []
-        logging.debug(f'latest timestamp: {self.latest_timestamp}, next: {self.next_timestamp}')
+        # Which timestamps can we emit? All those up to the edge of what we
+        # can fit in our window without running into the edge of our
+        # latest timestamp.
+        logging.debug('latest timestamp: %s, next: %s', self.latest_timestamp, self.next_timestamp)
+        output_timestamps = []
         while self.next_timestamp < self.latest_timestamp - self.window / 2:
-            # Clean out old data
-            self._clean_cache()
+            output_timestamps.append(self.next_timestamp)
+            self.next_timestamp += self.interval
+        if not output_timestamps:
+            return []
+
+        # Compute each field's values for all those timestamps at once
+        field_values = {}
+        for result_field, entry in self.field_spec.items():
+            source_values = self.cached_values.get(entry.get('source'))
+            field_values[result_field] = interpolate_series(
+                entry.get('algorithm'), source_values, output_timestamps, self.window)
 
+        results = []
+        for i, timestamp in enumerate(output_timestamps):
             result = {}
-            for result_field, entry in self.field_spec.items():
-                source = entry.get('source')
-                source_values = self.cached_values.get(source)
-                algorithm = entry.get('algorithm')
-                # logging.warning('%s->%s: %d values',
-                #                source, result_field, len(source_values))
-                value = interpolate(algorithm, source_values,
-                                    self.next_timestamp,
-                                    self.latest_timestamp)
-                if value is not None:
-                    result[result_field] = value
+            for result_field, values in field_values.items():
+                if values[i] is not None:
+                    result[result_field] = values[i]
             if result:
-                result_record = {'timestamp': self.next_timestamp, 'fields': result}
+                result_record = {'timestamp': timestamp, 'fields': result}
                 if self.data_id:
                     result_record['data_id'] = self.data_id
                 results.append(result_record)
-            self.next_timestamp += self.interval
+
+        # Clean out old data
+        self._clean_cache(output_timestamps[-1])
 
         return results
 
 
+############################
+def interpolate_series(algorithm, series, timestamps, max_window=float('inf')):
+    """Compute interpolated values of a TimeSeries at each of a list of
+    timestamps, returning a list containing a value (or None, if there
+    aren't enough data to compute one) for each.
+
+    algorithm    Dict specifying the algorithm to be used
+
+    series       TimeSeries of the values to interpolate
+
+    timestamps   Ascending list of timestamps at which to compute values
+
+    max_window   Only consider values within max_window/2 seconds before
+                 each timestamp, even if the algorithm's window is wider.
+    """
+    if not timestamps:
+        return []
+    if not type(algorithm) is dict:
+        logging.warning('Function interpolate_series() handed non-dict algorithm '
+                        'specification: %s', algorithm)
+        return [None] * len(timestamps)
+    if not series:
+        logging.debug('Function interpolate_series() handed empty values list')
+        return [None] * len(timestamps)
+
+    alg_type = algorithm.get('type')
+    if alg_type == 'nearest':
+        lower_limits = [ts - max_window / 2 for ts in timestamps]
+        return _nearest(series, timestamps, lower_limits)
+
+    if alg_type in ('boxcar_average', 'polar_average'):
+        window = algorithm.get('window') or 10  # How far back/forward to average
+        lower_limits = [ts - min(window, max_window) / 2 for ts in timestamps]
+        upper_limits = [ts + window / 2 for ts in timestamps]
+        if NUMPY_ENABLED:
+            return _windowed_means_numpy(alg_type, series, lower_limits, upper_limits)
+        return _windowed_means(alg_type, series, lower_limits, upper_limits)
+
+    # Not an algorithm we recognize
+    logging.warning('Function interpolate_series() received unrecognized algorithm '
+                    'type: %s', alg_type)
+    return [None] * len(timestamps)
+
+
+############################
+def _nearest(series, timestamps, lower_limits):
+    """Value with the nearest timestamp at or after each lower limit. On
+    a tie, prefer the later value."""
+    series_timestamps = series.timestamps
+    values = series.values
+    count = len(values)
+    results = []
+    for timestamp, lower_limit in zip(timestamps, lower_limits):
+        lo = bisect.bisect_left(series_timestamps, lower_limit)
+        after = bisect.bisect_right(series_timestamps, timestamp)  # first later value
+        before = after - 1
+        if after < count and (before < lo or series_timestamps[after] - timestamp
+                              <= timestamp - series_timestamps[before]):
+            # Last of the values sharing that timestamp
+            after = bisect.bisect_right(series_timestamps, series_timestamps[after]) - 1
+            results.append(values[after])
+        elif before >= lo:
+            results.append(values[before])
+        else:
+            results.append(None)
+    return results
+
+
+############################
+def _window_mean(alg_type, values):
+    """Mean (or for polar_average, mean angle in degrees) of a non-empty
+    list of values, or None if it contains non-numeric values."""
+    try:
+        if alg_type == 'boxcar_average':
+            return fsum(values) / len(values)
+        val_radians = [radians(val) for val in values]
+        angle = degrees(atan2(fsum(sin(val) for val in val_radians),
+                              fsum(cos(val) for val in val_radians)))
+        return angle + 360 if angle < 0 else angle
+    except TypeError:
+        logging.error('Non-numeric value in interpolation list: %s', values)
+        return None
+
+
+############################
+def _windowed_means(alg_type, series, lower_limits, upper_limits):
+    """Mean of the values within each [lower, upper] window."""
+    series_timestamps = series.timestamps
+    results = []
+    for lower_limit, upper_limit in zip(lower_limits, upper_limits):
+        lo = bisect.bisect_left(series_timestamps, lower_limit)
+        hi = bisect.bisect_right(series_timestamps, upper_limit)
+        results.append(_window_mean(alg_type, series.values[lo:hi]) if hi > lo else None)
+    return results
+
+
+############################
+def _windowed_means_numpy(alg_type, series, lower_limits, upper_limits):
+    """Vectorized version of _windowed_means()."""
+    series_timestamps = numpy.frombuffer(series.timestamps, dtype=numpy.float64)
+    lo = numpy.searchsorted(series_timestamps, lower_limits, side='left')
+    hi = numpy.searchsorted(series_timestamps, upper_limits, side='right')
+
+    # Sum each window's values with reduceat() over interleaved [lo, hi)
+    # bounds, ignoring the sums between one window's hi and the next
+    # one's lo. We only need the span of values our windows cover, plus
+    # a trailing zero to keep every bound in range.
+    first, last = int(lo[0]), int(hi[-1])
+    if last <= first:
+        return [None] * len(lower_limits)
+    values = numpy.append(numpy.frombuffer(series.floats, dtype=numpy.float64,
+                                           count=last - first, offset=8 * first), 0)
+    bounds = numpy.empty(2 * len(lo), dtype=numpy.intp)
+    bounds[0::2] = lo - first
+    bounds[1::2] = hi - first
+    if alg_type == 'boxcar_average':
+        means = numpy.add.reduceat(values, bounds)[0::2] / numpy.maximum(hi - lo, 1)
+    else:
+        val_radians = numpy.radians(values)
+        x_sums = numpy.add.reduceat(numpy.sin(val_radians), bounds)[0::2]
+        y_sums = numpy.add.reduceat(numpy.cos(val_radians), bounds)[0::2]
+        means = numpy.degrees(numpy.arctan2(x_sums, y_sums))
+        means[means < 0] += 360
+
+    results = []
+    for i, (mean, count) in enumerate(zip(means.tolist(), (hi - lo).tolist())):
+        if not count:
+            mean = None
+        elif isnan(mean):
+            # NaN or non-numeric input; fall back to computing it directly
+            mean = _window_mean(alg_type, series.values[lo[i]:hi[i]])
+        results.append(mean)
+    return results
+
+
 ############################
 def interpolate(algorithm, values, timestamp, now):
     """An omnibus routine for taking a list of timestamped values, a
@@ -321,76 +490,4 @@ def interpolate(algorithm, values, timestamp, now):
     now          Timestamp now. This should be used to determine whether
                  we're far enough beyond our timestamp to compute a value.
     """
-    if not type(algorithm) is dict:
-        logging.warning('Function interpolate() handed non-dict algorithm '
-                        'specification: %s', algorithm)
-        return None
-    if not values:
-        logging.debug('Function interpolate() handed empty values list')
-        return None
-
-    ##################
-    # Select algorithm
-    alg_type = algorithm.get('type')
-
-    # boxcar_average: all values within symmetric interval window get
-    # same weight.
-    if alg_type == 'boxcar_average':
-        window = algorithm.get('window', 10)  # How far back/forward to average
-        lower_limit = timestamp - window / 2
-        upper_limit = timestamp + window / 2
-        vals_to_average = [val for ts, val in values
-                           if ts >= lower_limit and ts <= upper_limit]
-        if not vals_to_average:
-            return None
-
-        try:
-            return mean(vals_to_average)
-        except TypeError:
-            logging.error('Non-numeric value in interpolation list: %s', vals_to_average)
-            return None
-
-    # nearest: return value of nearest timestamp. Note that we assume
-    # timestamps are in order, so once distance starts going up, we're
-    # done.
-    if alg_type == 'nearest':
-        best_distance = float('inf')
-        value = None
-        for i in range(len(values)):
-            ts, ts_value = values[i]
-            distance = abs(ts - timestamp)
-            if distance <= best_distance:
-                best_distance = distance
-                value = ts_value
-            else:
-                break
-        return value
-
-    # polar_average: interpret as an angle in degrees. Convert to points
-    # on a unit circle and return the angle of their centroid from the origin.
-    if alg_type == 'polar_average':
-        window = algorithm.get('window', 10)  # How far back/forward to average
-        lower_limit = timestamp - window / 2
-        upper_limit = timestamp + window / 2
-        vals_to_average = [val for ts, val in values
-                           if ts >= lower_limit and ts <= upper_limit]
-        if not vals_to_average:
-            return None
-
-        try:
-            val_radians = [radians(val) for val in vals_to_average]
-            x_mean = mean([sin(val) for val in val_radians])
-            y_mean = mean([cos(val) for val in val_radians])
-            angle = degrees(atan2(x_mean, y_mean))
-            if angle < 0:
-                angle += 360
-            return angle
-        except TypeError:
-            logging.error('Non-numeric value in interpolation list: %s', vals_to_average)
-            return None
-
-    # Not an algorithm we recognize
-    else:
-        logging.warning('Function interpolate() received unrecognized algorithm '
-                        'type: %s', alg_type)
-        return None
+    return interpolate_series(algorithm, TimeSeries(values), [timestamp])[0]
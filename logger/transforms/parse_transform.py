@@ -18,7 +18,7 @@ class ParseTransform(Transform):
                  definition_path=record_parser.DEFAULT_DEFINITION_PATH,
                  return_json=False, return_das_record=False,
                  metadata_interval=None, strip_unprintable=False, quiet=False,
-                 prepend_data_id=False, delimiter=':', **kwargs):
+                 prepend_data_id=False, delimiter=':', compile_regex=False, **kwargs):
         """
         ```
         record_format
@@ -64,6 +64,11 @@ class ParseTransform(Transform):
                 Defaults to ':'.
                 Not used if prepend_data_id is false.
 
+        compile_regex
+                If true, match field patterns using the regular expressions
+                and type converters generated for them by the parse module
+                directly, rather than going through parse.Parser.parse().
+
         ```
         """
         super().__init__(**kwargs)  # processes 'quiet' and type hints
@@ -79,7 +84,8 @@ class ParseTransform(Transform):
             strip_unprintable=strip_unprintable,
             quiet=quiet,
             prepend_data_id=prepend_data_id,
-            delimiter=delimiter)
+            delimiter=delimiter,
+            compile_regex=compile_regex)
 
     ############################
     def transform(self, record: str) -> DASRecord:
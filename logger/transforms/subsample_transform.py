@@ -9,7 +9,7 @@ import time
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord  # noqa: E402
-from logger.utils.subsample import subsample  # noqa: E402
+from logger.utils.subsample import Subsampler  # noqa: E402
 from logger.transforms.derived_data_transform import DerivedDataTransform  # noqa: E402
 
 
@@ -41,7 +41,8 @@ class SubsampleTransform(DerivedDataTransform):
                   }
                 }
 
-        back_seconds - the number of seconds of data to cache for use by sampler
+        back_seconds - no longer used: each field's subsampler keeps only the
+                     values its window still needs. Retained for compatibility.
 
         metadata_interval - how many seconds between when we attach field metadata
                      to a record we send out.
@@ -55,11 +56,21 @@ class SubsampleTransform(DerivedDataTransform):
         self.back_seconds = back_seconds
         self.field_list = list(field_spec.keys())
 
-        # A dict of the cached values we're hanging onto
-        self.cached_values = {f: [] for f in self.field_list}
-
-        # Last timestamp that's been emitted for each field
-        self.last_timestamp = {f: 0 for f in self.field_list}
+        # A streaming Subsampler for each field we can produce output for.
+        # Each one holds only the values still within its window.
+        self.subsamplers = {}
+        for field in self.field_list:
+            if not self.field_spec[field].get('output'):
+                logging.warning('No "output" spec found for field %s', field)
+                continue
+            algorithm = self.field_spec[field].get('subsample')
+            if not algorithm:
+                logging.warning('No "subsample" spec found for field %s', field)
+                continue
+            try:
+                self.subsamplers[field] = Subsampler(algorithm)
+            except ValueError as e:
+                logging.warning('Field %s: %s', field, e)
 
         self.metadata_interval = metadata_interval
         self.last_metadata_send = 0
@@ -88,7 +99,7 @@ class SubsampleTransform(DerivedDataTransform):
 
     ############################
     def _add_record(self, record):
-        """Cached the values contained in a new record."""
+        """Feed the values contained in a new record to our subsamplers."""
         if type(record) not in [DASRecord, dict]:
             logging.error('SubsampleTransform records must be dict or '
                           'DASRecord. Received type %s: %s', type(record), record)
@@ -105,35 +116,21 @@ class SubsampleTransform(DerivedDataTransform):
             logging.error('SubsampleTransform: no fields found in record: %s', record)
             return
 
-        # First, copy the new data into our cache
-        for field in self.field_list:
+        for field, subsampler in self.subsamplers.items():
             new_vals = fields.get(field)
             if not new_vals:
                 continue
             # If list, we assume it's [(ts, value), (ts, value),...]
             if type(new_vals) is list:
-                self.cached_values[field].extend(new_vals)
+                for value_ts, value in new_vals:
+                    subsampler.add(value_ts, value)
                 # If not list, assume DASRecord or simple field dict; add tuple
             elif timestamp:
-                self.cached_values[field].append((timestamp, new_vals))
+                subsampler.add(timestamp, new_vals)
             else:
                 logging.error('SubsampleTransform found no timestamp in '
                               'record: %s', record)
 
-    ############################
-    def _clean_cache(self):
-        """Which fields are we interested in to produce transformed data?"""
-        now = time.time()
-        for field in self.field_list:
-            # Iterate forward through field cache until we find a timestamp
-            # that is recent enough to keep
-            cache = self.cached_values[field]
-            for keep_index in range(len(cache)):
-                if cache[keep_index][0] > now - self.back_seconds:
-                    # Throw away everything before that index
-                    self.cached_values[field] = cache[keep_index:]
-                    break
-
     ############################
     def transform(self, record):
         """Incorporate any useable fields in this record, and if it gives
@@ -149,32 +146,16 @@ class SubsampleTransform(DerivedDataTransform):
                 results.append(self.transform(single_record))
             return results
 
-        # Clean out old data
+        # Add in new data
         self._add_record(record)
 
-        # Clean out old data
-        self._clean_cache()
-
         now = time.time()
 
         result_fields = {}
-        for field in self.field_list:
-            if not self.cached_values[field]:
-                continue
-
-            output_field = self.field_spec[field].get('output')
-            if not output_field:
-                logging.warning('No "output" spec found for field %s', field)
-                continue
-            algorithm = self.field_spec[field].get('subsample')
-            if not algorithm:
-                logging.warning('No "subsample" spec found for field %s', field)
-                continue
-            field_result = subsample(algorithm, self.cached_values[field],
-                                     self.last_timestamp[field], now)
+        for field, subsampler in self.subsamplers.items():
+            field_result = subsampler.emit(now)
             if field_result:
-                result_fields[output_field] = field_result
-                self.last_timestamp[field] = field_result[-1][0]
+                result_fields[self.field_spec[field]['output']] = field_result
 
         if not result_fields:
             return None
@@ -22,6 +22,10 @@ records *except* those of type "None" or "list". The logic is that digest_record
 will return a None when given a None, and when given a list, will iteratively
 apply the transform to every element of the list and return the resulting list.
 
+Transforms that can do something smarter with a whole batch of records than
+apply transform() to each in turn may also override transform_batch(), which
+is called by ComposedWriter when a Listener is run in batch mode.
+
 Note that the child class can explicitly call super().__init__() or such
 to initialize the type checking and set its debugging level. If it is not explicitly
 initialized, it will be done implicitly the first time can_process_record() or
@@ -53,3 +57,12 @@ class Transform(BaseModule):
         natively or not."""
         super()._initialize_type_hints(module_type='transform',
                                        module_method=self.__class__.transform)
+
+    ############################
+    def transform_batch(self, records):
+        """Transform a list of records, returning a list of the results. By
+        default, just calls transform() on each record in turn, discarding any
+        None results. Subclasses may override this if they can process a batch
+        more efficiently than record-by-record."""
+        results = [self.transform(record) for record in records]
+        return [r for r in results if r is not None]
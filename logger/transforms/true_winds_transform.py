@@ -27,7 +27,6 @@ import logging
 import sys
 import time
 
-from pprint import pformat
 from typing import Union
 
 from os.path import dirname, realpath
@@ -35,6 +34,7 @@ sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord, to_das_record_list  # noqa: E402
 from logger.utils.truewinds.truew import truew  # noqa: E402
 from logger.transforms.derived_data_transform import DerivedDataTransform  # noqa: E402
+from logger.utils.lazy_logging import lazy_pformat  # noqa: E402
 
 
 ################################################################################
@@ -287,7 +287,7 @@ class TrueWindsTransform(DerivedDataTransform):
                now - self.metadata_interval > self.last_metadata_send:
                 metadata = {'fields': self._metadata()}
                 self.last_metadata_send = now
-                logging.debug('Emitting metadata: %s', pformat(metadata))
+                logging.debug('Emitting metadata: %s', lazy_pformat(metadata))
             else:
                 metadata = None
 
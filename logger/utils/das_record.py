@@ -1,16 +1,109 @@
 #!/usr/bin/env python3
 
 import json
+import os
 import pprint
 import logging
 
 from logger.utils.timestamp import timestamp as timestamp_method  # noqa: E402
 
+# Which JSON encoder DASRecord.as_json() should use. The faster backends
+# produce equivalent, but more compact, JSON (no spaces after separators),
+# so the stdlib json module remains the default. May be set via the
+# OPENRVDAS_JSON_BACKEND environment variable or set_json_backend().
+JSON_BACKENDS = ['json', 'orjson', 'ujson', 'auto']
+
+
+def _load_json_backend(backend):
+    """Return a function that JSON-encodes a dict to a str using the named
+    backend, or None if that backend isn't installed."""
+    if backend == 'json':
+        return json.dumps
+    if backend == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            return None
+        return lambda obj: orjson.dumps(obj).decode('utf-8')
+    if backend == 'ujson':
+        try:
+            import ujson
+        except ImportError:
+            return None
+        return ujson.dumps
+    raise ValueError('Unknown JSON backend "%s"; must be one of %s' % (backend, JSON_BACKENDS))
+
+
+def set_json_backend(backend='json'):
+    """Select the JSON encoder used by DASRecord.as_json(). If 'auto', use
+    the fastest one installed. Return the name of the backend in use; if
+    the requested one isn't installed, warn and fall back to 'json'.
+    """
+    global _json_dumps, json_backend
+    candidates = ['orjson', 'ujson', 'json'] if backend == 'auto' else [backend]
+    for candidate in candidates:
+        dumps = _load_json_backend(candidate)
+        if dumps:
+            _json_dumps, json_backend = dumps, candidate
+            return json_backend
+    logging.warning('JSON backend "%s" not installed; using "json"', backend)
+    _json_dumps, json_backend = json.dumps, 'json'
+    return json_backend
+
+
+_json_dumps = json.dumps
+json_backend = 'json'
+if os.environ.get('OPENRVDAS_JSON_BACKEND'):
+    set_json_backend(os.environ['OPENRVDAS_JSON_BACKEND'])
+
+
+# Types of values whose JSON encoding depends only on their type and ==
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _same(old, new):
+    """Would old and new JSON-encode identically? Type-aware, so that True
+    and 1 (or 1 and 1.0), which are ==, are told apart."""
+    return old is new or (type(old) is type(new) and old == new)
+
+
+def _snapshot(value):
+    """Copy of a dict of scalars, so we can tell later whether it has
+    changed, or None if it holds anything (e.g. a list) that could be
+    changed in place without our noticing."""
+    if type(value) is not dict:
+        return None
+    for item in value.values():
+        if type(item) not in _SCALAR_TYPES:
+            return None
+    return value.copy()
+
+
+def _unchanged(snapshot, value):
+    """Does the dict value still match its snapshot?"""
+    if type(value) is not dict or len(value) != len(snapshot):
+        return False
+    for key, item in value.items():
+        if key not in snapshot or not _same(snapshot[key], item):
+            return False
+    return True
+
 
 class DASRecord:
     """DASRecord is a structured representation of the field names and
     values (and metadata) contained in a sensor record.
+
+    A record that is serialized more than once (say, because it goes to
+    several writers) is only JSON-encoded once: as_json() remembers its
+    result, along with a snapshot of the values it was computed from, and
+    reuses it for as long as those values are unchanged. Only records whose
+    fields and metadata hold plain scalars (str, int, float, bool, None)
+    are remembered; a record holding lists or dicts, which might be changed
+    in place, is encoded afresh each time.
     """
+    __slots__ = ('data_id', 'message_type', 'timestamp', 'fields', 'metadata',
+                 '_json_cache')
+
     ############################
 
     def __init__(self, json_str=None, data_id=None, message_type=None,
@@ -24,6 +117,7 @@ class DASRecord:
 
         If timestamp is not specified, the instance will use the current time.
         """
+        self._json_cache = None
         if json_str:
             parsed = json.loads(json_str)
             self.data_id = parsed.get('data_id')
@@ -46,30 +140,51 @@ class DASRecord:
                 self.metadata = metadata
 
     ############################
-    def as_json(self, pretty=False):
-        """Return DASRecord as a JSON string."""
-        json_dict = {
+    def as_dict(self):
+        """Return DASRecord as a dict."""
+        return {
             'data_id': self.data_id,
             'message_type': self.message_type,
             'timestamp': self.timestamp,
             'fields': self.fields,
             'metadata': self.metadata
         }
+
+    ############################
+    def as_json(self, pretty=False):
+        """Return DASRecord as a JSON string."""
         if pretty:
-            return json.dumps(json_dict, sort_keys=True, indent=4)
+            return json.dumps(self.as_dict(), sort_keys=True, indent=4)
+
+        # Have we already encoded the record as it is now? Fields and
+        # metadata may have been modified in place, so compare them against
+        # copies of what we encoded last time.
+        cache = self._json_cache
+        if (cache is not None and
+                cache[6] is _json_dumps and
+                _same(cache[1], self.data_id) and
+                _same(cache[2], self.message_type) and
+                _same(cache[3], self.timestamp) and
+                _unchanged(cache[4], self.fields) and
+                _unchanged(cache[5], self.metadata)):
+            return cache[0]
+
+        json_str = _json_dumps(self.as_dict())
+        fields = _snapshot(self.fields)
+        metadata = _snapshot(self.metadata)
+        if (fields is None or metadata is None or
+                type(self.data_id) not in _SCALAR_TYPES or
+                type(self.message_type) not in _SCALAR_TYPES or
+                type(self.timestamp) not in _SCALAR_TYPES):
+            self._json_cache = None
         else:
-            return json.dumps(json_dict)
+            self._json_cache = (json_str, self.data_id, self.message_type, self.timestamp,
+                                fields, metadata, _json_dumps)
+        return json_str
 
     ############################
     def __str__(self):
-        das_dict = {
-            'data_id': self.data_id,
-            'message_type': self.message_type,
-            'timestamp': self.timestamp,
-            'fields': self.fields,
-            'metadata': self.metadata
-        }
-        return pprint.pformat(das_dict)
+        return pprint.pformat(self.as_dict())
 
     ############################
     def __eq__(self, other):
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""Helpers for deferring the cost of building log message arguments until
+we know the message will actually be emitted.
+
+The logging module only formats a message if its level is enabled, but
+any work done to compute the message's arguments happens regardless. So
+
+    logging.debug('Got fields: %s', pprint.pformat(fields))
+
+pretty-prints 'fields' for every record, even when nobody is listening
+at DEBUG level. Instead, wrap the work in an object that only does it
+when the message is formatted:
+
+    from logger.utils.lazy_logging import lazy_pformat
+    logging.debug('Got fields: %s', lazy_pformat(fields))
+
+For arbitrary expressions, use LazyFormat with a function and arguments:
+
+    logging.debug('Results: %s...', LazyFormat(lambda: str(results)[:100]))
+
+Where even gathering the arguments is expensive, guard the call with
+debug_enabled():
+
+    if debug_enabled():
+        logging.debug('Summary: %s', summarize(records))
+"""
+import logging
+import pprint
+
+
+################################################################################
+class LazyFormat:
+    """Call func(*args, **kwargs) only when converted to a string."""
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+############################
+def lazy_pformat(obj):
+    """Return a placeholder that pprint.pformat()s obj when logged."""
+    return LazyFormat(pprint.pformat, obj)
+
+
+############################
+def debug_enabled(logger=None):
+    """Return True if messages at DEBUG level would be emitted by logger
+    (by default, the root logger)."""
+    return (logger or logging.getLogger()).isEnabledFor(logging.DEBUG)
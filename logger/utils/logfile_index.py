@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+"""Sidecar time indexes for logfiles.
+
+A LogfileWriter created with index_interval=N appends a line to a small
+hidden index file alongside each logfile every N records, so that for
+
+    /var/log/openrvdas/NBP1406_s330-2014-08-01
+
+it maintains
+
+    /var/log/openrvdas/.NBP1406_s330-2014-08-01.idx
+
+Each index line holds a timestamp (in seconds) and a byte offset into the
+logfile: the record ending just before that offset carried that
+timestamp. Because logfiles are written in time order, every record before
+the offset is no later than the listed timestamp, so a LogfileReader
+seeking to a time can start reading at the last offset whose timestamp is
+earlier than the time it wants rather than at the start of the file.
+
+The leading '.' keeps index files from matching the filebase + '*' spec
+that LogfileReader uses to find its logfiles.
+"""
+import logging
+import os.path
+
+INDEX_SUFFIX = '.idx'
+
+
+############################
+def index_filename(filename):
+    """Return the name of the sidecar index for logfile filename."""
+    directory, basename = os.path.split(filename)
+    return os.path.join(directory, '.' + basename + INDEX_SUFFIX)
+
+
+############################
+def append_index_entry(filename, ts, offset):
+    """Note in filename's index that the record ending at byte offset
+    had timestamp ts."""
+    try:
+        with open(index_filename(filename), 'a') as index_file:
+            index_file.write('%r %d\n' % (float(ts), offset))
+    except OSError as e:
+        logging.warning('Unable to update index for %s: %s', filename, e)
+
+
+############################
+def read_index(filename):
+    """Return a list of (timestamp, offset) tuples from filename's index,
+    or an empty list if it has none. Lines that can't be parsed (e.g. a
+    partially-written last line) are skipped."""
+    entries = []
+    try:
+        with open(index_filename(filename)) as index_file:
+            for line in index_file:
+                try:
+                    ts, offset = line.split()
+                    entries.append((float(ts), int(offset)))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return entries
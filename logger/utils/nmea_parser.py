@@ -84,7 +84,7 @@ class NMEAParser:
 
         record = DASRecord(data_id=data_id, message_type=message_type,
                            timestamp=ts, fields=named_fields)
-        logging.debug('created DASRecord: %s', str(record))
+        logging.debug('created DASRecord: %s', record)
         return record
 
     ############################
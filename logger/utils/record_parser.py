@@ -10,7 +10,6 @@ definitions should take.
 import datetime
 import json
 import logging
-import pprint
 import sys
 
 try:
@@ -25,6 +24,8 @@ sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.utils.read_config import load_definitions  # noqa: E402
 from logger.utils.das_record import collect_metadata_for_fields  # noqa: E402
+from logger.utils.record_parser_index import PatternIndex  # noqa: E402
+from logger.utils.lazy_logging import lazy_pformat  # noqa: E402
 
 # Dict of format types that extend the default formats recognized by the
 # parse module.
@@ -41,7 +42,8 @@ class RecordParser:
                  definition_path=DEFAULT_DEFINITION_PATH,
                  return_das_record=False, return_json=False,
                  metadata_interval=None, strip_unprintable=False,
-                 quiet=False, prepend_data_id=False, delimiter=':'):
+                 quiet=False, prepend_data_id=False, delimiter=':',
+                 compile_regex=False):
         """Create a parser that will parse field values out of a text record
         and return either a Python dict of data_id, timestamp and fields,
         a JSON encoding of that dict, or a binary DASRecord.
@@ -85,6 +87,11 @@ class RecordParser:
             The string to insert between data_id and field_name when prepend_data_id is true.
             Defaults to ':'.
             Not used if prepend_data_id is false.
+
+        compile_regex
+            If true, match field patterns using the regular expressions and
+            type converters generated for them by the parse module directly,
+            rather than going through parse.Parser.parse().
         ```
         """
         if not PARSE_INSTALLED:
@@ -108,6 +115,7 @@ class RecordParser:
         self.metadata_last_sent = {}
         self.prepend_data_id = prepend_data_id
         self.delimiter = delimiter
+        self.compile_regex = compile_regex
 
         # If we've been explicitly given the field_patterns we're to use for
         # parsing, compile them now. Patterns may either be a list of strings,
@@ -116,6 +124,16 @@ class RecordParser:
             self.compiled_field_patterns = self._compile_formats_from_patterns(field_patterns)
             self.metadata = metadata
 
+            # Index them by leading token for quick lookup; if we've got a
+            # dict of patterns, keep a separate index for each key.
+            if isinstance(field_patterns, dict):
+                self.field_pattern_index = {
+                    data_id: PatternIndex(patterns, compile_regex)
+                    for data_id, patterns in self.compiled_field_patterns.items()}
+            else:
+                self.field_pattern_index = PatternIndex(self.compiled_field_patterns,
+                                                        compile_regex)
+
         # If we've not been given field_patterns to use for parsing, read in all
         # the devices and device types to compile them.
         else:
@@ -146,6 +164,8 @@ class RecordParser:
                                      % device_type)
                 compiled_format = self._compile_formats_from_patterns(format)
                 self.device_types[device_type]['compiled_format'] = compiled_format
+                self.device_types[device_type]['format_index'] = \
+                    PatternIndex(compiled_format, compile_regex)
 
             # Metadata: If we haven't been handed a dict of metadata, compile it from
             # the devices we've read.
@@ -242,16 +262,16 @@ class RecordParser:
         if self.field_patterns:
             # If field_patterns is a dict, see if our data_id matches any of the keys
             if isinstance(self.field_patterns, dict):
-                patterns = self.compiled_field_patterns.get(data_id)
+                pattern_index = self.field_pattern_index.get(data_id)
             else:
-                patterns = self.compiled_field_patterns
+                pattern_index = self.field_pattern_index
 
             # If no patterns to try, go home emptyhanded
-            if not patterns:
+            if not pattern_index or not pattern_index.patterns:
                 if not self.quiet:
                     logging.warning(f'No parse field patterns matched data_id "{data_id}"')
                 return None
-            fields, message_type = self._parse_field_string(field_string, patterns)
+            fields, message_type = pattern_index.parse(field_string)
 
         # If we were given no explicit field_patterns to use, we need to
         # count on the record having a data_id that lets us figure out
@@ -294,7 +314,7 @@ class RecordParser:
         if metadata:
             parsed_record['metadata'] = metadata
 
-        logging.debug('Created parsed record: %s', pprint.pformat(parsed_record))
+        logging.debug('Created parsed record: %s', lazy_pformat(parsed_record))
 
         # What are we going to do with the result we've created?
         if self.return_das_record:
@@ -310,41 +330,6 @@ class RecordParser:
         else:
             return parsed_record
 
-    ############################
-    def _parse_field_string(self, field_string, compiled_field_patterns):
-        # Default if we don't match anything
-        fields = message_type = None
-
-        # If our pattern(s) are just a single compiled parser, try parsing and
-        # return with no message type.
-        if isinstance(compiled_field_patterns, parse.Parser):
-            result = compiled_field_patterns.parse(field_string)
-            if result:
-                fields = result.named
-
-        # Else, if it's a list, try it out on all the elements.
-        elif isinstance(compiled_field_patterns, list):
-            for pattern in compiled_field_patterns:
-                fields, message_type = self._parse_field_string(field_string, pattern)
-                if fields is not None:
-                    break
-
-        # If it's a dict, try out on all values, using the key as message type.
-        # It's syntactically possible for the internal set of patterns to have
-        # their own message types. Not sure why someone would ever create patterns
-        # that did this, but if they do, let that override our base one.
-        elif isinstance(compiled_field_patterns, dict):
-            for message_type, pattern in compiled_field_patterns.items():
-                fields, int_message_type = self._parse_field_string(field_string, pattern)
-                message_type = int_message_type or message_type
-                if fields is not None:
-                    break
-        else:
-            raise ValueError('Unexpected pattern type in parser: %s'
-                             % type(compiled_field_patterns))
-
-        return fields, message_type
-
     ############################
     def parse_for_data_id(self, data_id, field_string):
         """Look up the device and device type for a data_id. Parse the field_string
@@ -379,9 +364,8 @@ class RecordParser:
                 logging.error('No definition found for device_type "%s"', device_type)
             return failure_values
 
-        compiled_format_patterns = device_definition.get('compiled_format')
-        parsed_fields, message_type = \
-            self._parse_field_string(field_string, compiled_format_patterns)
+        # Only try the formats whose leading token matches our field string
+        parsed_fields, message_type = device_definition['format_index'].parse(field_string)
 
         # Did we get anything?
         if parsed_fields is None:
@@ -389,7 +373,7 @@ class RecordParser:
                 logging.warning('No formats matched field_string "%s"', field_string)
             return failure_values
 
-        logging.debug('Got fields: %s', pprint.pformat(parsed_fields))
+        logging.debug('Got fields: %s', lazy_pformat(parsed_fields))
 
         # Finally, convert field values to variable names specific to device
         device_fields = device.get('fields')
@@ -413,7 +397,7 @@ class RecordParser:
                 value = value.timestamp()
             fields[variable_name] = value
 
-        logging.debug('Got fields: %s', pprint.pformat(fields))
+        logging.debug('Got fields: %s', lazy_pformat(fields))
         return fields, message_type
 
     ############################
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+"""Fast dispatch of field strings to the parse patterns that might match
+them.
+
+A device type may define a dozen or more formats, and RecordParser would
+otherwise try each of them in turn until one matches. But most formats
+(NMEA sentences in particular) begin with a token, such as '$GPGGA,',
+'${:2l}GGA,' or '$PSXN,20,', that tells us right away whether they have
+any chance of matching. A PatternIndex notes the leading token of each
+of a set of compiled patterns, so that parsing a field string only tries
+the patterns whose token matches the string's first token, plus any
+patterns that don't begin with a recognizable token at all. The list of
+candidates for each token is worked out the first time the token is
+seen and cached. Patterns are still tried in their original order, so
+the result is the same as trying them all.
+
+    index = PatternIndex(compiled_patterns)
+    fields, message_type = index.parse('$GPGGA,002705.69,2200.000,N,...')
+
+If compile_regex is True, each pattern will also be matched using the
+regular expression and type converters that the parse module generated
+for it, bypassing the construction of a full parse.Result for every
+record. Patterns that need features of parse.Result (such as
+'{name[key]}' style nested field names) are left to the parse module.
+"""
+import re
+
+try:
+    import parse
+    PARSE_INSTALLED = True
+except ImportError:
+    PARSE_INSTALLED = False
+
+# Characters that may end the leading token of a field string
+TOKEN_DELIMITER = re.compile(r'[,\s]')
+
+# Field types that may appear within a leading token, because they can
+# never match a token delimiter.
+TOKEN_FIELD_TYPES = {'l', 'w'}
+
+# Maximum number of distinct tokens for which to cache candidate lists
+MAX_CACHED_TOKENS = 1024
+
+
+############################
+def leading_token_format(format):
+    """Return the part of a parse format that comes before the first
+    token delimiter in its literal text, or None if there is no such
+    delimiter."""
+    i = 0
+    while i < len(format):
+        if format.startswith('{{', i) or format.startswith('}}', i):
+            i += 2
+        elif format[i] == '{':
+            end = format.find('}', i)
+            if end == -1:
+                return None
+            i = end + 1
+        elif TOKEN_DELIMITER.match(format, i):
+            return format[:i]
+        else:
+            i += 1
+    return None
+
+
+############################
+def token_matcher(format):
+    """Return a function that takes a (lowercased) leading token from a
+    field string and returns whether a field string beginning with it
+    could possibly match the parse format. Return None if we can't tell,
+    in which case the format should be tried on everything."""
+    token_format = leading_token_format(format)
+    if not token_format:
+        return None
+
+    fields = re.findall(r'(?<!{){([^{}]*)}', token_format.replace('{{', ''))
+    if not fields:
+        token = token_format.replace('{{', '{').replace('}}', '}').lower()
+        return token.__eq__
+
+    # Only allow fields that can't swallow a delimiter
+    for field in fields:
+        field_type = field.split(':', 1)[1] if ':' in field else ''
+        if field_type.lstrip('0123456789') not in TOKEN_FIELD_TYPES:
+            return None
+    token_parser = parse.compile(token_format)
+    return lambda token: token_parser.parse(token) is not None
+
+
+############################
+def leading_token(text):
+    """Return the (lowercased) text before the first token delimiter in
+    text, or None if there's no delimiter."""
+    match = TOKEN_DELIMITER.search(text)
+    if match is None:
+        return None
+    return text[:match.start()].lower()
+
+
+############################
+def flatten_patterns(patterns):
+    """Return a list of (message_type, parser) pairs from a parser, or
+    list/dict of parsers, in the order they should be tried. As with
+    RecordParser, the message type of a pattern is the innermost dict key
+    under which it was found, if any.
+    """
+    if isinstance(patterns, parse.Parser):
+        return [(None, patterns)]
+    elif isinstance(patterns, list):
+        return [pair for pattern in patterns for pair in flatten_patterns(pattern)]
+    elif isinstance(patterns, dict):
+        return [(inner_message_type or message_type, parser)
+                for message_type, pattern in patterns.items()
+                for inner_message_type, parser in flatten_patterns(pattern)]
+    else:
+        raise ValueError('Unexpected pattern type in parser: %s' % type(patterns))
+
+
+############################
+def compile_fields_parser(parser):
+    """Return a function that, given a string, returns the dict of named
+    fields that parser would return for it, or None if it doesn't match.
+    Return None if parser can't be handled this way.
+    """
+    try:
+        match_re = parser._match_re
+        conversions = parser._type_conversions
+        names = [(group, parser._group_to_name_map[group])
+                 for group in parser._named_fields]
+    except (AttributeError, KeyError):
+        return None
+
+    # Nested field names need parse.Result to expand them
+    if any('[' in name for group, name in names):
+        return None
+
+    def parse_fields(field_string):
+        match = match_re.match(field_string)
+        if match is None:
+            return None
+        groups = match.groupdict()
+        fields = {}
+        for group, name in names:
+            value = groups[group]
+            if group in conversions:
+                value = conversions[group](value, match)
+            fields[name] = value
+        return fields
+
+    return parse_fields
+
+
+################################################################################
+class PatternIndex:
+    """Index compiled parse patterns by their leading literal token."""
+
+    ############################
+    def __init__(self, compiled_patterns, compile_regex=False):
+        """
+        ```
+        compiled_patterns
+                A parse.Parser, or list or dict of them (possibly nested),
+                in the form produced by RecordParser.
+
+        compile_regex
+                If True, match patterns using their generated regular
+                expressions and type converters directly.
+        ```
+        """
+        if not PARSE_INSTALLED:
+            raise ImportError('PatternIndex requires Python "parse" module; '
+                              'please run "pip install parse"')
+
+        # (message_type, parser, parse_fields) for every pattern, in order
+        self.patterns = []
+        for message_type, parser in flatten_patterns(compiled_patterns):
+            parse_fields = compile_fields_parser(parser) if compile_regex else None
+            self.patterns.append((message_type, parser, parse_fields))
+
+        # For each pattern, a function telling us whether a leading token
+        # is compatible with it, or None if the pattern must always be tried.
+        self.token_matchers = [token_matcher(parser.format)
+                               for message_type, parser, parse_fields in self.patterns]
+        self.unindexed = [pattern for pattern, matcher
+                          in zip(self.patterns, self.token_matchers) if matcher is None]
+
+        # Map from leading token to list of candidate patterns for it
+        self.token_candidates = {}
+
+    ############################
+    def candidates(self, field_string):
+        """Return the (message_type, parser, parse_fields) tuples for the
+        patterns that might match field_string, in the order they should be
+        tried."""
+        token = leading_token(field_string)
+        if token is None:
+            return self.unindexed
+
+        candidates = self.token_candidates.get(token)
+        if candidates is None:
+            candidates = [pattern for pattern, matcher
+                          in zip(self.patterns, self.token_matchers)
+                          if matcher is None or matcher(token)]
+            if len(self.token_candidates) < MAX_CACHED_TOKENS:
+                self.token_candidates[token] = candidates
+        return candidates
+
+    ############################
+    def parse(self, field_string):
+        """Return (fields, message_type) for the first pattern that matches
+        field_string, or (None, None) if none do."""
+        for message_type, parser, parse_fields in self.candidates(field_string):
+            if parse_fields is not None:
+                fields = parse_fields(field_string)
+            else:
+                result = parser.parse(field_string)
+                fields = result.named if result else None
+            if fields is not None:
+                return fields, message_type
+        return None, None
@@ -5,7 +5,6 @@
 import datetime
 import logging
 import re
-import pprint
 import sys
 import time
 
@@ -18,6 +17,7 @@ sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.utils.read_config import load_definitions  # noqa: E402
 from logger.utils.das_record import collect_metadata_for_fields  # noqa: E402
+from logger.utils.lazy_logging import lazy_pformat  # noqa: E402
 
 # Import ConvertFieldsTransform, but handle gracefully if unavailable
 try:
@@ -288,7 +288,7 @@ class RegexParser:
                     except Exception as e:
                         logging.error(e)
 
-        logging.debug('Created parsed fields: %s', pprint.pformat(fields))
+        logging.debug('Created parsed fields: %s', lazy_pformat(fields))
 
         # Create the initial DASRecord
         try:
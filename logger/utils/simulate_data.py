@@ -337,7 +337,7 @@ class SimSerial:
                                                 eol=self.input_eol, quiet=self.quiet)
 
                 # We've now got a record. Try parsing timestamp off it
-                logging.debug(f'Read record: "{record}"')
+                logging.debug('Read record: "%s"', record)
                 try:
                     parsed_record = self.compiled_record_format.parse(record).named
                     record = parsed_record['record']
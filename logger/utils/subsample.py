@@ -1,9 +1,240 @@
 #!/usr/bin/env python3
-"""
+"""Windowed aggregation of timestamped values, as used by
+SubsampleTransform.
+
+A Subsampler takes (timestamp, value) pairs one at a time and emits an
+aggregate every 'interval' seconds, each computed over the values that
+fall strictly within 'window' seconds centered on the output timestamp.
+Rather than recomputing each window from scratch, it keeps the values
+currently in the window in a deque along with running aggregates (a sum
+for boxcar averages, sums of sines and cosines for polar averages,
+monotonic deques for minima and maxima). As the window slides forward,
+each value is added once and expired once, so the cost per input value
+is O(1) amortized, regardless of window size.
+
+    subsampler = Subsampler({'type': 'boxcar_average', 'window': 60, 'interval': 10})
+    for timestamp, value in pairs:
+        subsampler.add(timestamp, value)
+    results = subsampler.emit(now=time.time())   # [(timestamp, average),...]
+
+Recognized algorithm types are 'boxcar_average', 'polar_average' (for
+angles in degrees), 'min' and 'max'. All take 'window' and 'interval'
+parameters, each defaulting to 10 seconds.
 """
 import logging
 
+from collections import deque
+from math import atan2, cos, degrees, radians, sin
+
+
+################################################################################
+class BoxcarAverage:
+    """Running mean of the values in the window."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, pair):
+        self.total += pair[1]
+        self.count += 1
+
+    def expire(self, pair):
+        self.count -= 1
+        # Start afresh when empty so floating point error can't accumulate
+        self.total = self.total - pair[1] if self.count else 0
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+################################################################################
+class PolarAverage:
+    """Running mean direction of angles (in degrees) in the window."""
+
+    def __init__(self):
+        self.count = 0
+        self.sin_total = 0
+        self.cos_total = 0
+
+    def add(self, pair):
+        angle = radians(pair[1])
+        self.sin_total += sin(angle)
+        self.cos_total += cos(angle)
+        self.count += 1
+
+    def expire(self, pair):
+        self.count -= 1
+        if not self.count:
+            self.sin_total = self.cos_total = 0
+            return
+        angle = radians(pair[1])
+        self.sin_total -= sin(angle)
+        self.cos_total -= cos(angle)
+
+    def result(self):
+        if not self.count:
+            return None
+        angle = degrees(atan2(self.sin_total, self.cos_total))
+        return angle + 360 if angle < 0 else angle
+
+
+################################################################################
+class WindowMin:
+    """Minimum of the values in the window, via a monotonic deque: each
+    entry is smaller than everything after it, so the front is the
+    minimum, and entries that can never be the minimum aren't kept."""
+
+    def __init__(self):
+        self.candidates = deque()
+
+    def _dominates(self, new_value, old_value):
+        return new_value <= old_value
+
+    def add(self, pair):
+        candidates = self.candidates
+        while candidates and self._dominates(pair[1], candidates[-1][1]):
+            candidates.pop()
+        candidates.append(pair)
+
+    def expire(self, pair):
+        if self.candidates and self.candidates[0] is pair:
+            self.candidates.popleft()
+
+    def result(self):
+        return self.candidates[0][1] if self.candidates else None
+
+
+################################################################################
+class WindowMax(WindowMin):
+    """Maximum of the values in the window."""
+
+    def _dominates(self, new_value, old_value):
+        return new_value >= old_value
+
+
+# Map from algorithm type to the class that computes it
+AGGREGATORS = {
+    'boxcar_average': BoxcarAverage,
+    'polar_average': PolarAverage,
+    'min': WindowMin,
+    'max': WindowMax,
+}
 
+
+################################################################################
+class Subsampler:
+    """Streaming, incremental windowed aggregation of one field's values."""
+
+    ############################
+    def __init__(self, algorithm, last_timestamp=None):
+        """
+        ```
+        algorithm  Dict specifying the algorithm 'type' (one of the keys of
+                   AGGREGATORS) and optional 'window' and 'interval', e.g.
+                   {'type': 'boxcar_average', 'window': 30, 'interval': 10}
+
+        last_timestamp
+                   Timestamp of the last value that was output, if any;
+                   the next will be at least 'interval' seconds later
+        ```
+        Raises ValueError if the algorithm isn't recognized.
+        """
+        if not isinstance(algorithm, dict):
+            raise ValueError('Subsample algorithm specification must be a dict; '
+                             'got %s' % algorithm)
+        aggregator_class = AGGREGATORS.get(algorithm.get('type'))
+        if aggregator_class is None:
+            raise ValueError('Unrecognized subsample algorithm type: %s'
+                             % algorithm.get('type'))
+        self.aggregator = aggregator_class()
+        self.interval = algorithm.get('interval', 10)  # How often to output
+        self.window = algorithm.get('window', 10)      # How far back to average
+        self.last_timestamp = last_timestamp
+
+        self.pending = deque()   # pairs not yet in the window, in time order
+        self.in_window = deque()  # pairs in the window, in time order
+        self.next_timestamp = None  # timestamp of next output
+
+    ############################
+    def add(self, timestamp, value):
+        """Add a new (timestamp, value) pair."""
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            logging.warning('Trying to subsample non-numeric value "%s"', value)
+            return
+        pair = (timestamp, value)
+        if self.next_timestamp is None:
+            # Start outputting once we have a full window for the first value
+            self.next_timestamp = timestamp + self.window / 2
+            if self.last_timestamp is not None:
+                self.next_timestamp = max(self.next_timestamp,
+                                          self.last_timestamp + self.interval)
+
+        # Values almost always arrive in order; if this one didn't, slot it
+        # into place among those not yet averaged, or drop it if it belongs
+        # to a window we've already moved past.
+        pending = self.pending
+        if self.in_window and timestamp < self.in_window[-1][0]:
+            logging.debug('Dropping out-of-order value %s for subsample', pair)
+        elif pending and timestamp < pending[-1][0]:
+            index = len(pending) - 1
+            while index > 0 and timestamp < pending[index - 1][0]:
+                index -= 1
+            pending.insert(index, pair)
+        else:
+            pending.append(pair)
+
+    ############################
+    def emit(self, now):
+        """Return a list of (timestamp, aggregate) pairs for all output
+        timestamps whose windows are complete as of 'now', i.e. those at
+        least window/2 seconds ago."""
+        results = []
+        if self.next_timestamp is None:
+            return results
+
+        half_window = self.window / 2
+        pending = self.pending
+        in_window = self.in_window
+        aggregator = self.aggregator
+
+        while self.next_timestamp <= now - half_window:
+            start = self.next_timestamp - half_window
+            end = self.next_timestamp + half_window
+
+            # If there's a gap in the data, skip ahead to the first output
+            # timestamp whose window will include the next value.
+            if not in_window:
+                if not pending:
+                    break
+                skip_to = pending[0][0] - half_window
+                if self.next_timestamp <= skip_to:
+                    steps = int((skip_to - self.next_timestamp) / self.interval) + 1
+                    self.next_timestamp += steps * self.interval
+                    continue
+
+            # Slide window forward: take in new values, then expire old
+            while pending and pending[0][0] < end:
+                pair = pending.popleft()
+                in_window.append(pair)
+                aggregator.add(pair)
+            while in_window and in_window[0][0] <= start:
+                aggregator.expire(in_window.popleft())
+
+            value = aggregator.result()
+            if value is None and not pending:
+                # Nothing to output yet; values for this window may still
+                # be on their way (e.g. when replaying old data).
+                break
+            if value is not None:
+                results.append((self.next_timestamp, value))
+                self.last_timestamp = self.next_timestamp
+            self.next_timestamp += self.interval
+
+        return results
+
+
+############################
 def subsample(algorithm, values, latest_timestamp, now):
     """An omnibus routine for taking a list of timestamped values, a
     specification of an averaging algorithm, and returning a list of
@@ -18,6 +249,9 @@ def subsample(algorithm, values, latest_timestamp, now):
                  Timestamp of the last value that was output
 
     now          Timestamp now
+
+    Callers that see a stream of values should keep a Subsampler instead,
+    which only has to look at each value once.
     """
     if not isinstance(algorithm, dict):
         logging.warning('Function subsample() handed non-dict algorithm '
@@ -27,65 +261,16 @@ def subsample(algorithm, values, latest_timestamp, now):
         logging.info('Function subsample() handed empty values list')
         return None
 
-    alg_type = algorithm.get('type')
-
-    ##################
-    # Select algorithm
-
-    # boxcar_average: all values within symmetric interval window get
-    # same weight.
-    if alg_type == 'boxcar_average':
-        interval = algorithm.get('interval', 10)  # How often to output
-        window = algorithm.get('window', 10)     # How far back to average
-
-        # Which timestamps are we going to emit as averages? Start at
-        # 'interval' seconds after the last timestamp we emitted and end
-        # at 'window/2' seconds before now, because we want to have a full
-        # 'window' seconds available for most recent point.
-        ts = max(latest_timestamp + interval, values[0][0] + window / 2)
-        ts_list = []
-        while ts <= now - window / 2:
-            ts_list.append(ts)
-            ts += interval
-
-        if not ts_list:
-            logging.debug('No timestamps to emit this time')
-            return None
-
-        # Start and end intervals for data for each timestamp
-        ts_start = {ts: (ts - window / 2) for ts in ts_list}
-        ts_end = {ts: (ts + window / 2) for ts in ts_list}
-        ts_data = {ts: [] for ts in ts_list}
-
-        # Iterate through values backwards until we're outside the window
-        # of the first output ts.
-        earliest_ts_of_interest = ts_list[0] - window / 2
-        for v_index in range(len(values) - 1, -1, -1):
-            (value_ts, value) = values[v_index]
-            if value_ts < earliest_ts_of_interest:
-                break
-
-            # Does this ts,value pair belong in any of our averages?
-            for ts in ts_list:
-                if value_ts > ts_start[ts] and value_ts < ts_end[ts]:
-                    ts_data[ts].append(value)
-
-        # Assemble averages for all timestamps we're going to emit
-        results = []
-        for ts in ts_list:
-            if type(ts) not in [int, float, bool]:
-                logging.warning('Trying to subsample non-numeric value "%s"', ts)
-                continue
-            if len(ts_data[ts]):
-                try:
-                    results.append((ts, sum(ts_data[ts]) / len(ts_data[ts])))
-                except TypeError:
-                    logging.warning('Non-numeric input in subsample: %s, in %s, list: %s',
-                                    ts_data[ts], ts_data, ts_list)
-
-        return results
-
-    else:
+    try:
+        subsampler = Subsampler(algorithm, latest_timestamp)
+    except ValueError:
         logging.warning('Function subsample() received unrecognized algorithm '
-                        'type: %s', alg_type)
+                        'type: %s', algorithm.get('type'))
+        return None
+    for timestamp, value in values:
+        subsampler.add(timestamp, value)
+    results = subsampler.emit(now)
+    if not results:
+        logging.debug('No timestamps to emit this time')
         return None
+    return results
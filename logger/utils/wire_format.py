@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Encodings for messages exchanged with a CachedDataServer.
+
+JSON text is the default, and is what browser displays speak. If the
+msgpack module is installed, clients may instead ask for 'msgpack', which
+is sent as binary websocket frames. MessagePack encodes floats (e.g.
+timestamps) in 9 bytes rather than as ~18 characters of text, and is
+considerably cheaper to produce and parse.
+
+A client selects the encoding of the data messages it receives with an
+'encoding' key in its subscribe request:
+```
+  {'type': 'subscribe', 'encoding': 'msgpack', 'fields': {...}}
+```
+In msgpack-encoded 'field_dict' data messages, field names are replaced
+by small integer ids. The first message to use an id also carries its
+name, in a 'field_ids' map:
+```
+  {'type': 'data', 'status': 200,
+   'field_ids': {'S330CourseTrue': 0},
+   'data': {0: [[1555468528.452, 217.4], ...]}}
+```
+Ids are assigned per connection, so a client starting a new connection
+should forget the ids it learned on the old one (see FieldIdDecoder).
+
+Requests, including publish requests, may be sent either as JSON text
+or as msgpack binary frames; the server decodes each according to its
+frame type.
+"""
+import json
+
+try:
+    import msgpack
+    MSGPACK_ENABLED = True
+except ImportError:
+    MSGPACK_ENABLED = False
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+
+################################################################################
+class DecodeError(ValueError):
+    """A message couldn't be decoded."""
+    pass
+
+
+############################
+def available_encodings():
+    """Return a list of the encodings we're able to use."""
+    return [JSON, MSGPACK] if MSGPACK_ENABLED else [JSON]
+
+
+############################
+def check_encoding(encoding):
+    """Raise ValueError if we can't use the named encoding."""
+    if encoding not in available_encodings():
+        raise ValueError('Unsupported encoding "%s"; available encodings are %s%s'
+                         % (encoding, available_encodings(),
+                            '' if MSGPACK_ENABLED else
+                            ' (try "pip install msgpack" to enable msgpack)'))
+
+
+############################
+def encode(message, encoding=JSON):
+    """Encode a message: a str for JSON, bytes for msgpack."""
+    if encoding == MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message)
+
+
+############################
+def decode(message):
+    """Decode a message received as text (JSON) or bytes (msgpack).
+    Raises DecodeError if it can't be decoded."""
+    try:
+        if isinstance(message, str):
+            return json.loads(message)
+        if not MSGPACK_ENABLED:
+            raise DecodeError('received binary message, but msgpack not installed')
+        return msgpack.unpackb(message, raw=False, strict_map_key=False)
+    except DecodeError:
+        raise
+    except (ValueError, TypeError) as e:  # includes all msgpack unpack errors
+        raise DecodeError(str(e))
+
+
+############################
+def pack_values(values):
+    """Pack a list of [timestamp, value] pairs for later use in
+    pack_data_message(). Return a (count, body) pair, where body is the
+    msgpack encoding of the list minus its array header, so that the
+    bodies of consecutive lists can be concatenated."""
+    header = msgpack.Packer().pack_array_header(len(values))
+    return (len(values), msgpack.packb(values, use_bin_type=True)[len(header):])
+
+
+############################
+def pack_data_message(results, field_ids=None):
+    """Assemble a msgpack 'field_dict' data message from a dict mapping
+    field ids to lists of (count, body) pairs as returned by pack_values(),
+    without unpacking and repacking them. If field_ids is non-empty,
+    include it as the message's map from newly-assigned names to ids."""
+    packer = msgpack.Packer(use_bin_type=True)
+    parts = [packer.pack_map_header(4 if field_ids else 3),
+             packer.pack('type'), packer.pack('data'),
+             packer.pack('status'), packer.pack(200)]
+    if field_ids:
+        parts += [packer.pack('field_ids'), packer.pack(field_ids)]
+    parts += [packer.pack('data'), packer.pack_map_header(len(results))]
+    for field_id, packed_lists in results.items():
+        parts.append(packer.pack(field_id))
+        parts.append(packer.pack_array_header(sum(count for count, body in packed_lists)))
+        parts.extend(body for count, body in packed_lists)
+    return b''.join(parts)
+
+
+################################################################################
+class FieldIdEncoder:
+    """Assign per-connection integer ids to field names."""
+
+    ############################
+    def __init__(self):
+        self.ids = {}
+        self.new_ids = {}  # name: id for ids not yet sent to client
+
+    ############################
+    def id(self, field_name):
+        """Return the id for field_name, assigning one if needed."""
+        field_id = self.ids.get(field_name)
+        if field_id is None:
+            field_id = self.ids[field_name] = len(self.ids)
+            self.new_ids[field_name] = field_id
+        return field_id
+
+    ############################
+    def take_new_ids(self):
+        """Return the ids assigned since the last call, for sending."""
+        new_ids, self.new_ids = self.new_ids, {}
+        return new_ids
+
+
+################################################################################
+class FieldIdDecoder:
+    """Turn the field ids in compact data messages back into names."""
+
+    ############################
+    def __init__(self):
+        self.names = {}
+
+    ############################
+    def reset(self):
+        """Forget all ids, e.g. when starting a new connection."""
+        self.names = {}
+
+    ############################
+    def expand(self, response):
+        """Given a decoded data message, replace field ids in its 'data'
+        map with field names. Messages without ids are returned as-is."""
+        for field_name, field_id in response.pop('field_ids', {}).items():
+            self.names[field_id] = field_name
+        data = response.get('data')
+        if isinstance(data, dict):
+            response['data'] = {self.names.get(key, key): values
+                                for key, values in data.items()}
+        return response
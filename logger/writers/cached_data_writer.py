@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import asyncio
+import collections
 import json
 import logging
+import os
 import ssl
 import sys
 import threading
@@ -18,14 +20,256 @@ from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.writers.writer import Writer  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
+from logger.utils import wire_format  # noqa: E402
 
 
+# Most records to send in a single publish message
+BATCH_SIZE = 500
+
+# Most publish messages to have sent but not yet had acknowledged
+MAX_IN_FLIGHT = 4
+
+
+################################################################################
+class CachedDataPublisher:
+    """Maintain a websocket connection to a CachedDataServer and publish
+    queued records over it. Get one via CachedDataPublisher.shared() so
+    that all the CachedDataWriters in a process that feed the same data
+    server share a single connection and send thread.
+
+    Rather than sending one record and waiting for it to be acknowledged
+    before sending the next, the publisher sends whatever has accumulated
+    in its queue (up to BATCH_SIZE records) as a single publish message,
+    and keeps up to MAX_IN_FLIGHT such messages outstanding while a
+    separate task reads the server's acknowledgements. Records in messages
+    that haven't been acknowledged when the connection drops are requeued
+    and sent again once it's reestablished.
+    """
+    # Map from (pid, data_server, use_wss, check_cert, max_backup, encoding)
+    # to publisher
+    _publishers = {}
+    _publishers_lock = threading.Lock()
+
+    ############################
+    @classmethod
+    def shared(cls, data_server, use_wss=False, check_cert=False, max_backup=0,
+               encoding=wire_format.JSON):
+        """Return the publisher for this process and these arguments,
+        creating it if necessary."""
+        # A forked child inherits the dict, but not the threads behind it.
+        key = (os.getpid(), data_server, use_wss, check_cert, max_backup, encoding)
+        with cls._publishers_lock:
+            publisher = cls._publishers.get(key)
+            if publisher is None:
+                publisher = cls(data_server, use_wss, check_cert, max_backup, encoding)
+                cls._publishers[key] = publisher
+            return publisher
+
+    ############################
+    def __init__(self, data_server, use_wss=False, check_cert=False, max_backup=0,
+                 encoding=wire_format.JSON):
+        """
+        ```
+        data_server   host:port on which to look for data server
+
+        use_wss, check_cert, max_backup, encoding - as for CachedDataWriter
+        ```
+        """
+        self.data_server = data_server
+        self.use_wss = use_wss
+        self.check_cert = check_cert
+        self.encoding = encoding
+
+        # Records waiting to be sent. Once full, appending a new record
+        # drops the oldest one. Appends from writer threads are safe.
+        self.queue = collections.deque(maxlen=max_backup or None)
+
+        # Set (from whatever thread is writing) to wake the send loop
+        # when new records arrive; wakeup_pending saves us from
+        # scheduling a wakeup for every record while it's busy.
+        self.have_records = None
+        self.wakeup_pending = False
+
+        self.event_loop = asyncio.new_event_loop()
+        self.publisher_thread = threading.Thread(
+            name='cached_data_publisher_thread',
+            target=self._publisher_loop, daemon=True)
+        self.publisher_thread.start()
+
+    ############################
+    def put(self, record):
+        """Queue a record (dict) for sending. Called from writer threads."""
+        if len(self.queue) == self.queue.maxlen:
+            logging.debug('CachedDataWriter queue full - dropping oldest...')
+        self.queue.append(record)
+        if not self.wakeup_pending:
+            self.wakeup_pending = True
+            try:
+                self.event_loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:  # event loop has been closed
+                pass
+
+    ############################
+    def _wake(self):
+        if self.have_records is not None:
+            self.have_records.set()
+
+    ############################
+    def _publisher_loop(self):
+        """Run the async send loop in our own event loop."""
+        self.event_loop.run_until_complete(self._async_send_records_loop())
+        self.event_loop.close()
+
+    ############################
+    async def _async_send_records_loop(self):
+        """(Re)connect to the data server and publish records as they arrive."""
+        self.have_records = asyncio.Event()
+        while True:
+            logging.debug('CachedDataWriter trying to connect to '
+                          + self.data_server)
+            try:
+                if self.use_wss:
+                    # If check_cert is a str, take it as the location of the
+                    # .pem file we'll check for validity. Otherwise, if not
+                    # False, take as a bool to verify by own means.
+                    ws_data_server = 'wss://' + self.data_server
+                    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS)
+                    if self.check_cert:
+                        if isinstance(self.check_cert, str):
+                            ssl_context.load_verify_locations(self.check_cert)
+                        else:
+                            ssl_context.verify_mode = ssl.CERT_REQUIRED
+                    else:
+                        ssl_context.verify_mode = ssl.CERT_NONE
+
+                else:  # not using wss
+                    ws_data_server = 'ws://' + self.data_server
+                    ssl_context = None
+
+                logging.debug(f'CachedDataWriter connecting to {ws_data_server}')
+                async with websockets.connect(ws_data_server, ssl=ssl_context) as ws:
+                    logging.debug(f'Connected to data server {ws_data_server}')
+                    await self._publish(ws)
+
+                # Server closed the connection cleanly
+                await asyncio.sleep(0.2)
+
+            except BrokenPipeError:
+                pass
+            except AttributeError as e:
+                logging.warning('CachedDataWriter websocket loop error: %s', e)
+                await asyncio.sleep(0.1)
+            except websockets.exceptions.ConnectionClosed:
+                logging.warning('CachedDataWriter lost websocket connection to '
+                                'data server; trying to reconnect.')
+                await asyncio.sleep(0.2)
+
+            except websockets.exceptions.InvalidStatusCode:
+                logging.warning('CachedDataWriter InvalidStatusCode connecting to '
+                                'data server; trying to reconnect.')
+                await asyncio.sleep(0.2)
+
+            # If the websocket connection failed
+            except OSError as e:
+                logging.warning('CachedDataWriter websocket connection to %s '
+                                'failed; sleeping before trying again: %s',
+                                self.data_server, str(e))
+                await asyncio.sleep(5)
+
+    ############################
+    async def _publish(self, ws):
+        """Send batches of queued records over the websocket until the
+        connection closes, keeping at most MAX_IN_FLIGHT unacknowledged.
+        """
+        in_flight = collections.deque()  # batches sent but not acknowledged
+        window_open = asyncio.Event()
+        receiver = asyncio.ensure_future(self._read_acks(ws, in_flight, window_open))
+        try:
+            while not receiver.done():
+                if not self.queue:
+                    # Clear the flag before looking at the queue again, so
+                    # that a record put() after our look will wake us.
+                    self.wakeup_pending = False
+                    self.have_records.clear()
+                    if not self.queue:
+                        await self.have_records.wait()
+                    continue
+
+                if len(in_flight) >= MAX_IN_FLIGHT:
+                    window_open.clear()
+                    await window_open.wait()
+                    continue
+
+                batch = [self.queue.popleft()
+                         for i in range(min(BATCH_SIZE, len(self.queue)))]
+                in_flight.append(batch)
+
+                # Send lone records as a plain dict, as older servers expect
+                data = batch[0] if len(batch) == 1 else batch
+                logging.debug('sending %d records', len(batch))
+                await ws.send(wire_format.encode({'type': 'publish', 'data': data},
+                                                 self.encoding))
+
+            # Raise whatever exception ended the receiver, if any
+            receiver.result()
+        finally:
+            receiver.cancel()
+
+            # Requeue unacknowledged records to send on reconnect
+            self._requeue(in_flight)
+
+    ############################
+    def _requeue(self, batches):
+        """Put the records in a deque of unacknowledged batches back at the
+        front of the queue, in order. They're older than anything queued,
+        so if there isn't room for them all, the oldest are dropped, as
+        when the queue overflows. (Note that extendleft() on a full deque
+        would instead evict the newest records from its other end.)"""
+        records = [record for batch in batches for record in batch]
+        batches.clear()
+        maxlen = self.queue.maxlen
+        while records:
+            # A record put() from another thread meanwhile takes priority
+            if maxlen is not None and len(self.queue) >= maxlen:
+                logging.debug('CachedDataWriter queue full - dropping %d oldest',
+                              len(records))
+                break
+            self.queue.appendleft(records.pop())
+
+    ############################
+    async def _read_acks(self, ws, in_flight, window_open):
+        """Read the server's responses, one per publish message sent, and
+        retire the oldest in-flight batch for each."""
+        try:
+            async for response in ws:
+                logging.debug('received response: %s', response)
+                batch = in_flight.popleft() if in_flight else []
+                try:
+                    response = wire_format.decode(response)
+                except wire_format.DecodeError:
+                    response = {}
+                if response.get('status') != 200:
+                    logging.warning('Data server rejected %d records: %s',
+                                    len(batch), response.get('error', response))
+                window_open.set()
+        finally:
+            # Wake the send loop so it notices that we've stopped
+            window_open.set()
+            self.have_records.set()
+
+
+################################################################################
 class CachedDataWriter(Writer):
     def __init__(self, data_server, start_server=False, back_seconds=480,
                  cleanup_interval=6, update_interval=1,
-                 max_backup=60 * 60 * 24, use_wss=False, check_cert=False, **kwargs):
+                 max_backup=60 * 60 * 24, use_wss=False, check_cert=False,
+                 encoding=wire_format.JSON, **kwargs):
         """Feed passed records to a CachedDataServer via a websocket. Expects
         records in DASRecord or dict formats.
+
+        All CachedDataWriters in a process that write to the same data
+        server share a single websocket connection, over which records are
+        published in batches (see CachedDataPublisher, above).
         ```
         data_server    [host:]port on which to look for data server
 
@@ -49,6 +293,9 @@ class CachedDataWriter(Writer):
                       for validity; if a str, use as local filepath location of .pem
                       file to check against.
 
+        encoding    - 'json' (default) or, if the msgpack module is installed,
+                      'msgpack' to publish records in a compact binary
+                      encoding. See logger/utils/wire_format.py.
         ```
         """
         if not WEBSOCKETS_INSTALLED:
@@ -56,6 +303,7 @@ class CachedDataWriter(Writer):
                               'please run "pip install websockets"')
 
         super().__init__(**kwargs)  # processes 'quiet' and type hints
+        wire_format.check_encoding(encoding)
 
         host_port = data_server.split(':')
         if len(host_port) == 1:
@@ -65,100 +313,14 @@ class CachedDataWriter(Writer):
         else:
             self.data_server = data_server                 # they gave us 'host:8766'
 
-        self.websocket = None
         self.back_seconds = back_seconds
         self.cleanup_interval = cleanup_interval
         self.use_wss = use_wss
         self.check_cert = check_cert
-        self.event_loop = asyncio.new_event_loop()
-
-        # "loop" parameter removed in Ubuntu 22, but needed in earlier releases
-        try:
-            self.send_queue = asyncio.Queue(maxsize=max_backup)
-        except RuntimeError:
-            self.send_queue = asyncio.Queue(maxsize=max_backup, loop=self.event_loop)
-
-        # Start the thread that will asynchronously pull stuff from the
-        # queue and send to the websocket. Also will, if we've got our oue
-        # data server, run cleanup from time to time.
-        self.cached_data_writer_thread = threading.Thread(
-            name='cached_data_writer_thread',
-            target=self._cached_data_writer_loop, daemon=True)
-        self.cached_data_writer_thread.start()
-
-    ############################
-    def _cached_data_writer_loop(self):
-        """Use an inner async function to pull stuff from the queue and send
-        to the websocket. Also, if we've got our oue data server, run
-        cleanup from time to time.
-        """
-
-        ############################
-        async def _async_send_records_loop(self):
-            """Inner async function that actually does websocket writes
-            and cleanups.
-            """
-            while True:
-                logging.debug('CachedDataWriter trying to connect to '
-                              + self.data_server)
-                try:
-                    if self.use_wss:
-                        # If check_cert is a str, take it as the location of the
-                        # .pem file we'll check for validity. Otherwise, if not
-                        # False, take as a bool to verify by own means.
-                        ws_data_server = 'wss://' + self.data_server
-                        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS)
-                        if self.check_cert:
-                            if isinstance(self.check_cert, str):
-                                ssl_context.load_verify_locations(self.check_cert)
-                            else:
-                                ssl_context.verify_mode = ssl.CERT_REQUIRED
-                        else:
-                            ssl_context.verify_mode = ssl.CERT_NONE
-
-                    else:  # not using wss
-                        ws_data_server = 'ws://' + self.data_server
-                        ssl_context = None
-
-                    logging.debug(f'CachedDataWriter connecting to {ws_data_server}')
-                    async with websockets.connect(ws_data_server, ssl=ssl_context) as ws:
-                        logging.debug(f'Connected to data server {ws_data_server}')
-                        while True:
-                            try:
-                                record = self.send_queue.get_nowait()
-                                logging.debug('sending record: %s', record)
-                                record = {'type': 'publish', 'data': record}
-                                await ws.send(json.dumps(record))
-                                response = await ws.recv()
-                                logging.debug('received response: %s', response)
-                            except asyncio.QueueEmpty:
-                                await asyncio.sleep(.2)
-
-                except BrokenPipeError:
-                    pass
-                except AttributeError as e:
-                    logging.warning('CachedDataWriter websocket loop error: %s', e)
-                    await asyncio.sleep(0.1)
-                except websockets.exceptions.ConnectionClosed:
-                    logging.warning('CachedDataWriter lost websocket connection to '
-                                    'data server; trying to reconnect.')
-                    await asyncio.sleep(0.2)
-
-                except websockets.exceptions.InvalidStatusCode:
-                    logging.warning('CachedDataWriter InvalidStatusCode connecting to '
-                                    'data server; trying to reconnect.')
-                    await asyncio.sleep(0.2)
-
-                # If the websocket connection failed
-                except OSError as e:
-                    logging.warning('CachedDataWriter websocket connection to %s '
-                                    'failed; sleeping before trying again: %s',
-                                    self.data_server, str(e))
-                    await asyncio.sleep(5)
-
-        # Now call the async process in its own event loop
-        self.event_loop.run_until_complete(_async_send_records_loop(self))
-        self.event_loop.close()
+        self.publisher = CachedDataPublisher.shared(self.data_server, use_wss=use_wss,
+                                                    check_cert=check_cert,
+                                                    max_backup=max_backup,
+                                                    encoding=encoding)
 
     ############################
     def write(self, record: Union[DASRecord, dict]):
@@ -210,19 +372,7 @@ class CachedDataWriter(Writer):
         if isinstance(record, DASRecord):
             record = json.loads(record.as_json())
         if isinstance(record, dict):
-            # If our local queue is full, throw away the oldest entries
-            while self.send_queue.full():
-                try:
-                    logging.debug('CachedDataWriter queue full - dropping oldest...')
-                    self.send_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    logging.warning('CachedDataWriter queue is both full and empty?!?')
-
-            # Enqueue our latest record for send
-            try:
-                self.send_queue.put_nowait(record)
-            except asyncio.queues.QueueFull:
-                logging.warning('CachedDataWriter unable to write: write queue full')
+            self.publisher.put(record)
         else:
             if not self.quiet:
                 logging.warning('CachedDataWriter got non-dict/DASRecord object of '
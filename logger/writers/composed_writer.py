@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 
 import logging
+import queue
 import sys
 import threading
+import time
 
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.writers.writer import Writer  # noqa: E402
 
+# What to do when a queued writer's input queue is full
+OVERFLOW_POLICIES = ['block', 'drop_oldest', 'drop_newest']
+
 
 class ComposedWriter(Writer):
     ############################
-    def __init__(self, transforms=[], writers=[], **kwargs):
+    def __init__(self, transforms=[], writers=[], queue_size=0,
+                 overflow_policy='block', **kwargs):
         """
         Apply zero or more Transforms (in series) to passed records, then
         write them (in parallel threads) using the specified Writers.
@@ -20,6 +26,20 @@ class ComposedWriter(Writer):
         transforms     A single Transform, a list of Transforms, or None.
 
         writers        A single Writer or a list of Writers.
+
+        queue_size     If zero (the default), spin up a thread per writer
+                       for each record and wait for all writes to complete
+                       before returning. If greater than zero, give each
+                       writer a single long-lived worker thread fed by an
+                       input queue of this size; write() then returns as soon
+                       as the record has been queued. (When called via
+                       write_batch(), each queued item is a whole batch.)
+
+        overflow_policy  What to do, when queue_size is non-zero, if a slow
+                       writer's queue is full: 'block' (the default) waits
+                       for space, 'drop_oldest' discards the oldest queued
+                       record to make room, 'drop_newest' discards the new
+                       record.
         ```
         Example:
         ```
@@ -37,6 +57,10 @@ class ComposedWriter(Writer):
         module. We do *not* make this assumption of our writers, and impose a
         lock to prevent a writer's write() method from being called a second
         time if the first has not yet completed.
+
+        Also NOTE: when queue_size is non-zero, exceptions raised by the
+        component writers can no longer be passed back to the caller of
+        write(); they are logged by the worker threads instead.
         """
         super().__init__(**kwargs)  # processes 'quiet' and type hints
 
@@ -57,17 +81,123 @@ class ComposedWriter(Writer):
         self.writer_lock = [threading.Lock() for w in self.writers]
         self.exceptions = [None for w in self.writers]
 
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError('ComposedWriter overflow_policy must be one of %s; '
+                             'got "%s"' % (OVERFLOW_POLICIES, overflow_policy))
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+
+        # How many records each writer has had discarded because its queue
+        # was full.
+        self.dropped = [0 for w in self.writers]
+
+        # If we're in queued mode, start one long-lived worker per writer
+        self.writer_queues = []
+        if self.queue_size > 0:
+            for i in range(len(self.writers)):
+                self.writer_queues.append(queue.Queue(maxsize=self.queue_size))
+                writer_name = str(type(self.writers[i]))
+                t = threading.Thread(target=self._run_writer_worker, args=(i,),
+                                     name=writer_name, daemon=True)
+                t.start()
+
     ############################
 
-    def _run_writer(self, index, record):
+    def _run_writer(self, index, record, batch=False):
         """Internal: grab the appropriate lock and call the appropriate
-        write() method. If there's an exception, save it."""
+        write() method (or write_batch(), if batch is True). If there's an
+        exception, save it."""
         with self.writer_lock[index]:
             try:
-                self.writers[index].write(record)
+                if batch:
+                    self.writers[index].write_batch(record)
+                else:
+                    self.writers[index].write(record)
             except Exception as e:
                 self.exceptions[index] = e
 
+    ############################
+    def _run_writer_worker(self, index):
+        """Internal: loop forever, taking (batch, record) pairs off of
+        writer[index]'s queue and writing them. Used when queue_size is
+        non-zero."""
+        writer_queue = self.writer_queues[index]
+        while True:
+            batch, record = writer_queue.get()
+            try:
+                with self.writer_lock[index]:
+                    if batch:
+                        self.writers[index].write_batch(record)
+                    else:
+                        self.writers[index].write(record)
+            except Exception as e:
+                logging.error('ComposedWriter failed to write to %s: %s',
+                              type(self.writers[index]).__name__, e)
+            finally:
+                writer_queue.task_done()
+
+    ############################
+    def _enqueue_record(self, index, record, batch=False):
+        """Internal: put a record (or a batch of records, if batch is True) on
+        writer[index]'s queue, applying the overflow policy if the queue is
+        full."""
+        writer_queue = self.writer_queues[index]
+        record = (batch, record)
+        if self.overflow_policy == 'block':
+            writer_queue.put(record)
+            return
+
+        try:
+            writer_queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        # If here, queue was full and we're going to lose a record
+        self.dropped[index] += 1
+        if self.dropped[index] == 1:
+            logging.warning('ComposedWriter: %s is falling behind; dropping '
+                            'records (%s)', type(self.writers[index]).__name__,
+                            self.overflow_policy)
+        if self.overflow_policy == 'drop_newest':
+            return
+
+        # 'drop_oldest' - make room by discarding from the head of the queue
+        while True:
+            try:
+                writer_queue.get_nowait()
+                writer_queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                writer_queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+    ############################
+    def flush(self, timeout=None):
+        """When queue_size is non-zero, wait up to timeout seconds (forever,
+        if None) for all queued records to be written. Then flush any of our
+        writers that have a flush() method of their own (such as a
+        DatabaseWriter in write-behind mode). Return True if everything was
+        flushed within the timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        for writer_queue in self.writer_queues:
+            while writer_queue.unfinished_tasks:
+                if deadline is not None and time.time() > deadline:
+                    return False
+                time.sleep(0.01)
+
+        # (Some writers have a 'flush' attribute that isn't a method)
+        flushed = True
+        for writer in self.writers:
+            writer_flush = getattr(writer, 'flush', None)
+            if callable(writer_flush):
+                remaining = None if deadline is None else max(0, deadline - time.time())
+                flushed = writer_flush(timeout=remaining) is not False and flushed
+        return flushed
+
     ############################
     def apply_transforms(self, record):
         """Internal: apply the transforms in series."""
@@ -78,6 +208,16 @@ class ComposedWriter(Writer):
                     break
         return record
 
+    ############################
+    def apply_transforms_batch(self, records):
+        """Internal: apply the transforms in series to a list of records,
+        dropping any that get transformed into nothing."""
+        for t in self.transforms:
+            if not records:
+                break
+            records = [r for r in t.transform_batch(records) if r]
+        return records
+
     ############################
     def write(self, record):
         """Transform the passed record and dispatch it to writers."""
@@ -85,16 +225,39 @@ class ComposedWriter(Writer):
         record = self.apply_transforms(record)
         if record is None:
             return
+        self._dispatch(record)
 
+    ############################
+    def write_batch(self, records):
+        """Transform the passed list of records and dispatch the results to
+        writers' write_batch() methods."""
+        records = self.apply_transforms_batch(records)
+        if not records:
+            return
+        self._dispatch(records, batch=True)
+
+    ############################
+    def _dispatch(self, record, batch=False):
+        """Internal: hand a transformed record (or list of records, if batch
+        is True) to each of the writers."""
         # No idea why someone would instantiate without writers, but it's
         # plausible. Try to be accommodating.
         if not self.writers:
             return
 
+        # If we've got persistent worker threads, just hand off the record
+        if self.writer_queues:
+            for i in range(len(self.writers)):
+                self._enqueue_record(i, record, batch)
+            return
+
         # If we only have one writer, there's no point making things
         # complicated. Just write and return.
         if len(self.writers) == 1:
-            self.writers[0].write(record)
+            if batch:
+                self.writers[0].write_batch(record)
+            else:
+                self.writers[0].write(record)
             return
 
         # Fire record off to write() requests for each writer.
@@ -102,7 +265,8 @@ class ComposedWriter(Writer):
         for i in range(len(self.writers)):
             try:
                 writer_name = str(type(self.writers[i]))
-                t = threading.Thread(target=self._run_writer, args=(i, record),
+                t = threading.Thread(target=self._run_writer,
+                                     args=(i, record, batch),
                                      name=writer_name, daemon=True)
                 t.start()
             except (OSError, RuntimeError) as e:
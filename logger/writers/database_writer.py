@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 
+import atexit
 import logging
+import os
 import pprint
+import queue
 import sys
+import threading
 import time
 
 from typing import Union
 from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 
+from database.record_batcher import write_or_reject  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.writers.writer import Writer  # noqa: E402
 
@@ -28,7 +33,8 @@ except ModuleNotFoundError:
 class DatabaseWriter(Writer):
     def __init__(self, database=DEFAULT_DATABASE, host=DEFAULT_DATABASE_HOST,
                  user=DEFAULT_DATABASE_USER, password=DEFAULT_DATABASE_PASSWORD,
-                 save_source=True, **kwargs):
+                 save_source=True, queue_size=0, batch_size=None, batch_interval=None,
+                 journal_file=None, retry_interval=5, **kwargs):
         """Write to the passed record to a database table. With connectors
         written so far (MySQL and Mongo), writes values in the records as
         timestamped field-value pairs. If save_source=True, also save the
@@ -68,6 +74,52 @@ class DatabaseWriter(Writer):
              }
            }
         ```
+        If queue_size is non-zero, the writer works in "write-behind" mode:
+        write() puts records on an in-memory queue of that size and returns
+        immediately, and a background thread takes them off in batches of
+        up to batch_size (waiting at most batch_interval seconds to fill a
+        batch) and hands each batch to the connector's write_records(), so
+        that database stalls never hold up the caller.
+        ```
+        queue_size     If zero (the default), write each record to the
+                       database before returning from write() - or, if
+                       batch_size is greater than one, hand it to the
+                       connector to be written as part of a batch.
+
+        batch_size     Maximum number of records to write at a time. Defaults
+                       to 100 in write-behind mode and, otherwise, to 1 (write
+                       each record as it arrives).
+
+        batch_interval Maximum number of seconds to wait for a batch to fill.
+                       Defaults to 1 in write-behind mode and, otherwise, to
+                       0 (wait until the batch is full).
+
+        journal_file   If not None, path of a local file to which records
+                       are appended if the queue is full, if a batch can't
+                       be written to the database, or if they're still
+                       queued when the writer is closed. Journaled records
+                       are written to the database once it is reachable
+                       again (including after a restart).
+
+                       WITHOUT A JOURNAL FILE, WRITE-BEHIND MODE LOSES DATA
+                       whenever it can't keep up: the background thread
+                       retries a failed batch until it succeeds, but records
+                       that arrive while the queue is full are discarded, as
+                       are any the database hasn't taken by the time the
+                       writer is closed.
+
+        retry_interval Seconds to wait before trying to reconnect to the
+                       database after a failure.
+        ```
+        Only failures to reach the database (the connector's
+        RETRYABLE_ERRORS) are retried or journaled. Records the database
+        refuses outright - say, a value too long for its column - are
+        logged and dropped, so that they don't hold up the records around
+        them.
+
+        close() is called automatically at exit. In write-behind mode, it
+        gives the background thread a few seconds to write what's still
+        queued, then journals whatever is left.
         """
         super().__init__(**kwargs)  # processes 'quiet' and type hints
 
@@ -79,9 +131,298 @@ class DatabaseWriter(Writer):
             raise RuntimeError('Database not configured in database/settings.py; '
                                'DatabaseWriter unavailable.')
 
-        self.db = Connector(database=database, host=host,
-                            user=user, password=password,
-                            save_source=save_source)
+        self.connector_args = {'database': database, 'host': host,
+                               'user': user, 'password': password,
+                               'save_source': save_source}
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.closed = False
+        if not queue_size:
+            # Let the connector do any batching
+            if batch_size is not None:
+                self.connector_args['batch_size'] = batch_size
+            if batch_interval is not None:
+                self.connector_args['batch_interval'] = batch_interval
+            self.db = Connector(**self.connector_args)
+
+            # Don't lose what the connector has buffered when the program exits
+            atexit.register(self.close)
+            return
+
+        self.batch_size = 100 if batch_size is None else batch_size
+        self.batch_interval = 1 if batch_interval is None else batch_interval
+        self.journal_file = journal_file
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.journal_lock = threading.Lock()
+
+        if not journal_file:
+            logging.warning('DatabaseWriter in write-behind mode without a journal_file '
+                            'will discard records if the database falls behind')
+
+        # Don't give up if the database is down when we start - the
+        # background thread will keep trying to connect.
+        self.db = None
+        self.next_retry = 0
+        self._connect()
+        self.closing = threading.Event()
+        self.flusher = threading.Thread(target=self._run_flusher, name='DatabaseWriter',
+                                        daemon=True)
+        self.flusher.start()
+
+        # Don't lose what's queued when the program exits
+        atexit.register(self.close)
+
+    ############################
+    def _connect(self):
+        """Try to (re)connect to the database. Return True on success."""
+        try:
+            self.db = Connector(**self.connector_args)
+            return True
+        except Exception as e:
+            logging.warning('DatabaseWriter unable to connect to database: %s', e)
+            self.db = None
+            self.next_retry = time.time() + self.retry_interval
+            return False
+
+    ############################
+    def _write_batch(self, records):
+        """Write a list of DASRecords to the database, reconnecting if
+        needed. Return True on success."""
+        if self.db is None:
+            if time.time() < self.next_retry or not self._connect():
+                return False
+        try:
+            self._write_records(records)
+            return True
+        except Exception as e:
+            logging.warning('DatabaseWriter unable to write %d records: %s',
+                            len(records), e)
+            try:
+                self.db.close()
+            except Exception:
+                pass
+            self.db = None
+            self.next_retry = time.time() + self.retry_interval
+            return False
+
+    ############################
+    def _write_records(self, records):
+        """Write a list of DASRecords, dropping any that the database won't
+        accept. If it can't be reached, raise one of the connector's
+        RETRYABLE_ERRORS (or, if it doesn't define any, whatever it raised)."""
+        if hasattr(self.db, 'write_records'):
+            write_records = self.db.write_records
+        else:
+            def write_records(records):
+                for record in records:
+                    self.db.write_record(record)
+        retryable = getattr(self.db, 'RETRYABLE_ERRORS', (Exception,))
+        self.dropped += len(write_or_reject(write_records, records, retryable))
+
+    ############################
+    def _run_flusher(self):
+        """Until we're closed and the queue is empty, take batches of
+        records off the queue and write them to the database, and replay any
+        journaled records whenever the database is reachable."""
+        while not (self.closing.is_set() and self.queue.empty()):
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.batch_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            while batch:
+                if self._write_batch(batch):
+                    break
+                if self.journal_file or self.closing.is_set():
+                    self._spill(batch)
+                    break
+                self.closing.wait(self.retry_interval)
+            for _ in batch:
+                self.queue.task_done()
+
+            if self.journal_file and not self.closing.is_set() and self._journal_exists():
+                if self.db is None and time.time() >= self.next_retry:
+                    self._connect()
+                if self.db is not None:
+                    self._replay_journal()
+
+    ############################
+    def _journal_exists(self):
+        """Are there journaled records waiting to be written?"""
+        return (os.path.exists(self.journal_file)
+                or os.path.exists(self.journal_file + '.replay'))
+
+    ############################
+    def _spill(self, records):
+        """Append records to the journal file or, if we don't have one,
+        discard them."""
+        if self.journal_file:
+            lines = ''.join(record.as_json() + '\n' for record in records)
+            try:
+                with self.journal_lock:
+                    journal_dir = os.path.dirname(self.journal_file)
+                    if journal_dir and not os.path.exists(journal_dir):
+                        os.makedirs(journal_dir)
+                    with open(self.journal_file, 'a') as journal:
+                        journal.write(lines)
+                return
+            except OSError as e:
+                logging.error('DatabaseWriter unable to write journal %s: %s',
+                              self.journal_file, e)
+
+        self.dropped += len(records)
+        if self.dropped == len(records):
+            logging.warning('DatabaseWriter is falling behind; dropping records')
+
+    ############################
+    def _replay_journal(self):
+        """Write journaled records to the database. Records we fail to write
+        are left in the journal for next time. Return True if the journal
+        was emptied."""
+        replay_file = self.journal_file + '.replay'
+        with self.journal_lock:
+            # A leftover replay file means we were interrupted; finish it
+            # before starting on the current journal.
+            if not os.path.exists(replay_file):
+                if not os.path.exists(self.journal_file):
+                    return True
+                os.replace(self.journal_file, replay_file)
+
+        with open(replay_file, 'r') as replay:
+            lines = []
+            for line in replay:
+                lines.append(line)
+                if len(lines) < self.batch_size:
+                    continue
+                if not self._replay_lines(lines):
+                    self._keep_unreplayed(replay_file, lines, replay.read())
+                    return False
+                lines = []
+            if lines and not self._replay_lines(lines):
+                self._keep_unreplayed(replay_file, lines, '')
+                return False
+        os.remove(replay_file)
+        logging.info('DatabaseWriter finished replaying journal %s', self.journal_file)
+        return True
+
+    ############################
+    def _replay_lines(self, lines):
+        """Write the journaled JSON records in lines. Return True on success."""
+        records = []
+        for line in lines:
+            try:
+                records.append(DASRecord(json_str=line))
+            except ValueError:
+                logging.warning('DatabaseWriter skipping bad journal entry: %s', line)
+        return not records or self._write_batch(records)
+
+    ############################
+    def _keep_unreplayed(self, replay_file, lines, rest):
+        """Rewrite replay_file so that it holds only the lines not yet written."""
+        with open(replay_file + '.tmp', 'w') as remainder:
+            remainder.write(''.join(lines))
+            remainder.write(rest)
+        os.replace(replay_file + '.tmp', replay_file)
+
+    ############################
+    def flush(self, timeout=None):
+        """When queue_size is non-zero, wait up to timeout seconds (forever,
+        if None) for all queued records to be written (or journaled), and
+        return True if the queue was emptied. Otherwise, have the connector
+        write any records it has buffered, and return True."""
+        if not self.queue_size:
+            self._flush_connector()
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    ############################
+    def close(self, timeout=5):
+        """Write whatever is buffered. In write-behind mode, wait up to
+        timeout seconds for queued records to be written, then journal (or,
+        without a journal_file, discard) whatever is still queued. Close
+        the database connection."""
+        if self.closed:
+            return
+        self.closed = True
+        if not self.queue_size:
+            self._flush_connector()
+        else:
+            self.closing.set()
+            self.flusher.join(timeout)
+
+            # If it's stuck (say, waiting on the database), take what's left
+            leftover = []
+            while True:
+                try:
+                    leftover.append(self.queue.get_nowait())
+                    self.queue.task_done()
+                except queue.Empty:
+                    break
+            if leftover:
+                self._spill(leftover)
+                if not self.journal_file:
+                    logging.error('DatabaseWriter closed with %d records unwritten; '
+                                  'discarding them', len(leftover))
+            if self.flusher.is_alive():
+                return  # still using the connection
+        if self.db is not None:
+            try:
+                self.db.close()
+            except Exception as e:
+                logging.warning('DatabaseWriter error closing database: %s', e)
+            self.db = None
+
+    ############################
+    def _flush_connector(self):
+        """Have a batching connector write what it has buffered, dropping
+        the records if it can't reach the database. (It drops any records
+        the database won't accept itself.)"""
+        if not hasattr(self.db, 'flush'):
+            return
+        try:
+            self.db.flush()
+        except Exception as e:
+            lost = self.db.batcher.take_pending() if hasattr(self.db, 'batcher') else []
+            self.dropped += len(lost)
+            logging.error('DatabaseWriter unable to write records; dropping %d: %s',
+                          len(lost), e)
+
+    ############################
+    def _store(self, record):
+        """Write a DASRecord to the database or, in write-behind mode, queue
+        it (or journal it, if the queue is full) to be written."""
+        if not self.queue_size:
+            try:
+                self.db.write_record(record)
+            except Exception as e:
+                # A batching connector drops records the database won't
+                # accept, but keeps those it failed to write because the
+                # database is down; rather than let them pile up, drop them.
+                lost = self.db.batcher.take_pending() if hasattr(self.db, 'batcher') else [record]
+                self.dropped += len(lost)
+                logging.error('DatabaseWriter unable to write record; dropping %d: %s',
+                              len(lost), e)
+            return
+        if not isinstance(record, DASRecord):
+            logging.error('DatabaseWriter can not queue non-DASRecord. Type: %s',
+                          type(record))
+            return
+        if self.closed:
+            self._spill([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._spill([record])
 
     ############################
     def _table_exists(self, table_name):
@@ -107,7 +448,7 @@ class DatabaseWriter(Writer):
             except KeyError:
                 logging.error('Unable to create DASRecord from dict: %s',
                               pprint.pformat(record))
-        self.db.write_record(record)
+        self._store(record)
 
     ############################
     def _delete_table(self, table_name):
@@ -129,11 +470,53 @@ class DatabaseWriter(Writer):
             self._write_record(record)
             return
 
+        for das_record in self._to_das_records(record):
+            self._write_record(das_record)
+
+    ############################
+    def write_batch(self, records):
+        """Write a list of records. In write-behind mode, they're queued as
+        by write(); otherwise, if the connector can write a list of records
+        at once, they're handed to it in a single write_records() call."""
+        if self.queue_size or not hasattr(self.db, 'write_records'):
+            super().write_batch(records)
+            return
+
+        das_records = []
+        for record in records:
+            if not self.can_process_record(record):  # inherited from BaseModule()
+                # Keep things in order: write what we've got first
+                self._store_batch(das_records)
+                das_records = []
+                self.digest_record(record)  # inherited from BaseModule()
+            elif isinstance(record, DASRecord):
+                das_records.append(record)
+            else:
+                das_records.extend(self._to_das_records(record))
+        self._store_batch(das_records)
+
+    ############################
+    def _store_batch(self, records):
+        """Have the connector write a list of DASRecords, after anything
+        it has buffered, dropping them if it can't."""
+        if not records:
+            return
+        self._flush_connector()
+        try:
+            self._write_records(records)
+        except Exception as e:
+            self.dropped += len(records)
+            logging.error('DatabaseWriter unable to write records; dropping %d: %s',
+                          len(records), e)
+
+    ############################
+    def _to_das_records(self, record):
+        """Convert a dict record into a list of DASRecords."""
         if not isinstance(record, dict):
             if not self.quiet:
                 logging.error('Record passed to DatabaseWriter is not of type '
                               '"DASRecord" or dict; is type "%s"', type(record))
-            return
+            return []
 
         # If here, our record is a dict, figure out whether it is a top-level
         # field dict or not.
@@ -147,7 +530,7 @@ class DatabaseWriter(Writer):
                               'passing, or it is in the old "field_dict" format that '
                               'assumes key:value pairs are at the top level.')
                 logging.error('The record in question: %s', str(record))
-            return
+            return []
 
         # Now check whether our 'values' are singletons (in which case
         # we've got a single record) or lists of tuples. Shortcut by
@@ -156,15 +539,13 @@ class DatabaseWriter(Writer):
             first_key, first_value = next(iter(fields.items()))
         except StopIteration:
             # Empty fields
-            logging.debug('Empty "fields" dict in record: %s', str(record))
-            return
+            logging.debug('Empty "fields" dict in record: %s', record)
+            return []
 
         # If we've got a singleton, it's a single record. Convert to
-        # DASRecord and write it out.
+        # DASRecord.
         if not isinstance(first_value, list):
-            das_record = DASRecord(data_id=data_id, timestamp=timestamp, fields=fields)
-            self._write_record(das_record)
-            return
+            return [DASRecord(data_id=data_id, timestamp=timestamp, fields=fields)]
 
         # If we're here, our values (or at least our first one) are lists
         # of (value, timestamp) pairs. First thing we do is
@@ -183,9 +564,8 @@ class DatabaseWriter(Writer):
                 logging.error('Badly-structured field dictionary: %s: %s',
                               field, pprint.pformat(ts_value_list))
 
-        # Now go through each timestamp, generate a DASRecord from its
-        # values, and write them.
-        for timestamp in sorted(values_by_timestamp):
-            das_record = DASRecord(data_id=data_id, timestamp=timestamp,
-                                   fields=values_by_timestamp[timestamp])
-            self._write_record(das_record)
+        # Now go through each timestamp and generate a DASRecord from its
+        # values.
+        return [DASRecord(data_id=data_id, timestamp=timestamp,
+                          fields=values_by_timestamp[timestamp])
+                for timestamp in sorted(values_by_timestamp)]
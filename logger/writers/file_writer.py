@@ -445,14 +445,9 @@ class FileWriter(Writer):
             self.file.write(self.header)
 
     ############################
-    def write(self, record: Union[str, bytes]):
-        """ Write out record, appending a newline at end."""
-
-        # See if it's something we can process, and if not, try digesting
-        if not self.can_process_record(record):  # inherited from BaseModule()
-            self.digest_record(record)  # inherited from BaseModule()
-            return
-
+    def _check_file(self):
+        """Make sure that the right file is open for writing, rolling over to
+        a new one if we're splitting by time and it's time to split."""
         if not self.filebase:
             self._set_file(None)
 
@@ -481,9 +476,41 @@ class FileWriter(Writer):
             if not self.file:
                 self._set_file(self.filebase + self.suffix)
 
+    ############################
+    def write(self, record: Union[str, bytes]):
+        """ Write out record, appending a newline at end."""
+
+        # See if it's something we can process, and if not, try digesting
+        if not self.can_process_record(record):  # inherited from BaseModule()
+            self.digest_record(record)  # inherited from BaseModule()
+            return
+
+        self._check_file()
+
         # Write the record and flush if requested
         self.file.write(record)
         if self.delimiter is not None:
             self.file.write(self.delimiter)
         if self.flush:
             self.file.flush()
+
+    ############################
+    def write_batch(self, records):
+        """Write out a list of records, flushing once at the end rather than
+        after each record."""
+        writable = []
+        for record in records:
+            if not self.can_process_record(record):  # inherited from BaseModule()
+                self.digest_record(record)  # inherited from BaseModule()
+                continue
+            writable.append(record)
+        if not writable:
+            return
+
+        self._check_file()
+        for record in writable:
+            self.file.write(record)
+            if self.delimiter is not None:
+                self.file.write(self.delimiter)
+        if self.flush:
+            self.file.flush()
@@ -230,7 +230,7 @@ class GrafanaLiveWriter(Writer):
                 if response.status == 204 or response.status == 200:
                     with self.stats_lock:
                         self.stats['sent'] += len(batch)
-                    logging.debug(f'Sent {len(batch)} records to Grafana stream {stream_id}')
+                    logging.debug('Sent %d records to Grafana stream %s', len(batch), stream_id)
 
         except urllib.error.HTTPError as e:
             error_msg = f'HTTP {e.code}: {e.reason}'
@@ -201,6 +201,32 @@ class InfluxDBWriter(Writer):
 
             self.write_api = client.write_api(write_options=ASYNCHRONOUS)
 
+    ############################
+    def _record_to_influx(self, record):
+        """Put a single record into the format that InfluxDB wants."""
+        if isinstance(record, DASRecord):
+            data_id = record.data_id
+            fields = record.fields
+            timestamp = record.timestamp
+        else:
+            data_id = record.get('data_id')
+            fields = record.get('fields', {})
+            timestamp = record.get('timestamp') or time.time()
+
+        measurement = self.measurement_name or data_id
+        tags = {**{'sensor': measurement}, **self.tags['*']}
+
+        if measurement in self.tags:
+            tags = {**tags, **self.tags[measurement]}
+
+        influxDB_record = {
+            'measurement': self.measurement_name or data_id,
+            'tags': tags,
+            'fields': fields,
+            'time': int(timestamp * 1000000000)
+        }
+        return influxDB_record
+
     ############################
     def write(self, record: Union[DASRecord, dict]):
         """Note: Assume record is a dict or DASRecord or list of
@@ -209,31 +235,6 @@ class InfluxDBWriter(Writer):
         bucket_name we were initialized with.
         """
 
-        def record_to_influx(record):
-            """Put a single record into the format that InfluxDB wants."""
-            if isinstance(record, DASRecord):
-                data_id = record.data_id
-                fields = record.fields
-                timestamp = record.timestamp
-            else:
-                data_id = record.get('data_id')
-                fields = record.get('fields', {})
-                timestamp = record.get('timestamp') or time.time()
-
-            measurement = self.measurement_name or data_id
-            tags = {**{'sensor': measurement}, **self.tags['*']}
-
-            if measurement in self.tags:
-                tags = {**tags, **self.tags[measurement]}
-
-            influxDB_record = {
-                'measurement': self.measurement_name or data_id,
-                'tags': tags,
-                'fields': fields,
-                'time': int(timestamp * 1000000000)
-            }
-            return influxDB_record
-
         # See if it's something we can process, and if not, try digesting
         if not self.can_process_record(record):  # inherited from BaseModule()
             self.digest_record(record)  # inherited from BaseModule()
@@ -241,7 +242,7 @@ class InfluxDBWriter(Writer):
 
         try:
             logging.debug('InfluxDBWriter writing record: %s', record)
-            influxDB_record = record_to_influx(record)
+            influxDB_record = self._record_to_influx(record)
             # logging.info('influxdb\n bucket: %s\nrecord: %s',
             #             self.bucket_name, pprint.pformat(influxDB_record))
             self.write_api.write(self.bucket_id, self.org_id, influxDB_record)
@@ -251,3 +252,27 @@ class InfluxDBWriter(Writer):
                 logging.warning('InfluxDBWriter exception: %s', str(e))
                 logging.warning('InfluxDBWriter could not ingest record '
                                 'type %s: %s', type(record), str(record))
+
+    ############################
+    def write_batch(self, records):
+        """Convert a list of records and hand them to the InfluxDB write API
+        in a single call."""
+        influxDB_records = []
+        for record in records:
+            if not self.can_process_record(record):  # inherited from BaseModule()
+                self.digest_record(record)  # inherited from BaseModule()
+                continue
+            try:
+                influxDB_records.append(self._record_to_influx(record))
+            except Exception as e:
+                if not self.quiet:
+                    logging.warning('InfluxDBWriter could not ingest record '
+                                    'type %s: %s: %s', type(record), str(record), e)
+        if not influxDB_records:
+            return
+        try:
+            self.write_api.write(self.bucket_id, self.org_id, influxDB_records)
+        except Exception as e:
+            if not self.quiet:
+                logging.warning('InfluxDBWriter exception writing %d records: %s',
+                                len(influxDB_records), str(e))
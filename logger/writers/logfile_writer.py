@@ -13,6 +13,7 @@ from os.path import dirname, realpath
 sys.path.append(dirname(dirname(dirname(realpath(__file__)))))
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.utils import timestamp  # noqa: E402
+from logger.utils import logfile_index  # noqa: E402
 from logger.writers.writer import Writer  # noqa: E402
 from logger.writers.file_writer import FileWriter  # noqa: E402
 
@@ -36,6 +37,7 @@ class LogfileWriter(Writer):
                  time_zone=timezone.utc,
                  suffix=None,
                  split_char=' ',
+                 index_interval=0,
                  **kwargs):
         """Write timestamped records to a filebase. The filebase will
         have the current date appended, in keeping with R2R format
@@ -96,6 +98,13 @@ class LogfileWriter(Writer):
 
         split_char      Delimiter between timestamp and rest of message
 
+        index_interval  If greater than zero, every index_interval records
+                        note the record's timestamp and the byte offset just
+                        past it in a hidden sidecar index next to the logfile
+                        (see logger/utils/logfile_index.py). LogfileReader
+                        uses the index to seek by time without reading the
+                        whole file. Requires a newline delimiter.
+
         quiet           If True, don't complain if a record doesn't match
                         any mapped prefix
         ```
@@ -112,6 +121,7 @@ class LogfileWriter(Writer):
         self.time_zone = time_zone
         self.split_char = split_char
         self.suffix = suffix or ''
+        self.index_interval = index_interval
 
         self.header = self._load_header(header, header_file)
 
@@ -147,6 +157,7 @@ class LogfileWriter(Writer):
 
         self.current_filename = {}
         self.writer = {}
+        self.index_count = {}  # records written since last index entry
 
     ############################
     def _validate_split_interval(self, split_interval):
@@ -409,7 +420,7 @@ class LogfileWriter(Writer):
 
         # Figure out where we're going to write
         if self.do_filebase_mapping:
-            matched_patterns = [self.write_if_match(record, pattern, datetime_str)
+            matched_patterns = [self.write_if_match(record, pattern, datetime_str, ts)
                                 for pattern in self.filebase]
             if True not in matched_patterns:
                 if not self.quiet:
@@ -433,10 +444,32 @@ class LogfileWriter(Writer):
             else:
                 filename = self.filebase + datetime_str + suffix
 
-            self.write_filename(record, pattern, filename)
+            self.write_filename(record, pattern, filename, ts)
+
+    ############################
+    def write_batch(self, records):
+        """Write out a list of records, flushing each file we've written to
+        once at the end rather than after each record."""
+        if not self.flush:
+            super().write_batch(records)
+            return
+
+        # Turn off flushing in our FileWriters (including any that get
+        # created along the way) while we write the batch.
+        self.flush = False
+        for writer in self.writer.values():
+            writer.flush = False
+        try:
+            super().write_batch(records)
+        finally:
+            self.flush = True
+            for writer in self.writer.values():
+                writer.flush = True
+                if writer.file:
+                    writer.file.flush()
 
     ############################
-    def write_if_match(self, record, pattern, datetime_str):
+    def write_if_match(self, record, pattern, datetime_str, ts=None):
         """
         If the record matches the pattern, write to the matching filebase.
         """
@@ -472,15 +505,16 @@ class LogfileWriter(Writer):
         else:
             filename = filebase + datetime_str + suffix
 
-        self.write_filename(record, pattern, filename)
+        self.write_filename(record, pattern, filename, ts)
         return True
 
     ############################
-    def write_filename(self, record, pattern, filename):
+    def write_filename(self, record, pattern, filename, ts=None):
         """
         Write record to filename. If it's the first time we're writing to
         this filename, create the appropriate FileWriter and insert it into
-        the map for the relevant pattern.
+        the map for the relevant pattern. If we're maintaining an index and
+        know the record's timestamp ts, update the index as needed.
         """
 
         # Are we currently writing to this file? If not, open/create it.
@@ -494,6 +528,15 @@ class LogfileWriter(Writer):
                                               delimiter=self.delimiter,
                                               header=header,
                                               flush=self.flush)
+            self.index_count[pattern] = 0
+
         # Now, if our logic is correct, should *always* have a matching_writer
         matching_writer = self.writer.get(pattern)
         matching_writer.write(record)
+
+        if self.index_interval and ts is not None:
+            self.index_count[pattern] += 1
+            if self.index_count[pattern] >= self.index_interval and matching_writer.file:
+                self.index_count[pattern] = 0
+                logfile_index.append_index_entry(filename, ts,
+                                                 matching_writer.file.tell())
@@ -160,3 +160,24 @@ class TextFileWriter(Writer):
         self.file.write(str(record) + '\n')
         if self.flush:
             self.file.flush()
+
+    ############################
+    def write_batch(self, records):
+        """Write out a list of records, flushing once at the end rather than
+        after each record."""
+        lines = []
+        for record in records:
+            if not self.can_process_record(record):  # inherited from BaseModule()
+                self.digest_record(record)           # inherited from BaseModule()
+                continue
+            if isinstance(record, DASRecord):
+                record = record.as_json()
+            lines.append(str(record) + '\n')
+        if not lines:
+            return
+
+        if self.split_by_date:
+            self._set_file()
+        self.file.write(''.join(lines))
+        if self.flush:
+            self.file.flush()
@@ -5,6 +5,7 @@ import logging
 import socket
 import struct
 import sys
+import time
 
 from typing import Union
 
@@ -19,6 +20,12 @@ from logger.writers.writer import Writer  # noqa E402
 # FRAGMENT_MARKER so that UDPReader can notice and reassemble the record.
 FRAGMENT_MARKER = b'\xff\xffTOOBIG\xff\xff'
 
+# Largest UDP payload that fits in a single 1500 byte Ethernet frame (less
+# 20 bytes of IP header and 8 of UDP header). Coalesced datagrams are kept
+# to this size by default, as bigger ones get split into IP fragments,
+# and losing any one fragment loses every record in the datagram.
+MAX_DATAGRAM_SIZE = 1472
+
 # Maximum allowable size of a UDP datagram on this system, autodetect once at
 # module load
 #
@@ -78,7 +85,8 @@ class UDPWriter(Writer):
 
     def __init__(self, destination=None, port=None,
                  mc_interface=None, mc_ttl=3, num_retry=2, warning_limit=5, eol='',
-                 reuseaddr=False, reuseport=False, **kwargs):
+                 reuseaddr=False, reuseport=False, max_rate=None, coalesce=False,
+                 max_datagram_size=MAX_DATAGRAM_SIZE, **kwargs):
         """Write records to a UDP network socket.
         ```
         destination  The destination to send UDP packets to. If '' or None,
@@ -111,6 +119,25 @@ class UDPWriter(Writer):
         reuseport    Specifies wether to set SO_REUSEPORT on the created socket.  If
                      you don't know you need this, don't enable it.
 
+        max_rate     If specified, the maximum number of datagrams per second
+                     to send. Datagrams (including the fragments of oversized
+                     records) are paced out evenly, sleeping as needed, so that
+                     a burst of records doesn't overflow a slow receiver's
+                     socket buffer.
+
+        coalesce     If True, write_batch() packs as many consecutive records as
+                     will fit into each datagram, each terminated by 'eol', so
+                     that a batch of small records takes a handful of sends
+                     rather than one apiece. Requires 'eol'; a UDPReader with
+                     the same 'eol' will split them back into records.
+
+        max_datagram_size  When coalescing, the most bytes to pack into one
+                     datagram. The default of 1472 fits a standard Ethernet
+                     frame, so that datagrams aren't fragmented on the wire;
+                     raise it for links with jumbo frames. A single record
+                     bigger than this is still sent in one datagram, as
+                     write() would send it.
+
         encoding - 'utf-8' by default. If empty or None, do not attempt any
                 decoding and return raw bytes. Other possible encodings are
                 listed in online documentation here:
@@ -185,6 +212,19 @@ class UDPWriter(Writer):
         # socket gets initialized on-demand in write()
         self.socket = None
 
+        if coalesce and not eol:
+            raise ValueError('UDPWriter: coalesce=True requires an eol to separate records')
+        self.coalesce = coalesce
+        if not max_datagram_size > 0:
+            raise ValueError('UDPWriter: max_datagram_size must be positive; got %s'
+                             % max_datagram_size)
+        self.max_datagram_size = max_datagram_size
+
+        if max_rate is not None and not max_rate > 0:
+            raise ValueError('UDPWriter: max_rate must be positive; got %s' % max_rate)
+        self.send_interval = 1 / max_rate if max_rate else 0
+        self.next_send_time = 0  # when pacing, earliest time for next send
+
     ############################
     def __del__(self):
         if self.socket:
@@ -227,13 +267,14 @@ class UDPWriter(Writer):
             return None
 
     ############################
-    def write(self, record: Union[str, bytes, DASRecord]):
-        """Write the record to the network."""
-
+    def _prepare(self, record):
+        """Turn a record into the bytes we'll send, or return None if it's
+        not something we send directly (lists etc get digested and written
+        record by record)."""
         # See if it's something we can process, and if not, try digesting
         if not self.can_process_record(record):  # inherited from BaseModule()
             self.digest_record(record)  # inherited from BaseModule()
-            return
+            return None
 
         if isinstance(record, DASRecord):
             record = record.as_json()
@@ -243,50 +284,119 @@ class UDPWriter(Writer):
             record += self.eol
 
         # Encode the record, so we're dealing with bytes from here on out
-        record = self._encode_str(record)
-
-        # Fragment record if needed, and recurse.
-        if len(record) > MAXSIZE:
-            record_list = []
-            max_fragment_size = MAXSIZE - len(FRAGMENT_MARKER)
-            fragment_sizes = []
-            while len(record) > max_fragment_size:
-                r = record[:max_fragment_size]+FRAGMENT_MARKER
-                record_list.append(r)
-                fragment_sizes.append(str(len(r)))
-                record = record[max_fragment_size:]
-            # last record doesn't get FRAGMENT_MARKER
-            record_list.append(record)
-            fragment_sizes.append("{} bytes".format(len(record)))
-            fragment_sizes = ', '.join(fragment_sizes)
-            logging.info("write: fragmented record into %d datagrams: %s",
-                         len(record_list), fragment_sizes)
-            logging.debug(str(record_list))
-
-            # change our encoding to binary temporarily, because we've already
-            # encoded to binary and added our marker (which has non-utf chars
-            # in it)
-            old_encoding = self.encoding
-            self.encoding = None
-            self.write(record_list)
-            # restore old encoding
-            self.encoding = old_encoding
+        return self._encode_str(record)
+
+    ############################
+    def _fragment(self, record):
+        """Return a list of the datagrams needed to send record, each a list
+        of buffers for sendmsg() to gather. Records too big for a single
+        datagram are split up, each fragment but the last followed by
+        FRAGMENT_MARKER; fragments are memoryview slices of the record, so
+        nothing gets copied until the kernel gathers them."""
+        if not MAXSIZE or len(record) <= MAXSIZE:
+            return [[record]]
+
+        view = memoryview(record)
+        max_fragment_size = MAXSIZE - len(FRAGMENT_MARKER)
+        datagrams = [[view[start:start + max_fragment_size], FRAGMENT_MARKER]
+                     for start in range(0, len(record) - max_fragment_size, max_fragment_size)]
+        # last fragment doesn't get FRAGMENT_MARKER
+        datagrams.append([view[len(datagrams) * max_fragment_size:]])
+        logging.info('write: fragmented record of %d bytes into %d datagrams',
+                     len(record), len(datagrams))
+        return datagrams
+
+    ############################
+    def write(self, record: Union[str, bytes, DASRecord]):
+        """Write the record to the network."""
+        record = self._prepare(record)
+        if record is None:
             return
+        if not self._check_socket():
+            return
+        if MAXSIZE and len(record) > MAXSIZE:
+            for datagram in self._fragment(record):
+                self._send(datagram)
+        else:
+            self._send([record])
+
+    ############################
+    def write_batch(self, records):
+        """Write a list of records. If coalesce is set, pack consecutive
+        records into as few datagrams as will hold them."""
+        if not self.coalesce:
+            super().write_batch(records)
+            return
+
+        prepared = []
+        for record in records:
+            if self.can_process_record(record):
+                prepared.append(self._prepare(record))
+            else:
+                # Odd things go out the slow way, after anything pending
+                self._send_coalesced(prepared)
+                prepared = []
+                self.write(record)
+        self._send_coalesced(prepared)
 
-        # If socket isn't connected, try reconnecting. If we can't
-        # reconnect, complain and return without writing.
+    ############################
+    def _send_coalesced(self, records):
+        """Send a list of encoded records, packed together into datagrams of
+        up to max_datagram_size bytes. Records too big to share a datagram
+        are sent (and if need be, fragmented) on their own."""
+        if not records or not self._check_socket():
+            return
+        max_size = min(self.max_datagram_size, MAXSIZE or self.max_datagram_size)
+        packed = []
+        packed_size = 0
+        for record in records:
+            if packed and packed_size + len(record) > max_size:
+                self._send(packed)
+                packed = []
+                packed_size = 0
+            if len(record) > max_size:
+                for datagram in self._fragment(record):
+                    self._send(datagram)
+                continue
+            packed.append(record)
+            packed_size += len(record)
+        if packed:
+            self._send(packed)
+
+    ############################
+    def _check_socket(self):
+        """If socket isn't connected, try reconnecting. If we can't
+        reconnect, complain and return False."""
         if not self.socket:
             self.socket = self._open_socket()
         if not self.socket:
             logging.error('Unable to write record to %s:%d',
                           self.destination, self.port)
-            return
+            return False
+        return True
 
+    ############################
+    def _send(self, buffers):
+        """Send a single datagram, gathered from a list of buffers, retrying
+        up to num_retry times on failure."""
+        if self.send_interval:
+            # Pace our sends, so we don't flood the receiver
+            now = time.monotonic()
+            if now < self.next_send_time:
+                time.sleep(self.next_send_time - now)
+                now = self.next_send_time
+            self.next_send_time = now + self.send_interval
+
+        # Plain send() is a bit cheaper when there's nothing to gather
+        single = len(buffers) == 1
         num_tries = bytes_sent = 0
-        rec_len = len(record)
+        rec_len = len(buffers[0]) if single else sum(len(buffer) for buffer in buffers)
         while num_tries <= self.num_retry and bytes_sent < rec_len:
             try:
-                bytes_sent = self.socket.send(record)
+                if single:
+                    bytes_sent = self.socket.send(buffers[0])
+                else:
+                    bytes_sent = self.socket.sendmsg(buffers)
 
                 # If here, write succeeded. Reset warnings
                 #
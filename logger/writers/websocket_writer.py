@@ -130,7 +130,7 @@ class WebsocketWriter(Writer):
             while True:
                 _enqueue_time, record = await send_queue.get()
                 await websocket.send(record)
-                logging.debug(f'WebsocketWriter sent client {client_id} record: {record}')
+                logging.debug('WebsocketWriter sent client %s record: %s', client_id, record)
 
         except websockets.exceptions.ConnectionClosed:  # type: ignore
             logging.info(f'Websocket connection lost for client {client_id}')
@@ -219,9 +219,9 @@ class WebsocketWriter(Writer):
             self.digest_record(record)  # inherited from BaseModule()
             return
 
-        logging.debug(f'WebsocketWriter received record: {record}')
+        logging.debug('WebsocketWriter received record: %s', record)
         with self.client_map_lock:
             for client_id in self.client_map:
-                logging.debug(f'Pushing record to client {client_id}')
+                logging.debug('Pushing record to client %s', client_id)
                 self.loop.call_soon_threadsafe(  # type: ignore
                     self._put_and_trim, client_id, record)
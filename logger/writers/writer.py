@@ -23,6 +23,11 @@ records *except* those of type "None" or "list". The logic is that digest_record
 will return a None when given a None, and when given a list, will iteratively
 apply the write() to every element of the list in order.
 
+Writers that can write a whole batch of records more efficiently than one at a
+time (e.g. with a single flush or a single network/database call) may also
+override write_batch(), which is called by ComposedWriter when a Listener is
+run in batch mode.
+
 Note that the child class can explicitly call super().__init__(quiet=True) or such
 to initialize the type checking and set its debugging level. If it is not explicitly
 initialized, it will be done implicitly the first time can_process_record() or
@@ -65,6 +70,14 @@ class Writer(BaseModule):
                                   'implementation of write () method.'
                                   % self.__class__.__name__)
 
+    ############################
+    def write_batch(self, records):
+        """Write a list of records. By default, just calls write() on each
+        record in turn. Subclasses may override this if they can write a
+        batch more efficiently than record-by-record."""
+        for record in records:
+            self.write(record)
+
 
 ################################################################################
 class TimestampedWriter(Writer):
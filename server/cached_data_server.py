@@ -29,7 +29,9 @@ says to
    by setting ``--max_records=0`` on the command line.)
 3. Periodically back up the in-memory cache to a disk-based cache at
    /var/tmp/openrvdas/disk_cache (By default, back up every 60 seconds;
-   this can be overridden with the --cleanup_interval argument).
+   this can be overridden with the --cleanup_interval argument). Each
+   backup appends only newly-arrived values to a journal, which is
+   periodically compacted into a binary snapshot (see server/disk_cache.py).
 4. Wait for clients to connect to the websocket at port 8766 and serve
    them the requested data. Web clients may issue JSON-encoded
    requests of the following formats (see the definition of
@@ -55,6 +57,13 @@ says to
          to zero. If present and non-zero, the CDS will try to provide at least
          that many "back records" when it first returns, even if it has to go
          back further than the interval specified in 'seconds'.
+
+         A field's spec may also ask for its values to be downsampled on the
+         server, e.g. {'seconds':3600, 'max_points':800, 'aggregate':'mean'};
+         see server/downsampler.py.
+
+         An optional 'encoding':'msgpack' asks for data to be sent as compact
+         binary MessagePack rather than JSON (see logger/utils/wire_format.py).
    {'type':'ready'}
        - indicate that client is ready to receive the next set of updates
          for subscribed fields.
@@ -62,7 +71,11 @@ says to
                               'fields':{'field_1':'value_1',
                                         'field_2':'value_2'}}}
        - submit new data to the cache (an alternative way to get data
-         in without the same record size limits of a UDP packet).
+         in without the same record size limits of a UDP packet). 'data'
+         may also be a list of such dicts, to submit many records in one
+         message. The server replies to each publish message with a single
+         status response, so clients may send several before reading the
+         replies.
 ```
 """
 import asyncio
@@ -94,6 +107,12 @@ except ModuleNotFoundError:
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from logger.utils.stderr_logging import StdErrLoggingHandler, DEFAULT_LOGGING_FORMAT  # noqa: E402
 from logger.utils.das_record import DASRecord                 # noqa: E402
+from server.disk_cache import DiskCache                       # noqa: E402
+from server.downsampler import downsampler_from_spec           # noqa: E402
+from server.field_buffer import FieldBuffer                   # noqa: E402
+from server.update_broadcaster import UpdateBroadcaster       # noqa: E402
+from logger.utils.lazy_logging import LazyFormat               # noqa: E402
+from logger.utils import wire_format                           # noqa: E402
 
 logging.basicConfig(format=DEFAULT_LOGGING_FORMAT)
 
@@ -102,22 +121,39 @@ logging.basicConfig(format=DEFAULT_LOGGING_FORMAT)
 class RecordCache:
     """Structure for storing/retrieving record data and metadata."""
 
-    def __init__(self):
+    def __init__(self, capacity=0):
         """
         In-memory storage for key:value pairs.
+
+        capacity - if non-zero, the maximum number of (timestamp, value)
+                   pairs to keep for any one field; once a field's buffer
+                   is full, each new value displaces the oldest one.
         """
+        self.capacity = capacity
+
+        # Map from field name to a FieldBuffer of its (timestamp, value) pairs
         self.data = {}
         self.data_lock = threading.Lock()  # When operating on whole dict
 
         self.metadata = {}
         self.metadata_lock = threading.Lock()
 
-        # Disk files we've tried to write to but failed.
-        self.failed_files = set()
+        # Once we're saving to a DiskCache, the values cached for each
+        # field since they were last journaled or snapshotted. If a save
+        # fails, we stop collecting them and write a whole new snapshot
+        # (of whatever is still in memory) at the next save instead.
+        self.disk = None
+        self.pending = {}
+        self.needs_snapshot = True
+        self.disk_failed = False
+        self.save_lock = threading.Lock()
 
         # Create a lock for each key so threads don't step on each other
         self.locks = {key: threading.Lock() for key in self.keys()}
 
+        # Serializes new values once for all clients subscribed to a field
+        self.broadcaster = UpdateBroadcaster()
+
     ############################
     def cache_record(self, record):
         """Add the passed record to the cache.
@@ -201,7 +237,7 @@ class RecordCache:
                     'you should be passing, or it is in the old "field_dict" '
                     'format that assumes key:value pairs are at the top '
                     'level.')
-                logging.debug('The record in question: %s', str(record))
+                logging.debug('The record in question: %s', record)
                 return
         else:
             logging.warning(
@@ -212,11 +248,9 @@ class RecordCache:
 
         # Add values from record to cache
         for field, value in fields.items():
-            if field not in self.locks:
-                self.locks[field] = threading.Lock()
-            with self.locks[field]:
+            with self.locks.setdefault(field, threading.Lock()):
                 if field not in self.data:
-                    self.data[field] = []
+                    self.data[field] = FieldBuffer(self.capacity)
 
                 if isinstance(value, list):
                     # Okay, for this field we have a list of values - iterate
@@ -245,7 +279,29 @@ class RecordCache:
 
     ############################
     def _add_tuple(self, field, value_tuple):
-        self.data[field].append(value_tuple)
+        try:
+            timestamp, value = value_tuple
+            timestamp = float(timestamp)
+            self.data[field].append(timestamp, value)
+        except (TypeError, ValueError) as e:
+            logging.warning('Unable to cache value for %s: %s: %s', field, value_tuple, e)
+            return
+        if self.disk is not None and not self.disk_failed:
+            self.pending.setdefault(field, []).append((timestamp, value))
+        self.broadcaster.add(field, timestamp, value)
+
+    ############################
+    def subscribe(self, field):
+        """Register a client's interest in new values for field."""
+        with self.locks.setdefault(field, threading.Lock()):
+            field_cache = self.data.get(field)
+            latest = field_cache[-1][0] if field_cache else 0
+            self.broadcaster.subscribe(field, latest)
+
+    ############################
+    def unsubscribe(self, field):
+        """Withdraw a client's interest in new values for field."""
+        self.broadcaster.unsubscribe(field)
 
     ############################
     def keys(self):
@@ -278,93 +334,119 @@ class RecordCache:
             if field not in self.locks:
                 self.locks[field] = threading.Lock()
             with self.locks[field]:
-                value_list = self.data[field]
-
-                if len(value_list) <= min_back_records:
-                    continue
-
-                # If max_records is specified, truncate to keep that many of
-                # most recent records.
-                if max_records > min_back_records and len(value_list) > max_records:
-                    value_list = value_list[-max_records:]
+                self.data[field].cleanup(oldest=oldest, max_records=max_records,
+                                         min_back_records=min_back_records)
 
-                # Iterate until find value that's not too old, but leave at least
-                # min_back_records.
-                for i in range(len(value_list) - min_back_records):
-                    if value_list[i][0] > oldest:
-                        break
-
-                # But keep at least one value
-                last_index = min(i, len(value_list) - 1)
-                self.data[field] = value_list[last_index:]
+    ############################
+    def _open_disk_cache(self, disk_cache):
+        """Return the DiskCache for the named directory, starting to journal
+        new values for it if we weren't already."""
+        if self.disk is None or self.disk.path != disk_cache:
+            self.disk = DiskCache(disk_cache)
+            self.pending = {}
+            self.needs_snapshot = True
+        return self.disk
 
     ############################
     def save_to_disk(self, disk_cache):
-        """Create one JSON-encoded cache file per field in the directory named
-        by disk_cache.
+        """Append values cached since the last save to the journal in the
+        directory named by disk_cache, compacting the journal into a new
+        snapshot once it has grown large enough.
         """
         logging.debug('Saving to cache.')
         if not disk_cache:
             logging.warning('save_to_disk called, but no disk_cache defined')
             return
 
-        if not os.path.exists(disk_cache):
+        with self.save_lock:
+            disk = self._open_disk_cache(disk_cache)
+            was_failing = self.disk_failed
             try:
-                os.makedirs(disk_cache)
-            except OSError as e:
-                logging.error('Unable to create disk cache directory "%s": %s', disk_cache, e)
-                return
-
-        fields = self.keys()
-        for field in fields:
-            disk_filename = disk_cache + '/' + field
-            if disk_filename in self.failed_files:
-                continue
-            if field not in self.locks:
-                self.locks[field] = threading.Lock()
-            with self.locks[field]:
-                try:
-                    with open(disk_filename, 'w') as cache_file:
-                        json.dump(self.data[field], cache_file)
-                except (PermissionError, IOError, OSError) as e:
-                    logging.warning('Unable to write disk cache file %s: %s', disk_filename, e)
-                    self.failed_files.add(disk_filename)
-
-                # This is BAD practice; but use it to figure out what else might go wrong
-                # so we can add it to specific exceptions above.s
-                except Exception as e:
-                    logging.warning('Unanticipated exception writing disk cache file %s: %s',
-                                    disk_filename, e)
-                    self.failed_files.add(disk_filename)
+                if self.needs_snapshot or disk.needs_compaction():
+                    # Start collecting values again (if we'd stopped), so
+                    # that any cached after we copy a field get journaled.
+                    self.disk_failed = False
+
+                    # Copy each field's arrays under its lock, but do the
+                    # (slower) writing without holding any.
+                    fields = {}
+                    for field in self.keys():
+                        with self.locks.setdefault(field, threading.Lock()):
+                            fields[field] = self.data[field].arrays()
+                            self.pending.pop(field, None)
+                    disk.compact(fields)
+                    self.needs_snapshot = False
+                else:
+                    entries = []
+                    for field in list(self.pending):
+                        with self.locks.setdefault(field, threading.Lock()):
+                            pairs = self.pending.pop(field, [])
+                        entries.extend((field, timestamp, value) for timestamp, value in pairs)
+                    disk.append(entries)
+                if was_failing:
+                    logging.warning('Able to write disk cache %s again', disk_cache)
+            except (PermissionError, IOError, OSError) as e:
+                # Entries we failed to journal are still in memory, so rather
+                # than letting unsaved values pile up, drop them and write a
+                # complete snapshot when we next try.
+                if not was_failing:
+                    logging.warning('Unable to write disk cache %s: %s; will retry',
+                                    disk_cache, e)
+                self.disk_failed = True
+                self.needs_snapshot = True
+                self.pending = {}
 
     ############################
     def load_from_disk(self, disk_cache):
-        """Load the data dict from directory of JSON-encoded cache files.
+        """Load the data dict from the snapshot and journal in disk_cache or,
+        failing that, from an older directory of per-field JSON cache files.
+        Values cached from here on are journaled for the next save_to_disk().
         """
         logging.info('Loading from disk at %s', disk_cache)
         if not disk_cache:
             logging.info('load_from_disk called, but no disk_cache defined')
             return
-        try:
-            if not os.path.exists(disk_cache):
-                logging.info('load_from_disk: no cache found at "%s"', disk_cache)
-                return
+        with self.save_lock:
+            disk = self._open_disk_cache(disk_cache)
+            try:
+                if not os.path.exists(disk_cache):
+                    logging.info('load_from_disk: no cache found at "%s"', disk_cache)
+                    return
+
+                if disk.exists():
+                    data = disk.load(capacity=self.capacity)
+                    logging.debug('Got cached fields: %s', LazyFormat(list, data))
+                    with self.data_lock:
+                        for field, field_buffer in data.items():
+                            with self.locks.setdefault(field, threading.Lock()):
+                                self.data[field] = field_buffer
+                    self.needs_snapshot = False
+                    return
+
+                self._load_json_files(disk_cache)
+            except OSError as e:
+                logging.error('Unable to access disk cache at %s: %s', disk_cache, e)
 
-            field_files = [f for f in os.listdir(disk_cache)
-                           if os.path.isfile(os.path.join(disk_cache, f))]
-            logging.debug('Got cached fields: %s', field_files)
-            for field in field_files:
-                if field not in self.locks:
-                    self.locks[field] = threading.Lock()
-                try:
-                    with self.locks[field]:
-                        with open(disk_cache + '/' + field, 'r') as cache_file:
-                            self.data[field] = json.load(cache_file)
+    ############################
+    def _load_json_files(self, disk_cache):
+        """Load the data dict from directory of JSON-encoded cache files,
+        as written by earlier versions of save_to_disk().
+        """
+        field_files = [f for f in os.listdir(disk_cache)
+                       if os.path.isfile(os.path.join(disk_cache, f))]
+        logging.debug('Got cached fields: %s', field_files)
+        for field in field_files:
+            if field not in self.locks:
+                self.locks[field] = threading.Lock()
+            try:
+                with self.locks[field]:
+                    with open(disk_cache + '/' + field, 'r') as cache_file:
+                        self.data[field] = FieldBuffer(self.capacity,
+                                                       json.load(cache_file))
 
-                except (json.decoder.JSONDecodeError, UnicodeDecodeError):
-                    logging.warning('Failed to parse cache for %s', field)
-        except OSError as e:
-            logging.error('Unable to access disk cache at %s: %s', disk_cache, e)
+            except (json.decoder.JSONDecodeError, UnicodeDecodeError,
+                    TypeError, ValueError):
+                logging.warning('Failed to parse cache for %s', field)
 
 
 ############################
@@ -378,6 +460,14 @@ class WebSocketConnection:
         self.interval = interval
         self.quit_flag = False
 
+        # Fields we've told the cache's broadcaster we're interested in
+        self.subscribed_fields = set()
+
+        # How the client wants data messages encoded, and (for msgpack)
+        # the ids we've assigned to the field names we've sent it.
+        self.encoding = wire_format.JSON
+        self.field_ids = wire_format.FieldIdEncoder()
+
     ############################
     def closed(self):
         """Has our client closed the connection?"""
@@ -387,6 +477,20 @@ class WebSocketConnection:
     def quit(self):
         """Close the connection from our end and quit."""
         self.quit_flag = True
+        self.unsubscribe()
+
+    ############################
+    def subscribe(self, field_name):
+        """Ask the cache to start sharing serialized updates for field."""
+        if field_name not in self.subscribed_fields:
+            self.subscribed_fields.add(field_name)
+            self.cache.subscribe(field_name)
+
+    ############################
+    def unsubscribe(self):
+        """Let the cache know we no longer want updates for any fields."""
+        while self.subscribed_fields:
+            self.cache.unsubscribe(self.subscribed_fields.pop())
 
     ############################
     def get_matching_field_names(self, field_name):
@@ -417,12 +521,35 @@ class WebSocketConnection:
     ############################
 
     async def send_json_response(self, response, is_error=False):
-        logging.debug('CachedDataServer sending %d bytes',
-                      len(json.dumps(response)))
-        await self.websocket.send(json.dumps(response))
+        await self.send_message(json.dumps(response))
         if is_error:
             logging.warning(response)
 
+    ############################
+    async def send_message(self, message):
+        """Send an already-encoded message: JSON text, or msgpack bytes."""
+        logging.debug('CachedDataServer sending %d bytes', len(message))
+        await self.websocket.send(message)
+
+    ############################
+    def encode_values(self, values):
+        """Encode a list of (timestamp, value) pairs for a field_dict data
+        message in our client's encoding."""
+        if self.encoding == wire_format.MSGPACK:
+            return [wire_format.pack_values(values)]
+        return json.dumps(values)
+
+    ############################
+    def get_downsampled(self, field_name, downsampler, since, now):
+        """Feed a field's values newer than 'since' to its downsampler.
+        Return a list of the summary pairs for any buckets they complete,
+        and the timestamp of the newest value consumed."""
+        with self.cache.locks[field_name]:
+            field_cache = self.cache.data.get(field_name)
+            new_values = field_cache.since(since) if field_cache else []
+        latest = new_values[-1][0] if new_values else since
+        return downsampler.add(new_values, now) + downsampler.flush(now), latest
+
     ############################
     async def serve_requests(self):
         """Wait for requests and serve data, if it exists, from
@@ -435,7 +562,7 @@ class WebSocketConnection:
             fields.
         publish - look for a field called 'data' and expect its value to
             be a dict containing data in one of the formats accepted by
-            cache_record().
+            cache_record(), or a list of such dicts.
         subscribe - look for a field called 'fields' in the request whose
             value is a dict of the format
             ```
@@ -446,7 +573,10 @@ class WebSocketConnection:
             'interval', specifying how often server should provide
             updates. Will default to what was specified on command line
             with --interval flag (which itself defaults to 1 second
-            intervals).
+            intervals). It may also have a field called 'encoding',
+            specifying 'json' (the default) or 'msgpack' for the data
+            messages sent in response to 'ready' requests; see
+            logger/utils/wire_format.py.
             ```
             ```
             A subscription will instruct the CachedDataServer to begin
@@ -463,6 +593,10 @@ class WebSocketConnection:
             arrived since last call.
             NOTE: if the 'seconds' field is -1, server will only ever provide
             the single most recent value for the relevant field.
+
+            A field spec may also include 'min_interval', 'max_points'
+            and 'aggregate' to have values summarized into time buckets
+            before sending; see server/downsampler.py.
         ready - client has processed the previous data message and is ready
             for more.
         ```
@@ -475,6 +609,10 @@ class WebSocketConnection:
         # regardless of how many there are, or whether we've sent it before.
         field_timestamps = {}
 
+        # A map from field_name:Downsampler for fields whose values are
+        # to be summarized before sending.
+        downsamplers = {}
+
         interval = self.interval  # Use the default interval, uh, by default
 
         while not self.quit_flag:
@@ -482,7 +620,7 @@ class WebSocketConnection:
             try:
                 logging.debug('Waiting for client')
                 raw_request = await self.websocket.recv()
-                request = json.loads(raw_request)
+                request = wire_format.decode(raw_request)
 
                 # Make sure we've received a dict
                 if not isinstance(request, dict):
@@ -524,14 +662,19 @@ class WebSocketConnection:
                             {'type': 'publish', 'status': 400,
                              'error': 'no data field found in request'},
                             is_error=True)
-                    elif not isinstance(data, dict):
+                    elif isinstance(data, dict):
+                        self.cache.cache_record(data)
+                        await self.send_json_response({'type': 'publish', 'status': 200})
+                    elif isinstance(data, list) and all(isinstance(record, dict)
+                                                        for record in data):
+                        for record in data:
+                            self.cache.cache_record(record)
+                        await self.send_json_response({'type': 'publish', 'status': 200})
+                    else:
                         await self.send_json_response(
                             {'type': 'publish', 'status': 400,
                              'error': 'request has non-dict data field'},
                             is_error=True)
-                    else:
-                        self.cache.cache_record(data)
-                        await self.send_json_response({'type': 'publish', 'status': 200})
 
                 # Client wants to subscribe, and provides a dict of requested
                 # fields
@@ -562,6 +705,27 @@ class WebSocketConnection:
                     # record_list? By default, use field_dict.
                     requested_format = request.get('format', 'field_dict')
 
+                    # And how do they want it encoded?
+                    encoding = request.get('encoding', wire_format.JSON)
+                    try:
+                        wire_format.check_encoding(encoding)
+                    except ValueError as e:
+                        await self.send_json_response(
+                            {'type': 'subscribe', 'status': 400, 'error': str(e)},
+                            is_error=True)
+                        continue
+                    self.encoding = encoding
+
+                    # Check any downsampling requests before we commit to them
+                    try:
+                        for field_spec in raw_requested_fields.values():
+                            downsampler_from_spec(field_spec)
+                    except ValueError as e:
+                        await self.send_json_response(
+                            {'type': 'subscribe', 'status': 400, 'error': str(e)},
+                            is_error=True)
+                        continue
+
                     # Parse out request field names and number of back seconds
                     # requested. Encode that as 'last timestamp sent', unless back
                     # seconds == -1. If -1, save it as -1, so that we know we're
@@ -574,6 +738,8 @@ class WebSocketConnection:
                     # Reset requested field_timestamps and field_back_records
                     requested_fields = {}
                     field_timestamps = {}    # last timestamp seen
+                    downsamplers = {}
+                    self.unsubscribe()
 
                     logging.debug('Subscription requested')
                     for field_name, field_spec in raw_requested_fields.items():
@@ -581,6 +747,14 @@ class WebSocketConnection:
 
                         for matching_field_name in matching_field_names:
                             requested_fields[matching_field_name] = field_spec
+
+                            # Downsampled fields are summarized per client,
+                            # so have no use for the shared broadcaster.
+                            downsampler = downsampler_from_spec(field_spec)
+                            if downsampler:
+                                downsamplers[matching_field_name] = downsampler
+                            else:
+                                self.subscribe(matching_field_name)
                             # If we don't have a field spec dict
                             if isinstance(field_spec, dict):
                                 back_records = field_spec.get('back_records', 0)
@@ -638,19 +812,13 @@ class WebSocketConnection:
 
                                 # If here, we've got at least 'back_records' records, and want to
                                 # search backward to include the last 'back_seconds' seconds of
-                                # them. Could do more efficiently with some sort of binary search.
-                                this_record_index = len(field_cache) - back_records - 1
-                                while this_record_index >= 0:
-                                    # Recall that each element is (timestamp, value)
-                                    this_timestamp = field_cache[this_record_index][0]
-
-                                    if now - this_timestamp > back_seconds:
-                                        # Set our 'last seen' timestamp as timestamp of previous
-                                        # record and stop looking.
-                                        prev_timestamp = field_cache[this_record_index-1][0]
-                                        field_timestamps[matching_field_name] = prev_timestamp
-                                        break
-                                    this_record_index -= 1
+                                # them. Find the last record older than that (but not among the
+                                # last back_records); we'll send everything from it onward.
+                                last_index = min(field_cache.index_before(now - back_seconds) - 1,
+                                                 len(field_cache) - back_records - 1)
+                                if last_index > 0:
+                                    prev_timestamp = field_cache[last_index - 1][0]
+                                    field_timestamps[matching_field_name] = prev_timestamp
 
                     if raw_requested_fields and not requested_fields:
                         logging.info('Request doesn\'t match any existing fields')
@@ -677,12 +845,45 @@ class WebSocketConnection:
                     ##########
                     results = {}
                     if requested_format == 'field_dict':
+                        # Results map from field name to the list of new
+                        # (timestamp, value) pairs for it, encoded by
+                        # encode_values() or the broadcaster.
                         for field_name, field_spec in requested_fields.items():
                             if field_name not in self.cache.locks:
                                 logging.debug('No data for requested field %s', field_name)
                                 continue
 
+                            back_seconds = 0
+                            if isinstance(field_spec, dict):
+                                back_seconds = field_spec.get('back_seconds', 0)
+                            latest_timestamp = field_timestamps.get(field_name, 0)
+
+                            if field_name in downsamplers:
+                                points, field_timestamps[field_name] = self.get_downsampled(
+                                    field_name, downsamplers[field_name], latest_timestamp, now)
+                                if points:
+                                    results[field_name] = self.encode_values(points)
+                                continue
+
+                            # Usually, new values will already have been
+                            # serialized by the cache's broadcaster for
+                            # all clients subscribed to this field.
+                            if back_seconds != -1:
+                                update = self.cache.broadcaster.get_update(
+                                    field_name, latest_timestamp, self.encoding)
+                                if update is not None:
+                                    field_values, field_timestamps[field_name] = update
+                                    if field_values and field_values != '[]':
+                                        results[field_name] = field_values
+                                    continue
+
+                            # If not, get them from the cache ourselves
                             with self.cache.locks[field_name]:
+                                # Hand pending values to the broadcaster so
+                                # that the next update starts where this
+                                # one leaves off.
+                                self.cache.broadcaster.seal(field_name)
+
                                 field_cache = self.cache.data.get(field_name)
                                 if field_cache is None:
                                     logging.debug(
@@ -696,26 +897,23 @@ class WebSocketConnection:
                                 # If special case -1, they want just single most recent
                                 # value, then future results. Grab last value, then set its
                                 # timestamp as the last one we've seen.
-                                back_seconds = field_spec.get('back_seconds', 0)
                                 if back_seconds == -1:
                                     last_value = field_cache[-1]
-                                    results[field_name] = [last_value]
+                                    results[field_name] = self.encode_values([last_value])
                                     # ts of last value
                                     field_timestamps[field_name] = last_value[0]
                                     continue
 
                                 # Otherwise - if no data newer than the latest
                                 # timestamp we've already sent, skip,
-                                latest_timestamp = field_timestamps.get(field_name, 0)
                                 if not field_cache[-1][0] > latest_timestamp:
                                     continue
 
                                 # Otherwise, copy over records arrived since
                                 # latest_timestamp and update the latest_timestamp sent
                                 # (first element of last pair in field_cache).
-                                field_results = [
-                                    pair for pair in field_cache if pair[0] > latest_timestamp]
-                                results[field_name] = field_results
+                                field_results = field_cache.since(latest_timestamp)
+                                results[field_name] = self.encode_values(field_results)
                                 if field_results:
                                     field_timestamps[field_name] = field_results[-1][0]
 
@@ -729,6 +927,15 @@ class WebSocketConnection:
                                 logging.debug(
                                     'No data for requested field %s', field_name)
                                 continue
+
+                            if field_name in downsamplers:
+                                points, field_timestamps[field_name] = self.get_downsampled(
+                                    field_name, downsamplers[field_name],
+                                    field_timestamps.get(field_name, 0), now)
+                                for ts, value in points:
+                                    records.setdefault(ts, {})[field_name] = value
+                                continue
+
                             with self.cache.locks[field_name]:
                                 latest_timestamp = field_timestamps.get(
                                     field_name, 0)
@@ -763,8 +970,7 @@ class WebSocketConnection:
                                 else:
                                     # Get the new (ts, value) pairs for this
                                     # field
-                                    field_results = [
-                                        pair for pair in field_cache if pair[0] > latest_timestamp]
+                                    field_results = field_cache.since(latest_timestamp)
 
                                     # We know field_results is non-empty because of previous
                                     # elif, so new latest timestamp is last ts
@@ -792,15 +998,27 @@ class WebSocketConnection:
                         logging.warning(mesg)
                         await self.send_json_response({'status': 400, 'error': mesg}, is_error=True)
 
-                    logging.debug(
-                        'Websocket results: %s...',
-                        str(results)[
-                            0:100])
+                    logging.debug('Websocket results: %s...',
+                                  LazyFormat(lambda: str(results)[0:100]))
 
                     # Package up what results we have (if any) and send them
-                    # off
-                    await self.send_json_response({'type': 'data', 'status': 200,
-                                                   'data': results})
+                    # off. Field dict results are already encoded, so just
+                    # stitch them together.
+                    if requested_format == 'field_dict' and \
+                            self.encoding == wire_format.MSGPACK:
+                        results = {self.field_ids.id(field_name): packed
+                                   for field_name, packed in results.items()}
+                        await self.send_message(wire_format.pack_data_message(
+                            results, self.field_ids.take_new_ids()))
+                    elif requested_format == 'field_dict':
+                        data = ', '.join('%s: %s' % (json.dumps(field_name), field_json)
+                                         for field_name, field_json in results.items())
+                        await self.send_message(
+                            '{"type": "data", "status": 200, "data": {%s}}' % data)
+                    else:
+                        await self.send_message(wire_format.encode(
+                            {'type': 'data', 'status': 200, 'data': results},
+                            self.encoding))
 
                     # New results or not, take a nap before trying to fetch
                     # more results
@@ -817,11 +1035,11 @@ class WebSocketConnection:
                         is_error=True)
 
             # If we got bad input, complain and loop
-            except json.JSONDecodeError:
+            except wire_format.DecodeError:
                 await self.send_json_response(
-                    {'status': 400, 'error': 'received unparseable JSON'},
+                    {'status': 400, 'error': 'received unparseable request'},
                     is_error=True)
-                logging.warning('unparseable JSON: %s', raw_request)
+                logging.warning('unparseable request: %s', raw_request)
 
             # If our connection closed, complain and exit gracefully
             except ConnectionClosed:
@@ -874,7 +1092,8 @@ class CachedDataServer:
             max_records=60 * 24,
             min_back_records=100,
             cleanup_interval=60,
-            disk_cache=None):
+            disk_cache=None,
+            compression=True):
         """
         port         Port on which to serve websocket connections
         interval     How frequently to serve updates
@@ -889,6 +1108,9 @@ class CachedDataServer:
                      and save to disk (if disk_cache is specified)
         disk_cache   If not None, name of directory in which to backup values
                      from in-memory cache
+        compression  If True, offer clients permessage-deflate compression of
+                     websocket messages. Saves bandwidth over slow links, at
+                     some cost in CPU.
         """
         self.port = port
         self.interval = interval
@@ -896,8 +1118,12 @@ class CachedDataServer:
         self.max_records = max_records
         self.min_back_records = min_back_records
         self.cleanup_interval = cleanup_interval
+        self.compression = compression
 
-        self.cache = RecordCache()
+        # If we're limiting records per field, size the cache's ring
+        # buffers so that they never need to hold more than that.
+        capacity = max(max_records, min_back_records) if max_records else 0
+        self.cache = RecordCache(capacity=int(capacity))
 
         # If they've given us the name of a disk cache, try loading our
         # RecordCache from it.
@@ -1000,6 +1226,7 @@ class CachedDataServer:
                     self._serve_websocket_data,
                     host='',
                     port=self.port,
+                    compression='deflate' if self.compression else None,
                     **extra_kwargs
                 )
                 logging.info('WebSocket server running on port %d', self.port)
@@ -1118,6 +1345,10 @@ if __name__ == '__main__':
                         help='How many seconds to sleep between successive '
                         'sends of data to clients.')
 
+    parser.add_argument('--no_compression', dest='compression', action='store_false',
+                        help='Don\'t offer clients permessage-deflate compression '
+                        'of websocket messages.')
+
     parser.add_argument('--stderr_file', dest='stderr_file', default=None,
                         help='Optional file to which stderr messages should '
                         'be written.')
@@ -1144,7 +1375,8 @@ if __name__ == '__main__':
                               max_records=args.max_records,
                               min_back_records=args.min_back_records,
                               cleanup_interval=args.cleanup_interval,
-                              disk_cache=args.disk_cache)
+                              disk_cache=args.disk_cache,
+                              compression=args.compression)
 
     # Only create reader(s) if they've given us a network to read from;
     # otherwise, count on data coming from websocket publish
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Incremental on-disk persistence for the CachedDataServer's RecordCache.
+
+Rather than rewriting one JSON file per field at every cleanup interval,
+a DiskCache keeps two kinds of file in its directory:
+
+  snapshot     A compact, binary copy of every field's timestamps and
+               values, as returned by FieldBuffer.arrays(), tagged with a
+               generation number. It starts with a line of JSON describing
+               its contents, followed by each field's raw array('d')
+               timestamps and either its raw array('d') values or, if they
+               aren't all floats, a JSON-encoded list of them. (Nothing in
+               it is executable, so a tampered-with file can at worst
+               corrupt the cache.)
+
+  journal.<N>  An append-only log of the (field, timestamp, value)
+               entries cached since snapshot generation N was written, one
+               JSON-encoded list per line.
+
+Each save appends only the new entries to the journal, so disk I/O scales
+with the incoming data rather than with the size of the cache. Once the
+journal has grown larger than the snapshot, the cache is compacted: a new
+snapshot is written (to a temporary file that then replaces the old one)
+and a fresh, empty journal is started for the new generation. Because the
+snapshot names the journal that goes with it, a crash part-way through
+compaction never causes entries to be replayed twice.
+
+On startup, load() reads the snapshot and replays its journal. A
+truncated final journal line (e.g. from a crash mid-write) is skipped.
+
+    disk_cache = DiskCache('/var/tmp/openrvdas/disk_cache')
+    data = disk_cache.load(capacity=1000)
+    disk_cache.append([('field_1', 1555468528.4, 12.5)])
+    disk_cache.compact({'field_1': data['field_1'].arrays()})
+"""
+import json
+import logging
+import os
+import os.path
+import sys
+import threading
+
+from array import array
+
+from server.field_buffer import FieldBuffer
+
+SNAPSHOT_NAME = 'snapshot'
+JOURNAL_PREFIX = 'journal.'
+SNAPSHOT_FORMAT = 'openrvdas_disk_cache_snapshot_1'
+
+
+################################################################################
+def write_snapshot(snapshot_file, generation, fields):
+    """Write a snapshot of generation and a dict mapping field names to
+    (timestamps, values) pairs to a binary file."""
+    header_fields = []
+    bodies = []
+    for field, (timestamps, values) in fields.items():
+        if isinstance(values, array) and values.typecode == 'd':
+            values_bytes = values.tobytes()
+            values_type = 'float'
+        else:
+            try:
+                values_bytes = json.dumps(list(values)).encode('utf-8')
+            except (TypeError, ValueError) as e:
+                logging.warning('Unable to save values of field %s to disk cache: %s',
+                                field, e)
+                continue
+            values_type = 'json'
+        timestamps_bytes = array('d', timestamps).tobytes()
+        header_fields.append([field, len(timestamps_bytes), values_type, len(values_bytes)])
+        bodies += [timestamps_bytes, values_bytes]
+
+    header = {'format': SNAPSHOT_FORMAT, 'byteorder': sys.byteorder,
+              'generation': generation, 'fields': header_fields}
+    snapshot_file.write(json.dumps(header).encode('utf-8') + b'\n')
+    for body in bodies:
+        snapshot_file.write(body)
+
+
+############################
+def read_snapshot(snapshot_file):
+    """Read a snapshot written by write_snapshot(). Return the generation
+    and a dict mapping field names to (timestamps, values) pairs. Raises
+    ValueError if the file isn't a valid snapshot."""
+    header = json.loads(snapshot_file.readline())
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError('not a disk cache snapshot')
+    swap = header['byteorder'] != sys.byteorder
+
+    def read_array(num_bytes):
+        data = snapshot_file.read(num_bytes)
+        if len(data) != num_bytes or num_bytes % 8:
+            raise ValueError('snapshot is truncated or corrupt')
+        result = array('d')
+        result.frombytes(data)
+        if swap:
+            result.byteswap()
+        return result
+
+    fields = {}
+    for field, timestamps_bytes, values_type, values_bytes in header['fields']:
+        timestamps = read_array(timestamps_bytes)
+        if values_type == 'float':
+            values = read_array(values_bytes)
+        elif values_type == 'json':
+            data = snapshot_file.read(values_bytes)
+            if len(data) != values_bytes:
+                raise ValueError('snapshot is truncated')
+            values = json.loads(data)
+        else:
+            raise ValueError('unknown value type "%s"' % values_type)
+        if len(values) != len(timestamps):
+            raise ValueError('field %s has %d timestamps but %d values'
+                             % (field, len(timestamps), len(values)))
+        fields[field] = (timestamps, values)
+    return int(header['generation']), fields
+
+
+################################################################################
+class DiskCache:
+    """Snapshot plus append-only journal of RecordCache contents."""
+
+    # Don't bother compacting until the journal is at least this big
+    MIN_COMPACT_BYTES = 1024 * 1024
+
+    ############################
+    def __init__(self, path):
+        """
+        ```
+        path     Directory in which to keep the snapshot and journal files.
+                 Created on first write if it doesn't exist.
+        ```
+        """
+        self.path = path
+        self.generation = 0
+        self.snapshot_bytes = 0
+        self.journal_bytes = 0
+
+        # Serialize writers (the cleanup thread and, at shutdown, main)
+        self.lock = threading.Lock()
+
+    ############################
+    def _snapshot_filename(self):
+        return os.path.join(self.path, SNAPSHOT_NAME)
+
+    ############################
+    def _journal_filename(self, generation=None):
+        if generation is None:
+            generation = self.generation
+        return os.path.join(self.path, JOURNAL_PREFIX + str(generation))
+
+    ############################
+    def _makedirs(self):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    ############################
+    def exists(self):
+        """Is there a snapshot or journal to load from?"""
+        try:
+            return any(name == SNAPSHOT_NAME or name.startswith(JOURNAL_PREFIX)
+                       for name in os.listdir(self.path))
+        except OSError:
+            return False
+
+    ############################
+    def load(self, capacity=0):
+        """Read the snapshot and replay its journal. Return a dict mapping
+        field names to FieldBuffers of the given capacity. Raises OSError
+        if the directory can't be read.
+        """
+        data = {}
+        snapshot_filename = self._snapshot_filename()
+        if os.path.exists(snapshot_filename):
+            try:
+                with open(snapshot_filename, 'rb') as snapshot_file:
+                    generation, fields = read_snapshot(snapshot_file)
+                for field, (timestamps, values) in fields.items():
+                    data[field] = FieldBuffer.from_arrays(timestamps, values, capacity)
+                self.generation = generation
+                self.snapshot_bytes = os.path.getsize(snapshot_filename)
+            except (KeyError, TypeError, ValueError) as e:  # includes JSONDecodeError
+                logging.warning('Failed to parse disk cache snapshot %s: %s',
+                                snapshot_filename, e)
+        else:
+            # No snapshot, so start from the oldest journal we can find
+            generations = [int(name[len(JOURNAL_PREFIX):])
+                           for name in os.listdir(self.path)
+                           if name.startswith(JOURNAL_PREFIX)
+                           and name[len(JOURNAL_PREFIX):].isdigit()]
+            self.generation = min(generations) if generations else 0
+
+        journal_filename = self._journal_filename()
+        if os.path.exists(journal_filename):
+            with open(journal_filename, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        field, timestamp, value = json.loads(line)
+                        if field not in data:
+                            data[field] = FieldBuffer(capacity)
+                        data[field].append(timestamp, value)
+                    except (json.decoder.JSONDecodeError, TypeError, ValueError):
+                        logging.warning('Skipping bad disk cache journal entry: %s',
+                                        line.strip())
+            self.journal_bytes = os.path.getsize(journal_filename)
+
+        self._remove_stale_journals()
+        return data
+
+    ############################
+    def append(self, entries):
+        """Append an iterable of (field, timestamp, value) entries to the
+        journal. Raises OSError if the journal can't be written.
+        """
+        lines = []
+        for entry in entries:
+            try:
+                lines.append(json.dumps(entry))
+            except (TypeError, ValueError) as e:
+                logging.warning('Unable to journal disk cache entry %s: %s', entry, e)
+        if not lines:
+            return
+
+        text = '\n'.join(lines) + '\n'
+        with self.lock:
+            self._makedirs()
+            with open(self._journal_filename(), 'a') as journal_file:
+                journal_file.write(text)
+            self.journal_bytes += len(text)
+
+    ############################
+    def needs_compaction(self):
+        """Has the journal grown enough that a new snapshot is worthwhile?"""
+        return self.journal_bytes > max(self.snapshot_bytes, self.MIN_COMPACT_BYTES)
+
+    ############################
+    def compact(self, fields):
+        """Write a new snapshot from a dict mapping field names to
+        (timestamps, values) pairs as returned by FieldBuffer.arrays(),
+        and start an empty journal to go with it. Raises OSError if the
+        snapshot can't be written.
+        """
+        with self.lock:
+            self._makedirs()
+            generation = self.generation + 1
+            snapshot_filename = self._snapshot_filename()
+            tmp_filename = snapshot_filename + '.tmp'
+            with open(tmp_filename, 'wb') as snapshot_file:
+                write_snapshot(snapshot_file, generation, fields)
+            os.replace(tmp_filename, snapshot_filename)
+
+            self.generation = generation
+            self.snapshot_bytes = os.path.getsize(snapshot_filename)
+            self.journal_bytes = 0
+            self._remove_stale_journals()
+
+    ############################
+    def _remove_stale_journals(self):
+        """Delete journals belonging to generations other than ours."""
+        current = JOURNAL_PREFIX + str(self.generation)
+        try:
+            for name in os.listdir(self.path):
+                if name.startswith(JOURNAL_PREFIX) and name != current:
+                    os.remove(os.path.join(self.path, name))
+        except OSError as e:
+            logging.warning('Unable to remove old disk cache journals in %s: %s',
+                            self.path, e)
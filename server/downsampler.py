@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Server-side downsampling of field values for CachedDataServer
+subscriptions.
+
+A client plotting an hour of a 10 Hz field on an 800 pixel wide strip
+chart has no use for all 36,000 values. Its subscription may instead ask
+the server to summarize values into fixed-width time buckets:
+```
+  {'type': 'subscribe',
+   'fields': {'S330SpeedOverGround': {'seconds': 3600, 'max_points': 800,
+                                      'aggregate': 'min-max'},
+              'MwxAirTemp': {'seconds': 600, 'min_interval': 5,
+                             'aggregate': 'mean'}}}
+```
+  min_interval  Width of each bucket, in seconds.
+
+  max_points    Make buckets wide enough that the 'seconds' of back data
+                requested fit into at most this many of them. If both are
+                given, the wider bucket wins.
+
+  aggregate     How to summarize each bucket:
+                  'last'    - the bucket's final (timestamp, value) pair
+                              (the default)
+                  'mean'    - the mean of its values, timestamped at the
+                              bucket's midpoint
+                  'min-max' - its minimum and maximum pairs, in time order,
+                              so that spikes survive downsampling
+                Buckets containing non-numeric values fall back to 'last'.
+
+Buckets are aligned to multiples of the bucket width. A bucket is sent
+once it's complete - that is, once a value for a later bucket arrives or
+the clock passes its end - so later updates arrive incrementally, one
+bucket at a time, and each raw value is only looked at once.
+
+The clock in question is the data's: if values arrive timestamped well
+in the past (e.g. when replaying old data), the lag between their
+timestamps and the wall clock is taken into account, so that a bucket
+isn't sent before its values have all had a chance to arrive. Each
+bucket is sent at most once; values that turn up for a bucket that has
+already been sent are dropped.
+"""
+
+AGGREGATES = ('last', 'mean', 'min-max')
+
+
+################################################################################
+def downsampler_from_spec(field_spec):
+    """Return a Downsampler for a subscription's field spec, or None if the
+    spec doesn't ask for downsampling. Raise ValueError if the spec's
+    downsampling parameters are invalid."""
+    if not isinstance(field_spec, dict):
+        return None
+    aggregate = field_spec.get('aggregate')
+    try:
+        interval = float(field_spec.get('min_interval') or 0)
+        max_points = int(field_spec.get('max_points') or 0)
+        seconds = float(field_spec.get('seconds') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('non-numeric min_interval, max_points or seconds in %s'
+                         % field_spec)
+    if max_points > 0 and seconds > 0:
+        interval = max(interval, seconds / max_points)
+    if interval <= 0:
+        if aggregate:
+            raise ValueError('"aggregate" requires a positive "min_interval", or '
+                             '"max_points" and "seconds"')
+        return None
+    return Downsampler(interval, aggregate or 'last')
+
+
+################################################################################
+class Downsampler:
+    """Incrementally summarize a stream of (timestamp, value) pairs into
+    one or two pairs per fixed-width time bucket."""
+
+    ############################
+    def __init__(self, interval, aggregate='last'):
+        """
+        ```
+        interval   Width of each bucket in seconds
+        aggregate  One of 'last', 'mean' or 'min-max'
+        ```
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError('Unknown aggregate "%s"; must be one of %s'
+                             % (aggregate, ', '.join(AGGREGATES)))
+        if not interval > 0:
+            raise ValueError('Downsampling interval must be positive; got %s' % interval)
+        self.interval = interval
+        self.aggregate = aggregate
+
+        self.bucket = None  # start time of bucket we're accumulating
+        self.pairs = []     # pairs in that bucket
+        self.sent = None    # start time of the last bucket summarized
+        self.lag = 0        # how far behind the clock the data's timestamps are
+
+    ############################
+    def add(self, pairs, now=None):
+        """Take a time-ordered list of new (timestamp, value) pairs and
+        return the summaries of any buckets they complete. If given, 'now'
+        is the time at which they arrived."""
+        result = []
+        interval = self.interval
+        for pair in pairs:
+            timestamp = pair[0]
+            bucket = timestamp - timestamp % interval
+            if self.sent is not None and bucket <= self.sent:
+                continue  # too late; that bucket's been sent
+            if bucket != self.bucket:
+                if self.pairs:
+                    result.extend(self._summarize())
+                self.bucket = bucket
+            self.pairs.append(pair)
+        if pairs and now is not None:
+            self.lag = max(0, now - pairs[-1][0])
+        return result
+
+    ############################
+    def flush(self, now):
+        """Return the summary of the current bucket if the clock says it's
+        over, as no more values for it can be expected."""
+        if self.pairs and now - self.lag >= self.bucket + self.interval:
+            return self._summarize()
+        return []
+
+    ############################
+    def _summarize(self):
+        """Summarize the current bucket's pairs and start afresh."""
+        pairs, self.pairs = self.pairs, []
+        self.sent = self.bucket
+        if self.aggregate == 'last' or \
+           not all(type(value) in (int, float) for timestamp, value in pairs):
+            return [pairs[-1]]
+
+        if self.aggregate == 'mean':
+            mean = sum(value for timestamp, value in pairs) / len(pairs)
+            return [(self.bucket + self.interval / 2, mean)]
+
+        # min-max
+        low = min(pairs, key=lambda pair: pair[1])
+        high = max(pairs, key=lambda pair: pair[1])
+        if low is high:
+            return [low]
+        return [low, high] if low[0] <= high[0] else [high, low]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Ring-buffer storage for the (timestamp, value) pairs that the
+CachedDataServer's RecordCache keeps for each field.
+
+A FieldBuffer behaves like a read-only list of (timestamp, value) tuples
+(it supports len(), indexing, slicing and iteration), but stores
+timestamps in a contiguous array('d') and, as long as every value it has
+been given is a float, stores values the same way. Non-float values
+(strings, ints, dicts, etc.) are kept in a plain list so that they come
+back out exactly as they went in.
+
+Because the pairs are kept in timestamp order, "everything newer than t"
+lookups are binary searches rather than scans, and discarding the oldest
+entries is O(1).
+
+    buffer = FieldBuffer(capacity=1000)
+    buffer.append(1555468528.4, 12.5)
+    buffer.append(1555468529.4, 12.7)
+    buffer[-1]              # (1555468529.4, 12.7)
+    buffer.since(1555468528.4)   # [(1555468529.4, 12.7)]
+"""
+from array import array
+
+
+################################################################################
+class FieldBuffer:
+    """Time-ordered ring buffer of (timestamp, value) pairs."""
+
+    # Initial allocation for buffers that have no fixed capacity
+    INITIAL_SIZE = 16
+
+    ############################
+    def __init__(self, capacity=0, pairs=None):
+        """
+        ```
+        capacity   If non-zero, the maximum number of pairs to keep; once
+                   full, appending a new pair discards the oldest one. If
+                   zero, the buffer grows as needed.
+
+        pairs      Optional iterable of (timestamp, value) pairs with which
+                   to initialize the buffer.
+        ```
+        """
+        self.capacity = int(capacity or 0)
+        self._size = self.capacity or self.INITIAL_SIZE
+        self._timestamps = array('d', bytes(8 * self._size))
+        self._values = array('d', bytes(8 * self._size))
+        self._numeric = True   # are all values stored in self._values floats?
+        self._start = 0        # physical index of oldest pair
+        self._len = 0
+
+        if pairs:
+            for timestamp, value in pairs:
+                self.append(timestamp, value)
+
+    ############################
+    @classmethod
+    def from_arrays(cls, timestamps, values, capacity=0):
+        """Build a buffer directly from parallel sequences of timestamps and
+        values, as returned by arrays(). Timestamps must already be in
+        order. If values is an array('d'), it is taken to be all floats.
+        """
+        buffer = cls(capacity)
+        count = len(timestamps)
+        if buffer.capacity and count > buffer.capacity:
+            timestamps = timestamps[-buffer.capacity:]
+            values = values[-buffer.capacity:]
+            count = buffer.capacity
+
+        size = buffer.capacity or max(cls.INITIAL_SIZE, count)
+        padding = size - count
+        buffer._size = size
+        buffer._timestamps = array('d', timestamps)
+        buffer._timestamps.extend(array('d', bytes(8 * padding)))
+        if isinstance(values, array) and values.typecode == 'd':
+            buffer._values = array('d', values)
+            buffer._values.extend(array('d', bytes(8 * padding)))
+        else:
+            buffer._numeric = False
+            buffer._values = list(values) + [None] * padding
+        buffer._len = count
+        return buffer
+
+    ############################
+    def __len__(self):
+        return self._len
+
+    ############################
+    def __bool__(self):
+        return self._len > 0
+
+    ############################
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._pair(i)
+
+    ############################
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._pair(i) for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('FieldBuffer index out of range')
+        return self._pair(index)
+
+    ############################
+    def __repr__(self):
+        return 'FieldBuffer(%s)' % self.to_list()
+
+    ############################
+    def _physical(self, index):
+        """Map a logical index (0 = oldest) to a position in the arrays."""
+        return (self._start + index) % self._size
+
+    ############################
+    def _pair(self, index):
+        position = self._physical(index)
+        return (self._timestamps[position], self._values[position])
+
+    ############################
+    def _timestamp(self, index):
+        return self._timestamps[self._physical(index)]
+
+    ############################
+    def _reallocate(self, size, pairs=None):
+        """Lay the pairs out afresh, oldest first, in arrays of the given size."""
+        pairs = self.to_list() if pairs is None else pairs
+        self._size = size
+        self._timestamps = array('d', bytes(8 * size))
+        if self._numeric:
+            self._values = array('d', bytes(8 * size))
+        else:
+            self._values = [None] * size
+        self._start = 0
+        self._len = 0
+        for timestamp, value in pairs:
+            self._store(timestamp, value)
+
+    ############################
+    def _store(self, timestamp, value):
+        """Put a pair at the end of the buffer, which must have room for it."""
+        position = self._physical(self._len)
+        self._timestamps[position] = timestamp
+        self._values[position] = value
+        self._len += 1
+
+    ############################
+    def append(self, timestamp, value):
+        """Add a (timestamp, value) pair. Pairs are normally appended in time
+        order; one that arrives out of order is inserted where it belongs."""
+        timestamp = float(timestamp)
+
+        # If we get a value that can't go in a float array, switch to
+        # storing values in a list from here on.
+        if self._numeric and type(value) is not float:
+            self._numeric = False
+            self._reallocate(self._size)
+
+        # Full? Either discard the oldest pair or make more room.
+        if self._len == self._size:
+            if self.capacity:
+                self._start = (self._start + 1) % self._size
+                self._len -= 1
+            else:
+                self._reallocate(self._size * 2)
+
+        if not self._len or timestamp >= self._timestamp(self._len - 1):
+            self._store(timestamp, value)
+            return
+
+        # Rare case: pair is out of order. Rebuild with it in place.
+        pairs = self.to_list()
+        pairs.insert(self.index_after(timestamp), (timestamp, value))
+        self._reallocate(self._size, pairs)
+
+    ############################
+    def index_before(self, timestamp):
+        """Return the number of pairs whose timestamp is less than
+        timestamp (i.e. the index of the first one that isn't)."""
+        low, high = 0, self._len
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    ############################
+    def index_after(self, timestamp):
+        """Return the index of the first pair whose timestamp is greater than
+        timestamp (or len(self) if there is none)."""
+        low, high = 0, self._len
+        while low < high:
+            middle = (low + high) // 2
+            if timestamp < self._timestamp(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    ############################
+    def since(self, timestamp):
+        """Return a list of all pairs with timestamp greater than timestamp."""
+        return self[self.index_after(timestamp):]
+
+    ############################
+    def drop_oldest(self, count):
+        """Discard the count oldest pairs."""
+        count = max(0, min(int(count), self._len))
+        self._start = (self._start + count) % self._size
+        self._len -= count
+
+    ############################
+    def cleanup(self, oldest=0, max_records=0, min_back_records=0):
+        """Discard pairs with timestamps older than 'oldest', but keep at
+        least one (most recent) value. If max_records is non-zero, also
+        truncate to that many of the most recent pairs. Always, though,
+        keep at least min_back_records.
+        """
+        min_back_records = int(min_back_records)
+        if self._len <= min_back_records:
+            return
+
+        if max_records > min_back_records and self._len > max_records:
+            self.drop_oldest(self._len - max_records)
+
+        # Drop pairs that are too old, but leave at least min_back_records
+        # and at least one.
+        keep_from = min(self.index_after(oldest), self._len - min_back_records - 1)
+        self.drop_oldest(max(0, keep_from))
+
+    ############################
+    def arrays(self):
+        """Return copies of the timestamps and values, oldest first. The
+        timestamps are an array('d'); the values are an array('d') if they
+        are all floats, and a list otherwise.
+        """
+        end = self._start + self._len
+        if end <= self._size:
+            return self._timestamps[self._start:end], self._values[self._start:end]
+        end -= self._size
+        return (self._timestamps[self._start:] + self._timestamps[:end],
+                self._values[self._start:] + self._values[:end])
+
+    ############################
+    def to_list(self):
+        """Return the contents as a list of (timestamp, value) tuples."""
+        return [self._pair(i) for i in range(self._len)]
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""Run several logger configs inside a single worker process.
+
+Each logger normally gets its own process (see logger_runner.py), which
+for a ship with dozens of simple UDP->parse->cache loggers means dozens
+of Python interpreters, each holding its own copy of every imported
+module. A LoggerGroupRunner instead starts one worker process and runs
+each of its loggers' Listeners in a thread within it.
+
+Loggers are added to and removed from a running group individually, via
+GroupedLoggerRunner objects, which have the same interface as
+LoggerRunner - start(), quit(), is_alive(), is_failed(), is_runnable() -
+so that LoggerSupervisor can start, monitor and restart a grouped logger
+exactly as it would one in its own process:
+```
+    group = LoggerGroupRunner(name='group_0',
+                              stderr_file_pattern='/var/log/openrvdas/{logger}.stderr')
+    runner = GroupedLoggerRunner(group, config=config, name='s330')
+    runner.start()
+    ...
+    runner.is_alive()   # True while s330's Listener is running
+    runner.quit()
+```
+If the worker process dies, all its loggers are reported as not alive,
+and the next start() of any of them restarts the process.
+
+Threads, unlike processes, can't be killed, so to stop a logger the
+worker asks its Listener to quit and closes its readers (those that have
+a close() method, e.g. UDPReader and TextFileReader), which wakes a
+Listener blocked waiting for input and frees its port, file or device.
+Before starting a logger, the worker waits for the Listeners it has
+stopped to finish; if one doesn't, it may still be holding on to
+something the new logger needs, so the worker asks for the whole group
+to be restarted in a fresh process - just as it would have been if each
+logger had had its own.
+
+Grouping saves memory, but not context switches: each logger still has
+a thread of its own that wakes for each record it reads. With 40 UDP
+loggers at 10 Hz each, test/benchmarks/benchmark_logger_groups.py
+measured a total PSS of 335 MB as 40 processes and 55 MB as two groups
+of 20, and about 380 context switches per second either way.
+
+Messages that a logger's Listener thread logs go to that logger's stderr
+file (and data server field, if any); messages from other threads in the
+worker (e.g. reader and writer threads) go to the group's own.
+"""
+import logging
+import sys
+import threading
+import time
+
+from importlib import reload
+from logging.handlers import RotatingFileHandler
+
+# Add the openrvdas/ directory to module search path
+from os.path import dirname, realpath
+sys.path.append(dirname(dirname(realpath(__file__))))
+from logger.listener.listen import ListenerFromLoggerConfig  # noqa: E402
+from logger.transforms.to_das_record_transform import ToDASRecordTransform  # noqa: E402
+from logger.utils.stderr_logging import DEFAULT_LOGGING_FORMAT  # noqa: E402
+from logger.utils.stderr_logging import StdErrLoggingHandler  # noqa: E402
+from logger.writers.cached_data_writer import CachedDataWriter  # noqa: E402
+from logger.writers.composed_writer import ComposedWriter  # noqa: E402
+from server.logger_runner import DEFAULT_START_METHOD, STDERR_BACKUP_COUNT  # noqa: E402
+from server.logger_runner import STDERR_MAX_BYTES, config_is_runnable  # noqa: E402
+from server.logger_runner import get_context, kill_handler  # noqa: E402
+
+# How long to wait for a stopped logger's Listener thread to finish
+STOP_TIMEOUT = 5
+
+
+################################################################################
+def _stderr_handlers(name, stderr_file_pattern, stderr_data_server):
+    """Return the logging handlers for a logger's (or group's) stderr."""
+    handlers = []
+    formatter = logging.Formatter(DEFAULT_LOGGING_FORMAT)
+    if stderr_file_pattern:
+        handler = RotatingFileHandler(stderr_file_pattern.format(logger=name),
+                                      maxBytes=STDERR_MAX_BYTES,
+                                      backupCount=STDERR_BACKUP_COUNT)
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    if stderr_data_server:
+        cds_writer = ComposedWriter(
+            transforms=ToDASRecordTransform(data_id='stderr',
+                                            field_name='stderr:logger:' + name),
+            writers=CachedDataWriter(data_server=stderr_data_server))
+        handlers.append(StdErrLoggingHandler(cds_writer))
+    return handlers
+
+
+################################################################################
+def _run_listener(logger, config, generation, connection, send_lock):
+    """Thread target: build and run a logger's Listener, then tell the
+    parent that it has exited."""
+    listener = None
+    try:
+        if config_is_runnable(config):
+            listener = ListenerFromLoggerConfig(config=config)
+            threading.current_thread().listener = listener
+            listener.run()
+    except Exception as e:
+        if listener and listener.quit_signalled:
+            # Most likely a reader we closed to stop it
+            logging.debug('Logger %s stopped with: %s', logger, e)
+        else:
+            logging.fatal(e)
+    with send_lock:
+        connection.send(('exited', logger, generation))
+
+
+################################################################################
+def _release_readers(listener):
+    """Close a stopped Listener's readers, so that one blocked in read()
+    wakes up and lets go of its port, file or device."""
+    for reader in getattr(listener.reader, 'readers', []):
+        close = getattr(reader, 'close', None)
+        if not callable(close):
+            continue
+        try:
+            close()
+        except Exception as e:
+            logging.debug('Error closing %s: %s', type(reader).__name__, e)
+
+
+################################################################################
+def run_logger_group(name, connection, stderr_file_pattern=None,
+                     stderr_data_server=None, log_level=logging.INFO,
+                     stop_timeout=STOP_TIMEOUT):
+    """Worker process: run loggers in threads, starting and stopping them
+    as instructed by ('start', logger, config, generation) and ('stop',
+    logger) messages on connection, and sending an ('exited', logger,
+    generation) message back whenever one of them finishes. Exit when the
+    connection is closed, a ('quit',) message arrives or we're terminated.
+
+    If a Listener we've stopped hasn't finished within stop_timeout
+    seconds by the time we're asked to start a logger, send a ('restart',
+    None, None) message and exit, rather than start it alongside.
+    """
+    # Reset logging to its freshly-imported state
+    reload(logging)
+    logging.basicConfig(handlers=[], level=log_level, format=DEFAULT_LOGGING_FORMAT)
+    signal_handler_installed = False
+    try:
+        import signal
+        signal.signal(signal.SIGTERM, kill_handler)
+        signal_handler_installed = True
+    except ValueError:
+        pass
+
+    # Messages from threads that aren't a logger's Listener thread
+    root = logging.getLogger()
+    loggers = set()
+    for handler in _stderr_handlers(name, stderr_file_pattern, stderr_data_server):
+        handler.addFilter(lambda record: record.threadName not in loggers)
+        root.addHandler(handler)
+
+    try:
+        from setproctitle import setproctitle
+        setproctitle('openrvdas/server/logger_group_runner.py:' + name)
+    except ImportError:
+        pass
+    logging.info('Starting logger group %s', name)
+
+    threads = {}        # logger -> thread running its Listener
+    handlers = {}       # logger -> its stderr handlers
+    stopping = {}       # thread told to stop -> when it should be done by
+    send_lock = threading.Lock()
+
+    def reap(logger, thread, logger_handlers):
+        # A thread can't be killed, and a Listener only notices that it's
+        # been asked to quit between records, so wait for it here rather
+        # than holding up the loggers that share our process.
+        thread.join(timeout=stop_timeout)
+        if thread.is_alive():
+            logging.warning('Logger %s did not stop within %g seconds',
+                            logger, stop_timeout)
+        else:
+            stopping.pop(thread, None)
+        for handler in logger_handlers:
+            root.removeHandler(handler)
+
+    def all_stopped():
+        # Wait for the Listeners we've stopped; any still running may be
+        # holding on to what the logger we're about to start needs.
+        for thread, deadline in list(stopping.items()):
+            thread.join(max(0, deadline - time.time()))
+            if thread.is_alive():
+                return False
+            stopping.pop(thread, None)
+        return True
+
+    def stop(logger):
+        thread = threads.pop(logger, None)
+        if thread is None:
+            return None
+        listener = getattr(thread, 'listener', None)
+        if listener:
+            listener.quit()
+            _release_readers(listener)
+        stopping[thread] = time.time() + stop_timeout
+        loggers.discard(logger)
+        reaper = threading.Thread(target=reap, name='reap:' + logger, daemon=True,
+                                  args=(logger, thread, handlers.pop(logger, [])))
+        reaper.start()
+        return reaper
+
+    try:
+        while True:
+            if not connection.poll(1):
+                continue
+            message = connection.recv()
+            if message[0] == 'quit':
+                break
+            elif message[0] == 'stop':
+                stop(message[1])
+            elif message[0] == 'start':
+                logger, config, generation = message[1:]
+                stop(logger)
+                if not all_stopped():
+                    logging.warning('Loggers in group %s did not stop; restarting group', name)
+                    with send_lock:
+                        connection.send(('restart', None, None))
+                    break
+                loggers.add(logger)
+                handlers[logger] = _stderr_handlers(logger, stderr_file_pattern,
+                                                    stderr_data_server)
+                for handler in handlers[logger]:
+                    handler.addFilter(lambda record, logger=logger:
+                                      record.threadName == logger)
+                    root.addHandler(handler)
+                logging.info('Starting logger %s config %s in group %s',
+                             logger, config.get('name', 'no_name'), name)
+                threads[logger] = threading.Thread(
+                    target=_run_listener, name=logger, daemon=True,
+                    args=(logger, config, generation, connection, send_lock))
+                threads[logger].start()
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass
+
+    # Signal our Listeners to quit; any that don't notice in time go
+    # down with the process, as they would have in their own processes.
+    for logger in list(threads):
+        stop(logger)
+    if signal_handler_installed:
+        logging.info('Logger group %s exiting', name)
+
+    # Allow a moment for stderr_writers to finish up
+    time.sleep(0.25)
+
+
+################################################################################
+class LoggerGroupRunner:
+    """Parent-side handle on a worker process running a group of loggers."""
+    ############################
+
+    def __init__(self, name, stderr_file_pattern=None, stderr_data_server=None,
+                 logger_log_level=logging.WARNING, start_method=DEFAULT_START_METHOD,
+                 stop_timeout=STOP_TIMEOUT):
+        """
+        ```
+        name     - Name of the group; also used as the 'logger' name for
+                   stderr messages that can't be attributed to one logger.
+
+        stderr_file_pattern - Optional pattern into which logger (or group)
+                   name will be interpolated to create the file to which
+                   its stderr will be written.
+
+        stderr_data_server - Optional host:port of a cached data server to
+                   send encoded stderr messages to.
+
+        logger_log_level - At what logging level our loggers should operate.
+
+        start_method - How to start the worker process; see LoggerRunner.
+
+        stop_timeout - How long to wait for a stopped logger to finish
+                   before restarting the worker process to be rid of it.
+        ```
+        """
+        self.name = name
+        self.stderr_file_pattern = stderr_file_pattern
+        self.stderr_data_server = stderr_data_server
+        self.logger_log_level = logger_log_level
+        self.start_method = start_method
+        self.stop_timeout = stop_timeout
+
+        self.process = None
+        self.connection = None
+        self.lock = threading.Lock()
+
+        # Map from logger name to the generation of its current start(),
+        # to whether it's (as far as we know) still running, and to its
+        # config, in case we have to restart it. Generations are counted
+        # across the group, so that an 'exited' from a logger we've
+        # removed can't be mistaken for one from its replacement.
+        self.generation = 0
+        self.generations = {}
+        self.running = {}
+        self.configs = {}
+
+    ############################
+    def __len__(self):
+        """Number of loggers in this group."""
+        return len(self.generations)
+
+    ############################
+    def _ensure_running(self):
+        """Start the worker process if it isn't running. Call with lock held."""
+        if self.process and self.process.is_alive():
+            return
+        context = get_context(self.start_method)
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=run_logger_group, daemon=True,
+            args=(self.name, child_connection),
+            kwargs={'stderr_file_pattern': self.stderr_file_pattern,
+                    'stderr_data_server': self.stderr_data_server,
+                    'log_level': self.logger_log_level,
+                    'stop_timeout': self.stop_timeout})
+        self.process.start()
+        child_connection.close()
+        self.running = {logger: False for logger in self.running}
+
+    ############################
+    def _stop_process(self):
+        """Stop the worker process, just as LoggerRunner.quit() would.
+        Call with lock held."""
+        self.process.terminate()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                logging.error('Process %s could not be killed', self.process.pid)
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    ############################
+    def _restart(self):
+        """Replace the worker process with a fresh one, running the same
+        loggers. Call with lock held."""
+        logging.warning('Restarting logger group %s', self.name)
+        self._stop_process()
+        self._ensure_running()
+        for logger, config in self.configs.items():
+            self._send_start(logger, config)
+
+    ############################
+    def _read_messages(self):
+        """Process any messages from the worker. Call with lock held."""
+        try:
+            while self.connection and self.connection.poll():
+                message, logger, generation = self.connection.recv()
+                if message == 'exited' and self.generations.get(logger) == generation:
+                    self.running[logger] = False
+                elif message == 'restart':
+                    self._restart()
+                    return
+        except (EOFError, OSError):
+            pass
+
+    ############################
+    def _send_start(self, logger, config):
+        """Have the worker start a logger. Call with lock held."""
+        self.generation += 1
+        self.generations[logger] = self.generation
+        self.running[logger] = True
+        self.configs[logger] = config
+        self.connection.send(('start', logger, config, self.generation))
+
+    ############################
+    def start_logger(self, logger, config):
+        """Start (or restart) a logger in the worker process."""
+        with self.lock:
+            self._ensure_running()
+            self._send_start(logger, config)
+
+    ############################
+    def stop_logger(self, logger):
+        """Stop a logger and remove it from the group. Stop the worker
+        process if that was its last logger."""
+        with self.lock:
+            self.generations.pop(logger, None)
+            self.running.pop(logger, None)
+            self.configs.pop(logger, None)
+            if not (self.process and self.process.is_alive()):
+                return
+            if self.generations:
+                try:
+                    self.connection.send(('stop', logger))
+                except (BrokenPipeError, OSError):
+                    pass
+                return
+
+            # That was our last logger; shut down the process
+            self._stop_process()
+
+    ############################
+    def logger_is_alive(self, logger):
+        """Is the logger running in our worker process?"""
+        with self.lock:
+            # (Read messages first, in case the worker's exited to be restarted)
+            self._read_messages()
+            if not (self.process and self.process.is_alive()):
+                return False
+            return self.running.get(logger, False)
+
+
+################################################################################
+class GroupedLoggerRunner:
+    """Stand-in for LoggerRunner that runs its logger in a LoggerGroupRunner's
+    worker process rather than in a process of its own."""
+    ############################
+
+    def __init__(self, group, config, name=None):
+        """
+        ```
+        group    - LoggerGroupRunner in which to run the logger
+
+        config   - Python dict containing the logger configuration to be run
+
+        name     - Name of the logger
+        ```
+        """
+        self.group = group
+        self.config = config
+        self.name = name or config.get('name', 'Unnamed logger')
+        self.failed = False     # flag - has logger failed?
+        self.quit_flag = False  # flag - has quit been signaled?
+
+    ############################
+    def start(self):
+        """Start the logger in the group's worker process."""
+        self.quit_flag = False
+        self.failed = False
+        self.group.start_logger(self.name, self.config)
+
+    ############################
+    def is_runnable(self):
+        """Is this logger configuration runnable?"""
+        return config_is_runnable(self.config)
+
+    ############################
+    def is_alive(self):
+        """Is the logger in question alive?"""
+        return self.group.logger_is_alive(self.name)
+
+    ############################
+    def is_failed(self):
+        """Return whether the logger has failed."""
+        return self.failed
+
+    ############################
+    def quit(self):
+        """Stop the logger and remove it from its group."""
+        self.quit_flag = True
+        self.group.stop_logger(self.name)
+        self.failed = False
@@ -67,6 +67,20 @@ from logger.utils.stderr_logging import StdErrLoggingHandler  # noqa: E402
 STDERR_MAX_BYTES = 1000000  # 10M
 STDERR_BACKUP_COUNT = 100  # 100 backups should be plenty
 
+# How to start logger processes. With 'forkserver', a single server process
+# imports PRELOAD_MODULES (all the readers, transforms and writers) once, and
+# each logger process is forked, already warm, from it - so starting or
+# restarting a logger doesn't pay the import cost again, and we never fork
+# from our own (multithreaded) process. Fall back to the platform default
+# where forkserver isn't available.
+DEFAULT_START_METHOD = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                        else None)
+PRELOAD_MODULES = ['logger.readers', 'logger.transforms', 'logger.writers',
+                   'logger.listener.listen', 'server.logger_runner']
+
+OPENRVDAS_ROOT = dirname(dirname(realpath(__file__)))
+_contexts = {}  # start method -> multiprocessing context
+
 
 ################################################################################
 def kill_handler(self, signum):
@@ -76,6 +90,24 @@ def kill_handler(self, signum):
     raise KeyboardInterrupt('Received external kill signal')
 
 
+################################################################################
+def get_context(start_method=DEFAULT_START_METHOD):
+    """Return the multiprocessing context with which to start logger
+    processes. If it's a forkserver, tell it which modules to preload."""
+    if start_method not in _contexts:
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            # The forkserver is a fresh interpreter that finds its preload
+            # modules via PYTHONPATH rather than our sys.path.
+            python_path = os.environ.get('PYTHONPATH', '').split(os.pathsep)
+            if OPENRVDAS_ROOT not in python_path:
+                os.environ['PYTHONPATH'] = os.pathsep.join(
+                    [OPENRVDAS_ROOT] + [path for path in python_path if path])
+            context.set_forkserver_preload(PRELOAD_MODULES)
+        _contexts[start_method] = context
+    return _contexts[start_method]
+
+
 ################################################################################
 def config_from_filename(filename):
     """Load a logger configuration from a filename. If there's a ':' in
@@ -132,6 +164,10 @@ def run_logger(logger, config, stderr_filename=None, stderr_data_server=None,
     # Reset logging to its freshly-imported state
     reload(logging)
 
+    # A process that wasn't forked from ours (e.g. one from a forkserver)
+    # doesn't inherit our SIGTERM handler, so set it here.
+    signal.signal(signal.SIGTERM, kill_handler)
+
     if stderr_filename:
         stderr_handlers = [RotatingFileHandler(stderr_filename,
                                                maxBytes=STDERR_MAX_BYTES,
@@ -173,7 +209,8 @@ def run_logger(logger, config, stderr_filename=None, stderr_data_server=None,
 class LoggerRunner:
     ############################
     def __init__(self, config, name=None, stderr_filename=None,
-                 stderr_data_server=None, logger_log_level=logging.WARNING):
+                 stderr_data_server=None, logger_log_level=logging.WARNING,
+                 start_method=DEFAULT_START_METHOD):
         """Create a LoggerRunner.
         ```
         config   - Python dict containing the logger configuration to be run
@@ -186,6 +223,10 @@ class LoggerRunner:
                    send encoded stderr messages to.
 
         logger_log_level - At what logging level our logger should operate.
+
+        start_method - How to start the logger process: 'forkserver' (the
+                   default, where available), 'fork' or 'spawn'. If None,
+                   use the platform's default.
         ```
         """
         self.config = config
@@ -193,6 +234,7 @@ class LoggerRunner:
         self.stderr_filename = stderr_filename
         self.stderr_data_server = stderr_data_server
         self.logger_log_level = logger_log_level
+        self.start_method = start_method
 
         self.process = None     # this is hold the logger process
         self.failed = False     # flag - has logger failed?
@@ -231,9 +273,10 @@ class LoggerRunner:
             'stderr_data_server': self.stderr_data_server,
             'log_level': self.logger_log_level
         }
-        self.process = multiprocessing.Process(target=run_logger,
-                                               kwargs=run_logger_kwargs,
-                                               daemon=True)
+        context = get_context(self.start_method)
+        self.process = context.Process(target=run_logger,
+                                       kwargs=run_logger_kwargs,
+                                       daemon=True)
         self.process.start()
 
     ############################
@@ -301,6 +344,11 @@ if __name__ == '__main__':
                         help='Optional host:port of a cached data server to which '
                         ' stderr messages should be written.')
 
+    parser.add_argument('--start_method', dest='start_method',
+                        default=DEFAULT_START_METHOD,
+                        choices=multiprocessing.get_all_start_methods(),
+                        help='How to start the logger process.')
+
     parser.add_argument('-v', '--verbosity', dest='verbosity',
                         default=0, action='count',
                         help='Increase output verbosity')
@@ -328,7 +376,8 @@ if __name__ == '__main__':
                           name=args.name,
                           stderr_filename=args.stderr_filename,
                           stderr_data_server=args.stderr_data_server,
-                          logger_log_level=logger_log_level)
+                          logger_log_level=logger_log_level,
+                          start_method=args.start_method)
     runner.start()
 
     # Wait for it to complete
@@ -11,7 +11,8 @@ sys.path.append(dirname(dirname(realpath(__file__))))
 from logger.utils.stderr_logging import DEFAULT_LOGGING_FORMAT  # noqa: E402
 from logger.utils.read_config import read_config, expand_cruise_definition  # noqa: E402
 
-from server.logger_runner import LoggerRunner  # noqa: E402
+from server.logger_runner import LoggerRunner, config_is_runnable  # noqa: E402
+from server.logger_group_runner import LoggerGroupRunner, GroupedLoggerRunner  # noqa: E402
 
 
 ################################################################################
@@ -22,7 +23,7 @@ class LoggerSupervisor:
 
     def __init__(self, configs=None, stderr_file_pattern=None, stderr_data_server=None,
                  max_tries=3, min_uptime=10, interval=1,
-                 logger_log_level=logging.WARNING):
+                 logger_log_level=logging.WARNING, group_size=0):
         """
         ```
         configs   - dict of {logger_name: config} that are to be run
@@ -44,6 +45,13 @@ class LoggerSupervisor:
 
         logger_log_level - at what system log level the logger should log (if
                     it were a woodchuck chucking wood)
+
+        group_size - If non-zero, rather than giving each logger a process
+                    of its own, run runnable loggers in threads, up to
+                    group_size of them sharing each worker process. Each
+                    logger is still started, monitored and restarted
+                    individually. Useful when running many lightweight
+                    loggers on a small machine.
         ```
         """
         self.configs = configs or {}
@@ -53,6 +61,10 @@ class LoggerSupervisor:
         self.min_uptime = min_uptime
         self.interval = interval
         self.logger_log_level = logger_log_level
+        self.group_size = group_size
+
+        # LoggerGroupRunners whose worker processes run grouped loggers
+        self.groups = []
 
         # Where we store the map from logger name to config actually  # noqa: E402
         # running. Also map from logger name to LoggerRunner that's doing  # noqa: E402
@@ -139,13 +151,34 @@ class LoggerSupervisor:
         self.logger_config_map[logger] = config
         stderr_filename = self.stderr_file_pattern.format(logger=logger)
 
-        runner = LoggerRunner(config=config, name=logger,
-                              stderr_filename=stderr_filename,
-                              stderr_data_server=self.stderr_data_server,
-                              logger_log_level=self.logger_log_level)
+        group = self._find_group(config)
+        if group is not None:
+            runner = GroupedLoggerRunner(group, config=config, name=logger)
+        else:
+            runner = LoggerRunner(config=config, name=logger,
+                                  stderr_filename=stderr_filename,
+                                  stderr_data_server=self.stderr_data_server,
+                                  logger_log_level=self.logger_log_level)
         self.logger_runner_map[logger] = runner
         self.logger_runner_map[logger].start()
 
+    ###################
+    def _find_group(self, config):
+        """If we're grouping loggers and config is runnable, return a
+        LoggerGroupRunner with room for it, creating one if necessary.
+        ONLY CALL THIS FROM WITHIN _start_logger for thread safety."""
+        if not self.group_size or not config_is_runnable(config):
+            return None
+        for group in self.groups:
+            if len(group) < self.group_size:
+                return group
+        group = LoggerGroupRunner(name='group_%d' % len(self.groups),
+                                  stderr_file_pattern=self.stderr_file_pattern,
+                                  stderr_data_server=self.stderr_data_server,
+                                  logger_log_level=self.logger_log_level)
+        self.groups.append(group)
+        return group
+
     ###################
 
     def _delete_logger(self, logger):
@@ -278,6 +311,11 @@ if __name__ == '__main__':
                         type=float, default=1, help='How many seconds between '
                         'checks that a logger is still running.')
 
+    parser.add_argument('--group_size', dest='group_size', action='store',
+                        type=int, default=0, help='If non-zero, run up to this '
+                        'many loggers as threads in each worker process rather '
+                        'than giving each logger a process of its own.')
+
     parser.add_argument('-v', '--verbosity', dest='verbosity',
                         default=0, action='count',
                         help='Increase output verbosity')
@@ -313,6 +351,7 @@ if __name__ == '__main__':
                            max_tries=args.max_tries,
                            min_uptime=args.min_uptime,
                            interval=args.interval,
-                           logger_log_level=logger_log_level
+                           logger_log_level=logger_log_level,
+                           group_size=args.group_size
                            )
     sup.run()
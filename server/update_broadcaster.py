@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Shared, serialize-once fan-out of new field values to CachedDataServer
+subscribers.
+
+As new (timestamp, value) pairs are cached for a field that at least one
+client has subscribed to, the RecordCache hands them to an
+UpdateBroadcaster, which holds them as "pending". The first client to ask
+for updates on that field causes the pending pairs to be sealed into a
+segment. Each segment is encoded at most once per wire encoding (JSON
+text, or a msgpack fragment - see logger/utils/wire_format.py), the
+first time a client using that encoding asks for it; the encoded form is
+then shared by every other subscribed client that asks for it, so the
+cost of serialization scales with the data rate rather than with
+clients x fields x polls.
+
+Segments cover contiguous, non-overlapping time ranges, so a client that
+last received data through timestamp T can be sent the concatenation of
+all segments newer than T. If a client has fallen so far behind that the
+segments it needs have been discarded, or if T falls in the middle of a
+segment, get_update() returns None and the caller should fall back to
+retrieving the values from the cache directly.
+"""
+import json
+import sys
+import threading
+
+from collections import deque
+from os.path import dirname, realpath
+
+sys.path.append(dirname(dirname(realpath(__file__))))
+from logger.utils import wire_format  # noqa: E402
+
+# How many serialized segments to retain for each field
+MAX_SEGMENTS = 100
+
+
+################################################################################
+class UpdateBroadcaster:
+    """Serialize new values for subscribed fields once and share them."""
+
+    ############################
+    def __init__(self, max_segments=MAX_SEGMENTS):
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+
+        # field: number of clients subscribed to it
+        self.subscribers = {}
+
+        # field: list of (timestamp, value) pairs not yet serialized
+        self.pending = {}
+
+        # field: deque of [start_ts, end_ts, values, json_text, packed]
+        # segments. Each one holds all values with start_ts < timestamp <=
+        # end_ts; json_text and packed are filled in when first needed.
+        self.segments = {}
+
+        # field: the timestamp after which we have every value, either in
+        # segments or pending
+        self.chain_start = {}
+
+        # field: timestamp of the most recent value we've been given
+        self.latest = {}
+
+    ############################
+    def subscribe(self, field, latest_timestamp=0):
+        """Note that a client is interested in field. If this is the first
+        subscriber, latest_timestamp should be the timestamp of the most
+        recent value already cached for the field, as we'll only be able
+        to provide values newer than that."""
+        with self.lock:
+            count = self.subscribers.get(field, 0)
+            self.subscribers[field] = count + 1
+            if count == 0:
+                self.pending[field] = []
+                self.segments[field] = deque()
+                self.chain_start[field] = latest_timestamp
+                self.latest[field] = latest_timestamp
+
+    ############################
+    def unsubscribe(self, field):
+        """Note that a client is no longer interested in field. When the
+        last subscriber leaves, stop keeping values for it."""
+        with self.lock:
+            count = self.subscribers.get(field, 0)
+            if count > 1:
+                self.subscribers[field] = count - 1
+                return
+            for field_map in [self.subscribers, self.pending, self.segments,
+                              self.chain_start, self.latest]:
+                field_map.pop(field, None)
+
+    ############################
+    def add(self, field, timestamp, value):
+        """Note a newly-cached value. Cheap no-op if no one is subscribed."""
+        if field not in self.subscribers:
+            return
+        with self.lock:
+            pending = self.pending.get(field)
+            if pending is None:
+                return
+            if timestamp < self.latest[field]:
+                # Out of order; we can no longer vouch for anything before
+                # now, so make clients fall back to the cache.
+                self.pending[field] = []
+                self.segments[field].clear()
+                self.chain_start[field] = self.latest[field]
+                return
+            pending.append((timestamp, value))
+            self.latest[field] = timestamp
+
+    ############################
+    def seal(self, field):
+        """Serialize any pending values for field into a new segment, so
+        that the next segment will begin with values that arrive after
+        this call."""
+        with self.lock:
+            if field in self.segments:
+                self._seal(field)
+
+    ############################
+    def _seal(self, field):
+        """Serialize any pending values for field into a new segment. Must
+        be called with self.lock held."""
+        pending = self.pending[field]
+        if not pending:
+            return
+        segments = self.segments[field]
+        start_ts = segments[-1][1] if segments else self.chain_start[field]
+        segments.append([start_ts, pending[-1][0], pending, None, None])
+        self.pending[field] = []
+
+        # Discard oldest segments if we've got too many
+        while len(segments) > self.max_segments:
+            dropped = segments.popleft()
+            self.chain_start[field] = dropped[1]
+
+    ############################
+    def get_update(self, field, since, encoding=wire_format.JSON):
+        """Return an (encoded, latest_timestamp) pair, where encoded holds
+        all [timestamp, value] pairs for field with timestamps greater than
+        'since', and latest_timestamp is the last of those timestamps.
+
+        For JSON, encoded is the JSON text of the list of pairs, '[]' if
+        there are no new values. For msgpack, it's a list of (count, body)
+        pairs for wire_format.pack_data_message(), empty if there are no
+        new values. If there are no new values, latest_timestamp is 'since'.
+
+        If we can't vouch for having all values newer than 'since', return
+        None so caller can retrieve them from the cache instead.
+        """
+        with self.lock:
+            segments = self.segments.get(field)
+            if segments is None or since < self.chain_start[field]:
+                return None
+            self._seal(field)
+
+            # Walk backwards to find the segments we need
+            needed = []
+            for segment in reversed(segments):
+                if segment[1] <= since:
+                    break
+                needed.append(segment)
+
+            # If 'since' falls in the middle of a segment, we'd have to
+            # slice it; let the caller go to the cache instead.
+            if needed and needed[-1][0] < since:
+                return None
+            needed.reverse()
+            latest = needed[-1][1] if needed else since
+
+            if encoding == wire_format.MSGPACK:
+                for segment in needed:
+                    if segment[4] is None:
+                        segment[4] = wire_format.pack_values(segment[2])
+                return ([segment[4] for segment in needed], latest)
+
+            if not needed:
+                return ('[]', since)
+            for segment in needed:
+                if segment[3] is None:
+                    segment[3] = json.dumps(segment[2])
+            if len(needed) == 1:
+                return (needed[0][3], latest)
+            text = '[' + ', '.join(segment[3][1:-1] for segment in needed) + ']'
+            return (text, latest)
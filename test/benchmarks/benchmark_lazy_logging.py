@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Measure the per-record cost of building debug log messages that are
+never emitted, by parsing sample NBP1406 records with RecordParser both
+as it is (lazy formatting) and with pprint.pformat() substituted back in
+for lazy_pformat() (eager formatting, as the parser used to do).
+
+Run from the openrvdas root directory:
+
+    test/benchmarks/benchmark_lazy_logging.py --records 20000
+"""
+import argparse
+import glob
+import logging
+import os
+import pprint
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from logger.utils import record_parser  # noqa: E402
+
+DEFINITION_PATH = 'test/NBP1406/devices/*.yaml'
+DATA_GLOB = 'test/NBP1406/data/%s/raw/*'
+INSTRUMENTS = ['s330', 'gyr1', 'knud', 'mwx1', 'grv1', 'seap']
+
+
+############################
+def load_records(count):
+    """Return up to count data_id-prefixed records from the sample data."""
+    records = []
+    for data_id in INSTRUMENTS:
+        for filename in sorted(glob.glob(DATA_GLOB % data_id)):
+            with open(filename) as data_file:
+                records += [data_id + ' ' + line.strip() for line in data_file]
+    return records[:count]
+
+
+############################
+def time_parse(parser, records, repeat):
+    """Return best-of-repeat microseconds per record for parse_record()."""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            parser.parse_record(record)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e6 * best / len(records)
+
+
+################################################################################
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--records', dest='records', type=int, default=20000,
+                           help='Number of sample records to parse')
+    argparser.add_argument('--repeat', dest='repeat', type=int, default=3,
+                           help='Number of timing runs; best is reported')
+    args = argparser.parse_args()
+
+    # DEBUG messages are off, as they would be in production
+    logging.getLogger().setLevel(logging.WARNING)
+
+    records = load_records(args.records)
+    parser = record_parser.RecordParser(definition_path=DEFINITION_PATH, quiet=True)
+
+    lazy = time_parse(parser, records, args.repeat)
+
+    lazy_pformat = record_parser.lazy_pformat
+    record_parser.lazy_pformat = pprint.pformat
+    try:
+        eager = time_parse(parser, records, args.repeat)
+    finally:
+        record_parser.lazy_pformat = lazy_pformat
+
+    print('Parsed %d records' % len(records))
+    print('  eager debug formatting: %8.1f us/record' % eager)
+    print('  lazy debug formatting:  %8.1f us/record' % lazy)
+    print('  savings:                %8.1f us/record (%.0f%%)'
+          % (eager - lazy, 100 * (eager - lazy) / eager))
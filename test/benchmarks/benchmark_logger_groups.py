@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Compare the memory and context switches of running loggers each in a
+process of its own (LoggerRunner) with running them as threads in shared
+worker processes (LoggerGroupRunner).
+
+Each logger reads UDP datagrams from its own port and writes them to
+/dev/null, and is fed a small datagram at --rate Hz. Once every logger
+is running, the benchmark reports the total proportional set size (PSS)
+of the logger processes, and how many context switches all their threads
+made over --seconds seconds. Linux only, as the numbers come from /proc.
+
+Run from the openrvdas root directory:
+
+    test/benchmarks/benchmark_logger_groups.py --loggers 40 --group_size 20
+"""
+import argparse
+import glob
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from server.logger_group_runner import LoggerGroupRunner, GroupedLoggerRunner  # noqa: E402
+from server.logger_runner import LoggerRunner  # noqa: E402
+
+
+############################
+def make_configs(count, base_port):
+    """Return count UDP logger configs, reading from consecutive ports."""
+    return [{'name': 'logger_%d' % i,
+             'readers': {'class': 'UDPReader',
+                         'kwargs': {'interface': '127.0.0.1', 'port': base_port + i}},
+             'writers': {'class': 'TextFileWriter',
+                         'kwargs': {'filename': os.devnull}}}
+            for i in range(count)]
+
+
+############################
+def pss_kb(pid):
+    """Proportional set size of a process in kB: its private memory plus
+    its share of what it shares with others, so that memory shared between
+    forked processes is only counted once in a total."""
+    with open('/proc/%d/smaps_rollup' % pid) as smaps:
+        for line in smaps:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    return 0
+
+
+############################
+def context_switches(pid):
+    """Voluntary plus involuntary context switches made so far by all
+    threads of a process."""
+    total = 0
+    for status_file in glob.glob('/proc/%d/task/*/status' % pid):
+        try:
+            with open(status_file) as status:
+                for line in status:
+                    if 'ctxt_switches' in line:
+                        total += int(line.split()[1])
+        except OSError:
+            pass  # thread exited
+    return total
+
+
+############################
+def feed(ports, rate, stop):
+    """Send a datagram to each port rate times a second until stop is set."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    record = b'$INHDT,235.18,T*18'
+    while not stop.is_set():
+        for port in ports:
+            sock.sendto(record, ('127.0.0.1', port))
+        stop.wait(1 / rate)
+
+
+############################
+def measure(label, runners, pids, ports, args):
+    """Start runners, feed them, and print what their processes cost."""
+    for runner in runners:
+        runner.start()
+    time.sleep(args.warmup)
+
+    stop = threading.Event()
+    feeder = threading.Thread(target=feed, args=(ports, args.rate, stop), daemon=True)
+    feeder.start()
+    time.sleep(1)
+
+    processes = pids()
+    switches = sum(context_switches(pid) for pid in processes)
+    time.sleep(args.seconds)
+    switches = sum(context_switches(pid) for pid in processes) - switches
+    memory = sum(pss_kb(pid) for pid in processes)
+
+    stop.set()
+    feeder.join()
+    for runner in runners:
+        runner.quit()
+
+    print('  %-22s %3d processes  PSS: %7.1f MB  context switches: %7.0f/s'
+          % (label, len(processes), memory / 1024, switches / args.seconds))
+
+
+################################################################################
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--loggers', dest='loggers', type=int, default=40,
+                           help='Number of loggers to run')
+    argparser.add_argument('--group_size', dest='group_size', type=int, default=20,
+                           help='Number of loggers per worker process when grouped')
+    argparser.add_argument('--rate', dest='rate', type=float, default=10,
+                           help='Datagrams per second sent to each logger')
+    argparser.add_argument('--seconds', dest='seconds', type=float, default=5,
+                           help='Seconds over which to count context switches')
+    argparser.add_argument('--warmup', dest='warmup', type=float, default=3,
+                           help='Seconds to let loggers start before measuring')
+    argparser.add_argument('--base_port', dest='base_port', type=int, default=18000,
+                           help='First of the UDP ports that loggers listen on')
+    args = argparser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    configs = make_configs(args.loggers, args.base_port)
+    ports = [args.base_port + i for i in range(args.loggers)]
+    print('%d UDP loggers at %g Hz each' % (args.loggers, args.rate))
+
+    runners = [LoggerRunner(config=config) for config in configs]
+    measure('one process per logger', runners,
+            lambda: [runner.process.pid for runner in runners], ports, args)
+
+    groups = [LoggerGroupRunner(name='group_%d' % i)
+              for i in range(0, args.loggers, args.group_size)]
+    runners = [GroupedLoggerRunner(groups[i // args.group_size], config=config)
+               for i, config in enumerate(configs)]
+    measure('groups of %d' % args.group_size, runners,
+            lambda: [group.process.pid for group in groups], ports, args)
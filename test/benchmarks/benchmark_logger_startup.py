@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Measure how long LoggerRunner takes to get loggers running - the cost
+a mode change or a LoggerSupervisor restart pays for each logger - when
+logger processes are started by each of the available multiprocessing
+start methods.
+
+Each logger copies a small text file to another. A logger counts as
+started once its first line has been written.
+
+Run from the openrvdas root directory:
+
+    test/benchmarks/benchmark_logger_startup.py --loggers 20
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+from server.logger_runner import LoggerRunner  # noqa: E402
+
+
+############################
+def make_configs(tmpdir, count):
+    """Return count file-copying logger configs and their output files."""
+    source = os.path.join(tmpdir, 'source.txt')
+    with open(source, 'w') as source_file:
+        source_file.write('a line of data\n')
+
+    configs = []
+    for i in range(count):
+        dest = os.path.join(tmpdir, 'dest_%d.txt' % i)
+        configs.append(({'name': 'logger_%d' % i,
+                         'readers': {'class': 'TextFileReader',
+                                     'kwargs': {'file_spec': source, 'tail': True,
+                                                'interval': 0.01}},
+                         'writers': {'class': 'TextFileWriter',
+                                     'kwargs': {'filename': dest}}},
+                        dest))
+    return configs
+
+
+############################
+def time_startup(start_method, configs):
+    """Start a runner for each config and return the seconds until every
+    one of them has written its output."""
+    for config, dest in configs:
+        if os.path.exists(dest):
+            os.remove(dest)
+
+    start = time.perf_counter()
+    runners = [LoggerRunner(config=config, start_method=start_method)
+               for config, dest in configs]
+    for runner in runners:
+        runner.start()
+    waiting = [dest for config, dest in configs]
+    while waiting:
+        waiting = [dest for dest in waiting
+                   if not os.path.exists(dest) or not os.path.getsize(dest)]
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    for runner in runners:
+        runner.quit()
+    return elapsed
+
+
+################################################################################
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--loggers', dest='loggers', type=int, default=20,
+                           help='Number of loggers to start at once')
+    argparser.add_argument('--repeat', dest='repeat', type=int, default=3,
+                           help='Number of timing runs; best is reported')
+    args = argparser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        configs = make_configs(tmpdir, args.loggers)
+        print('Starting %d loggers' % args.loggers)
+        for start_method in multiprocessing.get_all_start_methods():
+            # The first run for forkserver includes starting the server
+            # itself, which is paid once per LoggerRunner process.
+            times = [time_startup(start_method, configs) for i in range(args.repeat)]
+            print('  %-11s first: %6.0f ms  best: %6.0f ms  (%5.1f ms/logger)'
+                  % (start_method, 1000 * times[0], 1000 * min(times),
+                     1000 * min(times) / args.loggers))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+sys.path.append('.')
+from database.columns import ColumnBuilder  # noqa: E402
+
+
+class TestColumnBuilder(unittest.TestCase):
+
+    ############################
+    def test_columns(self):
+        builder = ColumnBuilder()
+        builder.add('f1', 1, 1.5)
+        builder.add('f2', 1, 'a')
+        builder.add('f1', 2, 2)
+        builder.add('f1', 3, None)
+        builder.add('f2', 2, 3.5)
+        builder.add('f3', 2, True)
+        columns = builder.result()
+
+        self.assertEqual(sorted(columns), ['f1', 'f2', 'f3'])
+        timestamps, values = columns['f1']
+        self.assertEqual(list(timestamps), [1.0, 2.0])
+        self.assertEqual(list(values), [1.5, 2.0])
+
+        # Once a field has a non-numeric value, its values come back as is
+        timestamps, values = columns['f2']
+        self.assertEqual(list(timestamps), [1.0, 2.0])
+        self.assertEqual(values, ['a', 3.5])
+
+        self.assertEqual(list(columns['f3'][1]), [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,11 @@
 import logging
 import sys
 import unittest
+from unittest import mock
 
 sys.path.append('.')
+from database import mongo_connector  # noqa: E402
+from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.utils.nmea_parser import NMEAParser  # noqa: E402
 
 try:
@@ -78,8 +81,84 @@ BATCH_RESULTS = [
 ]
 
 
+class FakeCollection:
+    """Stand-in for a MongoDB collection that can fail partway through an
+    unordered insert, and refuses documents with a 'poison' value."""
+    def __init__(self):
+        self.docs = {}
+        self.fail_after = None
+
+    def with_options(self, **kwargs):
+        return self
+
+    def insert_many(self, docs, ordered=True):
+        write_errors = []
+        for index, doc in enumerate(docs):
+            if self.fail_after is not None and index == self.fail_after:
+                self.fail_after = None
+                raise mongo_connector.ConnectionFailure('Connection reset')
+            if doc['_id'] in self.docs:
+                write_errors.append({'index': index, 'code': 11000})
+            elif doc.get('str_value') == 'poison':
+                write_errors.append({'index': index, 'code': 2})
+            else:
+                self.docs[doc['_id']] = doc
+        if write_errors:
+            raise mongo_connector.BulkWriteError({'writeErrors': write_errors})
+
+
+class FakeClient:
+    def __init__(self, hosts):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self
+
+    def with_options(self, **kwargs):
+        return FakeCollection()
+
+    def collection_names(self):
+        return list(self.collections)
+
+    def close(self):
+        pass
+
+
 class TestDatabase(unittest.TestCase):
 
+    ############################
+    @unittest.skipUnless(mongo_connector.MONGO_ENABLED, 'pymongo not installed')
+    def test_retry_without_duplicates(self):
+        with mock.patch.object(mongo_connector.pymongo, 'MongoClient', FakeClient):
+            db = mongo_connector.MongoConnector(database='test', host='localhost',
+                                                user='test', password='test',
+                                                batch_size=4)
+        records = [DASRecord(timestamp=i, fields={'a': i, 'b': str(i)}) for i in range(1, 5)]
+
+        # The connection drops after half the batch's values are inserted;
+        # when the batch is written again, they aren't inserted twice
+        db.data_collection.fail_after = 4
+        for record in records[:3]:
+            db.write_record(record)
+        with self.assertRaises(mongo_connector.ConnectionFailure):
+            db.write_record(records[3])
+        self.assertEqual(len(db.data_collection.docs), 4)
+        db.flush()
+        self.assertEqual(len(db.source_collection.docs), 4)
+        self.assertEqual(len(db.data_collection.docs), 8)
+        self.assertEqual(db.unwritten, {})
+
+        # A value the database won't take costs only its own record
+        poison = DASRecord(timestamp=6, fields={'a': 6, 'b': 'poison'})
+        with self.assertLogs(level='ERROR'):
+            for record in [DASRecord(timestamp=5, fields={'a': 5}), poison,
+                           DASRecord(timestamp=7, fields={'a': 7})]:
+                db.write_record(record)
+            db.flush()
+        self.assertEqual(db.batcher.rejected, 1)
+        self.assertEqual(sorted(doc['timestamp'] for doc in db.data_collection.docs.values()),
+                         [1, 1, 2, 2, 3, 3, 4, 4, 5, 6, 7])
+
     ############################
     @unittest.skipUnless(MONGO_ENABLED, 'Mongo not installed; tests of MongoDB '
                          'functionality will not be run.')
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import unittest
+
+sys.path.append('.')
+from database.record_batcher import RecordBatcher, write_or_reject  # noqa: E402
+
+
+class TestRecordBatcher(unittest.TestCase):
+
+    ############################
+    def setUp(self):
+        self.written = []
+        self.fail = False
+
+    ############################
+    def write_records(self, records):
+        if self.fail:
+            raise IOError('Database is down')
+        if 'bad' in records:
+            raise ValueError('Bad record')
+        self.written.append(list(records))
+
+    ############################
+    def test_batch_size(self):
+        batcher = RecordBatcher(self.write_records, batch_size=3)
+        for i in range(7):
+            batcher.add(i)
+        self.assertEqual(self.written, [[0, 1, 2], [3, 4, 5]])
+        batcher.flush()
+        self.assertEqual(self.written, [[0, 1, 2], [3, 4, 5], [6]])
+        batcher.flush()
+        self.assertEqual(len(self.written), 3)
+
+    ############################
+    def test_batch_interval(self):
+        # A partial batch gets written even if nothing else arrives
+        batcher = RecordBatcher(self.write_records, batch_size=100, batch_interval=0.05)
+        batcher.add(1)
+        batcher.add(2)
+        self.assertEqual(self.written, [])
+        for i in range(50):
+            if self.written:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.written, [[1, 2]])
+        self.assertIsNone(batcher.timer)
+
+    ############################
+    def test_failure(self):
+        batcher = RecordBatcher(self.write_records, batch_size=2, errors=(IOError,))
+        self.fail = True
+        batcher.add(1)
+        with self.assertRaises(IOError):
+            batcher.add(2)
+
+        # Failed records are kept for the next try...
+        self.fail = False
+        batcher.add(3)
+        self.assertEqual(self.written, [[1, 2, 3]])
+
+        # ...unless the caller takes them
+        self.fail = True
+        batcher.add(4)
+        with self.assertRaises(IOError):
+            batcher.flush()
+        self.assertEqual(batcher.take_pending(), [4])
+        batcher.flush()
+        self.assertEqual(self.written, [[1, 2, 3]])
+
+    ############################
+    def test_timed_failure(self):
+        batcher = RecordBatcher(self.write_records, batch_size=100, batch_interval=0.02,
+                                errors=(IOError,))
+        self.fail = True
+        with self.assertLogs(level='ERROR'):
+            batcher.add(1)
+            time.sleep(0.1)
+        self.fail = False
+        for i in range(50):
+            if self.written:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.written, [[1]])
+
+    ############################
+    def test_bad_records(self):
+        # Only the bad records are dropped...
+        with self.assertLogs(level='ERROR'):
+            rejected = write_or_reject(self.write_records, [1, 'bad', 2, 3, 'bad', 4],
+                                       retryable=(IOError,))
+        self.assertEqual(rejected, ['bad', 'bad'])
+        self.assertEqual(sum(self.written, []), [1, 2, 3, 4])
+
+        # ...but retryable errors are raised
+        self.fail = True
+        with self.assertRaises(IOError):
+            write_or_reject(self.write_records, [5, 'bad'], retryable=(IOError,))
+
+        # A bad record doesn't hold up the batch it's in
+        self.fail = False
+        self.written = []
+        batcher = RecordBatcher(self.write_records, batch_size=3,
+                                errors=(IOError, ValueError), retryable=(IOError,))
+        with self.assertLogs(level='ERROR'):
+            for record in [1, 'bad', 2, 3]:
+                batcher.add(record)
+        batcher.flush()
+        self.assertEqual(sum(self.written, []), [1, 2, 3])
+        self.assertEqual(batcher.rejected, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
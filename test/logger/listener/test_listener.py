@@ -12,6 +12,7 @@ from logger.readers.text_file_reader import TextFileReader  # noqa: E402
 from logger.transforms.prefix_transform import PrefixTransform  # noqa: E402
 from logger.transforms.count_transform import CountTransform  # noqa: E402
 from logger.writers.text_file_writer import TextFileWriter  # noqa: E402
+from logger.writers.writer import Writer  # noqa: E402
 from logger.listener.listener import Listener  # noqa: E402
 
 SAMPLE_DATA = {
@@ -38,6 +39,19 @@ def create_file(filename, lines, interval=0, pre_sleep_interval=0):
             f.flush()
 
 
+class BatchWriter(Writer):
+    """Keep track of the batches we're handed."""
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def write(self, record):
+        self.batches.append([record])
+
+    def write_batch(self, records):
+        self.batches.append(records)
+
+
 ################################################################################
 class TestListener(unittest.TestCase):
     ############################
@@ -120,6 +134,40 @@ class TestListener(unittest.TestCase):
                     self.assertEqual(SAMPLE_DATA['f1'][line_num], line.rstrip())
                     line_num += 1
 
+    ############################
+    def test_batch(self):
+        readers = [TextFileReader(tmpfilename) for tmpfilename in self.tmpfilenames]
+        outfilename = self.tmpdirname + '/f_out'
+        batch_writer = BatchWriter()
+        listener = Listener(readers=readers,
+                            transforms=[PrefixTransform('p')],
+                            writers=[TextFileWriter(outfilename), batch_writer],
+                            max_batch=4, max_latency=0.2)
+        listener.run()
+
+        source_lines = []
+        for f in SAMPLE_DATA:
+            source_lines.extend(['p ' + line for line in SAMPLE_DATA[f]])
+
+        with open(outfilename, 'r') as f:
+            out_lines = f.read().splitlines()
+        self.assertEqual(sorted(out_lines), sorted(source_lines))
+
+        # All records should have arrived in batches of no more than 4
+        self.assertEqual(sorted(sum(batch_writer.batches, [])), sorted(source_lines))
+        self.assertLessEqual(max([len(b) for b in batch_writer.batches]), 4)
+
+    ############################
+    def test_batch_latency(self):
+        # Records trickling in slowly should be passed along within
+        # max_latency rather than waiting for a batch to fill.
+        reader = TextFileReader(self.tmpfilenames[0], interval=0.3)
+        batch_writer = BatchWriter()
+        listener = Listener(readers=reader, writers=batch_writer,
+                            max_batch=100, max_latency=0.1)
+        listener.run()
+        self.assertEqual(batch_writer.batches, [[line] for line in SAMPLE_DATA['f1']])
+
 
 ################################################################################
 if __name__ == '__main__':
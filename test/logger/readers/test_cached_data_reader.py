@@ -10,7 +10,10 @@ import warnings
 sys.path.append('.')
 from server.cached_data_server import CachedDataServer  # noqa: E402
 from logger.readers.cached_data_reader import CachedDataReader  # noqa: E402
+from logger.writers.cached_data_writer import CachedDataWriter  # noqa: E402
+from logger.utils.wire_format import MSGPACK_ENABLED  # noqa: E402
 WEBSOCKET_PORT = 8769
+MSGPACK_WEBSOCKET_PORT = 8773
 
 
 class TestCachedDataReader(unittest.TestCase):
@@ -73,6 +76,31 @@ class TestCachedDataReader(unittest.TestCase):
         # we get 'quit'
         response = cdr.read()
 
+    ############################
+    @unittest.skipUnless(MSGPACK_ENABLED, 'msgpack not installed; skipping test')
+    def test_msgpack(self):
+        cds = CachedDataServer(port=MSGPACK_WEBSOCKET_PORT, interval=0.1)
+        cds.cache_record({'timestamp': 1, 'fields': {'mp_field_1': 1.5}})
+
+        data_server = 'localhost:%d' % MSGPACK_WEBSOCKET_PORT
+        subscription = {'fields': {'mp_field_1': {'seconds': -1},
+                                   'mp_field_2': {'seconds': 0}}}
+        cdr = CachedDataReader(subscription=subscription, data_server=data_server,
+                               encoding='msgpack')
+        time.sleep(0.05)
+        self.assertEqual(cdr.read(), {'timestamp': 1.0, 'fields': {'mp_field_1': 1.5}})
+
+        # Publish in msgpack, too; later messages reuse the field ids
+        writer = CachedDataWriter(data_server=data_server, encoding='msgpack')
+        for i in range(2, 5):
+            writer.write({'timestamp': i, 'fields': {'mp_field_1': i, 'mp_field_2': 'x'}})
+            self.assertEqual(cdr.read(), {'timestamp': float(i),
+                                          'fields': {'mp_field_1': i, 'mp_field_2': 'x'}})
+        cdr.quit()
+
+        with self.assertRaises(ValueError):
+            CachedDataReader(subscription=subscription, encoding='xml')
+
 
 ############################
 if __name__ == '__main__':
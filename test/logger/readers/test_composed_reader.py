@@ -102,6 +102,37 @@ class TestComposedReader(unittest.TestCase):
                     next_lines.remove(record)
         self.assertEqual(None, reader.read())
 
+    ############################
+    def test_continuous(self):
+        readers = [TextFileReader(tmpfilename) for tmpfilename in self.tmpfilenames]
+        reader = ComposedReader(readers, [PrefixTransform('p')], queue_size=2)
+
+        records = []
+        while True:
+            record = reader.read()
+            if record is None:
+                break
+            records.append(record)
+
+        # Records from different files may interleave arbitrarily, but
+        # those from any one file should arrive in order.
+        for f in sorted(SAMPLE_DATA):
+            from_f = [r for r in records if r.startswith('p ' + f)]
+            self.assertEqual(from_f, ['p ' + line for line in SAMPLE_DATA[f]])
+        self.assertEqual(len(records), 9)
+
+    ############################
+    def test_continuous_backpressure(self):
+        readers = [TextFileReader(tmpfilename) for tmpfilename in self.tmpfilenames]
+        reader = ComposedReader(readers, queue_size=2)
+
+        # First read starts the threads; give them time to fill the queue,
+        # then make sure none of them has read more than it's allowed.
+        self.assertIsNotNone(reader.read())
+        time.sleep(0.2)
+        self.assertEqual(reader.high_water, [2, 2, 2])
+        self.assertLessEqual(max(reader.queued), 2)
+
 
 if __name__ == '__main__':
     import argparse
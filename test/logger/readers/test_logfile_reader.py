@@ -12,6 +12,7 @@ sys.path.append('.')
 from logger.utils import timestamp  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.readers.logfile_reader import LogfileReader  # noqa: E402
+from logger.writers.logfile_writer import LogfileWriter  # noqa: E402
 
 SAMPLE_DATA = """\
 2017-11-04T05:12:19.441672Z 3.5kHz,5360.54,1,,,,1500,-39.580717,-37.461886
@@ -60,6 +61,18 @@ def get_msec_timestamp(record):
     return timestamp.timestamp(time_str, time_format=timestamp.TIME_FORMAT) * 1000
 
 
+def create_long_files(filebase, index_interval=0):
+    """Write a couple of days of records, a second apart, using a
+    LogfileWriter, and return the list of lines written."""
+    writer = LogfileWriter(filebase, index_interval=index_interval)
+    start = timestamp.timestamp('2017-11-04T12:00:00.000000Z')
+    lines = []
+    for i in range(0, 2 * 86400, 17):
+        lines.append(timestamp.time_str(start + i + 0.25) + ' record %d' % i)
+        writer.write(lines[-1])
+    return lines
+
+
 def create_file(filename, lines, interval=0, pre_sleep_interval=0):
     time.sleep(pre_sleep_interval)
     logging.info('creating file "%s"', filename)
@@ -358,6 +371,43 @@ class TestLogfileReader(unittest.TestCase):
             self.assertEqual(END_TIMESTAMP - 1000, reader.seek_time(-1000, 'end'))
             self.assertEqual(sample_lines[9], reader.read())
 
+    ############################
+    def test_seek_long_files(self):
+        # Exercise bisection within and across files, with and without
+        # a sidecar index from LogfileWriter.
+        for index_interval in [0, 100]:
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                filebase = tmpdirname + '/mylog'
+                sample_lines = create_long_files(filebase, index_interval)
+                times = [get_msec_timestamp(line) for line in sample_lines]
+                START_TIMESTAMP = times[0]
+                END_TIMESTAMP = times[-1]
+
+                reader = LogfileReader(filebase)
+                for i in [0, 1, 1000, 2199, 2200, 2201, 5000, len(times) - 1]:
+                    for delta in [-1, 0, 1]:
+                        desired = max(START_TIMESTAMP, times[i] + delta)
+                        expected = next((j for j, t in enumerate(times) if t >= desired), None)
+                        self.assertEqual(desired, reader.seek_time(desired - START_TIMESTAMP,
+                                                                   'start'))
+                        record = reader.read()
+                        if expected is None:
+                            self.assertEqual(None, record)
+                        else:
+                            self.assertEqual(sample_lines[expected], record)
+                            following = (sample_lines + [None, None])[expected + 1:expected + 3]
+                            self.assertEqual(following, [reader.read(), reader.read()])
+
+                self.assertEqual(END_TIMESTAMP, reader.seek_time(0, 'end'))
+                self.assertEqual(None, reader.read())
+                self.assertEqual(END_TIMESTAMP - 17000, reader.seek_time(-17000, 'end'))
+                self.assertEqual(sample_lines[-2], reader.read())
+                self.assertEqual(times[-1] - 20000, reader.seek_time(-20000, 'current'))
+                self.assertEqual(sample_lines[-2], reader.read())
+
+                records = reader.read_time_range(times[3000], times[3010])
+                self.assertEqual(records, sample_lines[3000:3010])
+
     ############################
     def test_read_time_range(self):
         with tempfile.TemporaryDirectory() as tmpdirname:
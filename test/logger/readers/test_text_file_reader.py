@@ -9,7 +9,7 @@ import unittest
 import warnings
 
 sys.path.append('.')
-from logger.readers.text_file_reader import TextFileReader  # noqa: E402
+from logger.readers.text_file_reader import TextFileReader, BufferedRecordFile  # noqa: E402
 
 SAMPLE_DATA = {
     'f1': ['f1 line 1',
@@ -210,6 +210,35 @@ class TestTextFileReader(unittest.TestCase):
             self.assertEqual(2, reader.seek(-7, 'end'))
             self.assertEqual(expected_lines[2], reader.read())
 
+    ############################
+    def test_seek_offset(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            expected_lines = []
+            for f in sorted(SAMPLE_DATA):
+                create_file(tmpdirname + '/' + f, SAMPLE_DATA[f])
+                expected_lines.extend(SAMPLE_DATA[f])
+
+            reader = TextFileReader(tmpdirname + '/f*')
+            offset = len(SAMPLE_DATA['f2'][0]) + 1
+            reader.seek_offset(tmpdirname + '/f2', offset)
+            self.assertEqual(expected_lines[4], reader.read())
+            self.assertEqual(expected_lines[5], reader.read())
+            self.assertEqual(expected_lines[6], reader.read())
+
+            # We don't know our record number, so can't seek back from here
+            with self.assertRaises(ValueError):
+                reader.seek(-1, 'current')
+            self.assertEqual(expected_lines[7], reader.read())
+
+            # But seeking from start or end works
+            self.assertEqual(7, reader.seek(-2, 'end'))
+            self.assertEqual(expected_lines[7], reader.read())
+            self.assertEqual(2, reader.seek(2, 'start'))
+            self.assertEqual(expected_lines[2], reader.read())
+
+            with self.assertRaises(ValueError):
+                reader.seek_offset(tmpdirname + '/g1', 0)
+
     ############################
     # Check that seek with negative offset larger than current position
     # results in a ValueError.
@@ -365,6 +394,62 @@ class TestTextFileReader(unittest.TestCase):
                     line = reader.read()
                     self.assertEqual(line, expect[i])
 
+    ############################
+    def test_crlf(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            tmpfilename = tmpdirname + '/f1'
+            with open(tmpfilename, 'wb') as f:
+                f.write(b'line 1\r\nline 2\r\n\r\nline 4')
+            reader = TextFileReader(tmpfilename)
+            self.assertEqual(['line 1', 'line 2', '', 'line 4', None],
+                             [reader.read() for i in range(5)])
+
+            reader = TextFileReader(tmpfilename, eol='\r\n')
+            self.assertEqual(['line 1', 'line 2', '', 'line 4', None],
+                             [reader.read() for i in range(5)])
+
+    ############################
+    def test_buffered_record_file(self):
+        # Records and multi-byte eols split across chunk boundaries
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            tmpfilename = tmpdirname + '/f1'
+            records = [('récord %d ' % i) * (i % 7) for i in range(50)] + ['end']
+            with open(tmpfilename, 'w') as f:
+                f.write('<EOL>'.join(records))
+
+            for chunk_size in [1, 3, 16, 4096]:
+                record_file = BufferedRecordFile(tmpfilename, eol='<EOL>',
+                                                 chunk_size=chunk_size)
+                offsets = []
+                for record in records:
+                    offsets.append(record_file.tell())
+                    self.assertEqual(record, record_file.read_record())
+                self.assertEqual(None, record_file.read_record())
+
+                record_file.seek(offsets[20])
+                self.assertEqual(records[20], record_file.read_record())
+                record_file.close()
+
+    ############################
+    def test_seek_back_long_file(self):
+        # Seeking back should land on the right record whether or not
+        # it's one whose offset we've noted.
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            lines = ['line %d' % i for i in range(1000)]
+            create_file(tmpdirname + '/f1', lines[:600])
+            create_file(tmpdirname + '/f2', lines[600:])
+
+            reader = TextFileReader(tmpdirname + '/f*')
+            for i in range(900):
+                reader.read()
+            for target in [850, 700, 599, 450, 201, 200, 0]:
+                self.assertEqual(target, reader.seek(target - reader.pos, 'current'))
+                self.assertEqual(lines[target], reader.read())
+                self.assertEqual(lines[target + 1], reader.read())
+
+            self.assertEqual(995, reader.seek(-5, 'end'))
+            self.assertEqual(lines[995:], reader.read_range(995, 1000))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -276,6 +276,79 @@ class TestUDPReader(unittest.TestCase):
         # Silence the alarm
         signal.alarm(0)
 
+    ############################
+    # High-rate mode, reading lists of whatever records are waiting
+    def test_max_batch(self):
+        port = 8006
+        dest = 'localhost'
+
+        w_thread = threading.Thread(target=self.write_udp, name='write_thread',
+                                    args=(dest, port, BIG_DATA),
+                                    kwargs={'delay': 0.2})
+
+        # Set timeout we can catch if things are taking too long
+        signal.signal(signal.SIGALRM, self._handler)
+        signal.alarm(1)
+
+        reader = UDPReader(interface=dest, port=port, max_batch=3, rcvbuf=1024 * 1024,
+                           this_is_a_test=True)
+        w_thread.start()
+        results = []
+        try:
+            while len(results) < len(BIG_DATA):
+                records = reader.read()
+                self.assertIsInstance(records, list)
+                self.assertLessEqual(len(records), 3)
+                results.extend(records)
+        except ReaderTimeout:
+            self.assertTrue(False, 'UDPReader timed out in test - is port '
+                            '%s:%s open?' % (dest, port))
+        self.assertEqual(results, BIG_DATA)
+        self.assertEqual(reader.dropped, 0)
+
+        # Make sure everyone has terminated
+        w_thread.join()
+
+        # Silence the alarm
+        signal.alarm(0)
+
+    ############################
+    # Datagrams split by eol shouldn't take a batch past max_batch
+    def test_max_batch_eol(self):
+        port = 8007
+        dest = 'localhost'
+        data = ['a1\na2\na3\n', 'b1\nb2\n', 'c1']
+
+        w_thread = threading.Thread(target=self.write_udp, name='write_thread',
+                                    args=(dest, port, data),
+                                    kwargs={'delay': 0.2})
+
+        # Set timeout we can catch if things are taking too long
+        signal.signal(signal.SIGALRM, self._handler)
+        signal.alarm(1)
+
+        reader = UDPReader(interface=dest, port=port, eol='\n', max_batch=2,
+                           this_is_a_test=True)
+        w_thread.start()
+        results = []
+        try:
+            while len(results) < 6:
+                records = reader.read()
+                self.assertIsInstance(records, list)
+                self.assertLessEqual(len(records), 2)
+                results.extend(records)
+        except ReaderTimeout:
+            self.assertTrue(False, 'UDPReader timed out in test - is port '
+                            '%s:%s open?' % (dest, port))
+        self.assertEqual(results, ['a1', 'a2', 'a3', 'b1', 'b2', 'c1'])
+        self.assertEqual(reader.overflow, [])
+
+        # Make sure everyone has terminated
+        w_thread.join()
+
+        # Silence the alarm
+        signal.alarm(0)
+
 
 ################################################################################
 if __name__ == '__main__':
@@ -4,6 +4,7 @@
 
 import logging
 import os
+import random
 import sys
 import tempfile
 import time
@@ -254,6 +255,48 @@ class TestGeofenceTransform(unittest.TestCase):
             self.assertEqual(mesg, SECONDS_RESULT[i],
                              msg=f'transform()[{i}] should be {SECONDS_RESULT[i]}, is {mesg}')
 
+    ############################
+    # Checking a batch of positions should agree with checking each one,
+    # including when skipping checks near an earlier position.
+    def test_batch(self):
+        random.seed(1)
+        lat, lon, track = -0.07, -0.07, []
+        for i in range(2000):
+            lat = min(max(lat + random.uniform(-0.005, 0.005), -0.1), 0.1)
+            lon = min(max(lon + random.uniform(-0.005, 0.005), -0.1), 0.1)
+            track.append((lat, lon))
+        lats, lons = zip(*track)
+
+        single = GeofenceTransform(latitude_field_name='lat', longitude_field_name='lon',
+                                   boundary_file_name=self.boundary_file.name)
+        batch = GeofenceTransform(latitude_field_name='lat', longitude_field_name='lon',
+                                  boundary_file_name=self.boundary_file.name)
+        expected = [single._is_inside_boundary(lat, lon) for lat, lon in track]
+
+        # Compare with checking every position the hard way
+        from shapely.geometry import Point
+        self.assertEqual(expected, [bool(single.buffered_eez.contains(Point(lon, lat)).any())
+                                    for lat, lon in track])
+        self.assertIn(True, expected)
+        self.assertIn(False, expected)
+        result = []
+        for i in range(0, len(track), 7):
+            result.extend(batch.is_inside_boundary(lats[i:i + 7], lons[i:i + 7]))
+        self.assertEqual(result, expected)
+
+    ############################
+    def test_transform_list(self):
+        transform = GeofenceTransform(latitude_field_name='lat',
+                                      longitude_field_name='lon',
+                                      boundary_file_name=self.boundary_file.name,
+                                      leaving_boundary_message='leaving',
+                                      entering_boundary_message='entering')
+        records = LAT_RECORDS[:5] + [DASRecord(fields=r) for r in LAT_RECORDS[5:]]
+        self.assertEqual(transform.transform(records),
+                         [mesg for mesg in IN_RESULT if mesg])
+        self.assertEqual(transform.transform([{'lat': 0, 'lon': 0}, {'no': 'position'}]),
+                         ['entering'])
+
 ################################################################################
 if __name__ == '__main__':
     import argparse
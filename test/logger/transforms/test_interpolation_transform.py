@@ -2,12 +2,16 @@
 """Test the InterpolationTransform class.
 """
 import logging
+import random
 import sys
 import unittest
 from os.path import dirname, realpath
+from unittest import mock
 
 sys.path.append(dirname(dirname(dirname(dirname(realpath(__file__))))))
+from logger.transforms import interpolation_transform  # noqa: E402
 from logger.transforms.interpolation_transform import InterpolationTransform  # noqa: E402
+from logger.transforms.interpolation_transform import TimeSeries, interpolate_series  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 
 
@@ -420,5 +424,63 @@ class TestInterpolationTransform(unittest.TestCase):
         self.assertEqual(field_metadata['device_type_field'], 'AvgTemperature')
 
 
+class TestTimeSeries(unittest.TestCase):
+    """Test cases for TimeSeries and interpolate_series()."""
+
+    ############################
+    def test_insert(self):
+        series = TimeSeries([(1, 'a'), (3, 'c'), (2, 'b'), (0, 'z'), (3, 'd')])
+        self.assertEqual(list(series.timestamps), [0, 1, 2, 3, 3])
+        self.assertEqual(series.values, ['z', 'a', 'b', 'c', 'd'])
+        series.discard_before(2)
+        self.assertEqual(list(series.timestamps), [2, 3, 3])
+        self.assertEqual(series.values, ['b', 'c', 'd'])
+        self.assertEqual(len(series), 3)
+
+    ############################
+    def test_algorithms(self):
+        series = TimeSeries([(0, 350), (1, 10), (2, 30), (4, 'bad'), (6, 90), (7, 90)])
+        timestamps = [1, 2.5, 5, 6.5]
+
+        # Compute with and without NumPy, which should agree
+        for numpy_enabled in {False, interpolation_transform.NUMPY_ENABLED}:
+            with mock.patch.object(interpolation_transform, 'NUMPY_ENABLED', numpy_enabled):
+                boxcar = interpolate_series({'type': 'boxcar_average', 'window': 2},
+                                            series, timestamps)
+                self.assertAlmostEqual(boxcar[0], 130)
+                self.assertEqual(boxcar[1], 30)
+                self.assertIsNone(boxcar[2])   # only value is 'bad'
+                self.assertEqual(boxcar[3], 90)
+
+                polar = interpolate_series({'type': 'polar_average', 'window': 2},
+                                           series, timestamps)
+                self.assertAlmostEqual(polar[0], 10)
+                self.assertAlmostEqual(polar[1], 30)
+
+                # Values may be no more than max_window/2 before the timestamp
+                limited = interpolate_series({'type': 'boxcar_average', 'window': 2},
+                                             series, timestamps, max_window=0)
+                self.assertEqual(limited, [20, None, 90, 90])
+
+        nearest = interpolate_series({'type': 'nearest'}, series, [-1, 0.5, 2.9, 5, 8])
+        self.assertEqual(nearest, [350, 10, 30, 90, 90])
+
+    ############################
+    def test_numpy_agrees(self):
+        if not interpolation_transform.NUMPY_ENABLED:
+            self.skipTest('NumPy not installed')
+        random.seed(1)
+        series = TimeSeries((random.uniform(0, 100), random.uniform(0, 360))
+                            for i in range(1000))
+        timestamps = [i / 2 for i in range(200)]
+        for alg_type in ['boxcar_average', 'polar_average']:
+            algorithm = {'type': alg_type, 'window': 5}
+            fast = interpolate_series(algorithm, series, timestamps)
+            with mock.patch.object(interpolation_transform, 'NUMPY_ENABLED', False):
+                slow = interpolate_series(algorithm, series, timestamps)
+            for fast_value, slow_value in zip(fast, slow):
+                self.assertAlmostEqual(fast_value, slow_value)
+
+
 if __name__ == '__main__':
     unittest.main()
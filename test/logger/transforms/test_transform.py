@@ -46,6 +46,13 @@ class TestTransform(unittest.TestCase):
         
         self.assertEqual(writer.records, ['prefix: start', 'prefix: end'])
 
+    def test_transform_batch(self):
+        class DropOddTransform(Transform):
+            def transform(self, record):
+                return None if record % 2 else record * 10
+
+        self.assertEqual(DropOddTransform().transform_batch([1, 2, 3, 4]), [20, 40])
+
     def test_transform_mirror_invalid_type(self):
         with self.assertRaisesRegex(TypeError, "mirror_to must be a Writer"):
             PrefixTransform(prefix='p', mirror_to="not a writer")
@@ -6,6 +6,7 @@ import sys
 import unittest
 
 sys.path.append('.')
+from logger.utils import das_record  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.utils import timestamp  # noqa: E402
 
@@ -47,6 +48,56 @@ class TestDASRecord(unittest.TestCase):
 
         self.assertDictEqual(json.loads(dr.as_json()), json.loads(JSON_IN))
 
+    def test_json_cache(self):
+        dr = DASRecord(json_str=JSON_IN)
+        self.assertFalse(hasattr(dr, '__dict__'))
+
+        first = dr.as_json()
+        self.assertIs(dr.as_json(), first)
+
+        # Changes, whether through the record or in place, are noticed
+        dr['GYR_Acc'] = 0.12
+        self.assertEqual(json.loads(dr.as_json())['fields']['GYR_Acc'], 0.12)
+        dr.fields['GYR_Acc'] = 0.13
+        self.assertEqual(json.loads(dr.as_json())['fields']['GYR_Acc'], 0.13)
+        dr.metadata['status'] = 'bad'
+        self.assertEqual(json.loads(dr.as_json())['metadata']['status'], 'bad')
+        dr.timestamp = 1510265336
+        self.assertEqual(json.loads(dr.as_json())['timestamp'], 1510265336)
+        dr.fields = {'GYR_Heading': 1.0}
+        self.assertEqual(json.loads(dr.as_json())['fields'], {'GYR_Heading': 1.0})
+
+        # Values that are == but encode differently
+        dr.fields['x'] = 1
+        self.assertEqual(json.loads(dr.as_json())['fields']['x'], 1)
+        dr.fields['x'] = True
+        self.assertIs(json.loads(dr.as_json())['fields']['x'], True)
+        dr.fields['x'] = 1.0
+        self.assertIn('"x": 1.0', dr.as_json())
+
+        # Containers may be changed in place
+        dr.fields['x'] = [1, 2]
+        self.assertEqual(json.loads(dr.as_json())['fields']['x'], [1, 2])
+        dr.fields['x'].append(3)
+        self.assertEqual(json.loads(dr.as_json())['fields']['x'], [1, 2, 3])
+        dr.metadata['nested'] = {'a': 1}
+        self.assertEqual(json.loads(dr.as_json())['metadata']['nested'], {'a': 1})
+        dr.metadata['nested']['a'] = 2
+        self.assertEqual(json.loads(dr.as_json())['metadata']['nested'], {'a': 2})
+
+    def test_json_backend(self):
+        dr = DASRecord(json_str=JSON_IN)
+        stdlib_json = dr.as_json()
+        try:
+            backend = das_record.set_json_backend('auto')
+            self.assertIn(backend, ['orjson', 'ujson', 'json'])
+            self.assertDictEqual(json.loads(dr.as_json()), json.loads(stdlib_json))
+            with self.assertRaises(ValueError):
+                das_record.set_json_backend('yaml')
+        finally:
+            das_record.set_json_backend('json')
+        self.assertEqual(dr.as_json(), stdlib_json)
+
 
 ################################################################################
 if __name__ == '__main__':
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+import unittest
+
+sys.path.append('.')
+from logger.utils.lazy_logging import LazyFormat, lazy_pformat, debug_enabled  # noqa: E402
+
+
+class TestLazyLogging(unittest.TestCase):
+
+    ############################
+    def test_lazy_format(self):
+        calls = []
+
+        def expensive(value):
+            calls.append(value)
+            return value * 2
+
+        logger = logging.getLogger('test_lazy_logging')
+        logger.setLevel(logging.INFO)
+        logger.debug('Value: %s', LazyFormat(expensive, 2))
+        self.assertEqual(calls, [])
+        self.assertFalse(debug_enabled(logger))
+
+        logger.setLevel(logging.DEBUG)
+        self.assertTrue(debug_enabled(logger))
+        with self.assertLogs(logger, level=logging.DEBUG) as cm:
+            logger.debug('Value: %s', LazyFormat(expensive, 2))
+        self.assertEqual(calls, [2])
+        self.assertEqual(cm.records[0].getMessage(), 'Value: 4')
+
+    ############################
+    def test_lazy_pformat(self):
+        self.assertEqual(str(lazy_pformat({'b': 1, 'a': 2})), "{'a': 2, 'b': 1}")
+        self.assertEqual(repr(lazy_pformat([1, 2])), '[1, 2]')
+
+
+if __name__ == '__main__':
+    unittest.main()
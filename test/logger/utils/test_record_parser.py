@@ -569,6 +569,13 @@ class TestRecordParser(unittest.TestCase):
                                             'Seap200HeadingTrue': 235.77,
                                             'Seap200Pitch': 0.01}})
 
+    ############################
+    def test_parse_records_compile_regex(self):
+        p = RecordParser(definition_path=self.device_filename)
+        fast_p = RecordParser(definition_path=self.device_filename, compile_regex=True)
+        for record in GRV1_RECORDS + SEAP_RECORDS:
+            self.assertEqual(fast_p.parse_record(record), p.parse_record(record))
+
     ############################
     def test_inline_definitions(self):
         p = RecordParser(record_format='{timestamp:ti} {field_string}',
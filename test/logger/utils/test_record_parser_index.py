@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+import parse
+
+sys.path.append('.')
+from logger.utils.record_parser_formats import extra_format_types  # noqa: E402
+from logger.utils.record_parser_index import PatternIndex, leading_token_format  # noqa: E402
+
+PATTERNS = {
+    'GGA': '${:2l}GGA,{GPSTime:f},{Latitude:nlat},{NorS:w}',
+    'HDT': '${:2l}HDT,{HeadingTrue:f},T',
+    'PSXN20': '$PSXN,20,{HorizQual:d},{HeightQual:d}',
+    'PSXN22': '$PSXN,22,{GyroCal:f},{GyroOffset:f}',
+    'Raw': '{RawValue:f}',
+}
+
+
+def compile_patterns(patterns):
+    return {message_type: [parse.compile(pattern, extra_types=extra_format_types)]
+            for message_type, pattern in patterns.items()}
+
+
+class TestPatternIndex(unittest.TestCase):
+
+    ############################
+    def test_leading_token_format(self):
+        self.assertEqual(leading_token_format('$PSXN,20,{a:d}'), '$PSXN')
+        self.assertEqual(leading_token_format('${:2l}GGA,{a:f}'), '${:2l}GGA')
+        self.assertEqual(leading_token_format('{a:f},{b:f}'), '{a:f}')
+        self.assertEqual(leading_token_format('{a:f}'), None)
+
+    ############################
+    def test_candidates(self):
+        index = PatternIndex(compile_patterns(PATTERNS))
+        message_types = [message_type for message_type, parser, parse_fields
+                         in index.candidates('$GPGGA,002705.69,2200.000,N')]
+        self.assertEqual(message_types, ['GGA', 'Raw'])
+        message_types = [message_type for message_type, parser, parse_fields
+                         in index.candidates('$PSXN,22,0.44,0.74')]
+        self.assertEqual(message_types, ['PSXN20', 'PSXN22', 'Raw'])
+        message_types = [message_type for message_type, parser, parse_fields
+                         in index.candidates('12.5')]
+        self.assertEqual(message_types, ['Raw'])
+
+    ############################
+    def test_parse(self):
+        for compile_regex in [False, True]:
+            index = PatternIndex(compile_patterns(PATTERNS), compile_regex=compile_regex)
+            fields, message_type = index.parse('$GPHDT,235.77,T')
+            self.assertEqual(message_type, 'HDT')
+            self.assertEqual(fields, {'HeadingTrue': 235.77})
+
+            fields, message_type = index.parse('$INGGA,002705.69,2200.000,N')
+            self.assertEqual(message_type, 'GGA')
+            self.assertEqual(fields, {'GPSTime': 2705.69, 'Latitude': 22.0, 'NorS': 'N'})
+
+            # Case-insensitive, like parse
+            fields, message_type = index.parse('$psxn,22,0.44,0.74')
+            self.assertEqual(message_type, 'PSXN22')
+            self.assertEqual(fields, {'GyroCal': 0.44, 'GyroOffset': 0.74})
+
+            self.assertEqual(index.parse('12.5'), ({'RawValue': 12.5}, 'Raw'))
+            self.assertEqual(index.parse('$PSXN,23,1,2'), (None, None))
+
+    ############################
+    def test_same_as_parse(self):
+        # Whatever the fast path returns should match what parse would
+        patterns = ['{a:d},{b:of},{c:og},{d:ow}', '{name[key]:d}', '{a:ti}']
+        records = ['1,,#VALUE!,', '2,3.5,4,x', '{}', '2017-11-04T07:00:17.618Z', 'x']
+        for pattern in patterns:
+            parser = parse.compile(pattern, extra_types=extra_format_types)
+            index = PatternIndex(parser, compile_regex=True)
+            for record in records:
+                result = parser.parse(record)
+                expected = result.named if result else None
+                self.assertEqual(index.parse(record)[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import logging
+import random
+import sys
+import unittest
+
+sys.path.append('.')
+from logger.utils.subsample import Subsampler, subsample  # noqa: E402
+
+
+def brute_force(values, timestamps, window, function):
+    """Recompute each output from scratch, for comparison."""
+    results = []
+    for ts in timestamps:
+        in_window = [value for value_ts, value in values
+                     if ts - window / 2 < value_ts < ts + window / 2]
+        if in_window:
+            results.append((ts, function(in_window)))
+    return results
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+################################################################################
+class TestSubsampler(unittest.TestCase):
+    ############################
+    def setUp(self):
+        random.seed(1)
+        # 10 Hz values with a gap in the middle
+        self.values = [(1000 + i / 10, random.uniform(-10, 10))
+                       for i in range(3000) if not 1000 <= i < 1500]
+
+    ############################
+    def check(self, algorithm, function, emit_every=1):
+        subsampler = Subsampler(algorithm)
+        results = []
+        for i, (timestamp, value) in enumerate(self.values):
+            subsampler.add(timestamp, value)
+            if i % emit_every == 0:
+                results.extend(subsampler.emit(now=timestamp))
+        results.extend(subsampler.emit(now=2000))
+
+        window, interval = algorithm['window'], algorithm['interval']
+        first = self.values[0][0] + window / 2
+        timestamps = [first + i * interval
+                      for i in range(int((2000 - window / 2 - first) / interval) + 1)]
+        expected = brute_force(self.values, timestamps, window, function)
+
+        self.assertEqual(len(results), len(expected))
+        for (ts, value), (expected_ts, expected_value) in zip(results, expected):
+            self.assertAlmostEqual(ts, expected_ts, places=6)
+            self.assertAlmostEqual(value, expected_value, places=6)
+        return results
+
+    ############################
+    def test_boxcar_average(self):
+        self.check({'type': 'boxcar_average', 'window': 60, 'interval': 10}, mean)
+        self.check({'type': 'boxcar_average', 'window': 5, 'interval': 10}, mean,
+                   emit_every=100)
+
+    ############################
+    def test_min_max(self):
+        self.check({'type': 'min', 'window': 30, 'interval': 5}, min)
+        self.check({'type': 'max', 'window': 30, 'interval': 5}, max, emit_every=7)
+
+    ############################
+    def test_polar_average(self):
+        subsampler = Subsampler({'type': 'polar_average', 'window': 4, 'interval': 4})
+        for timestamp, value in [(0, 180), (1, 350), (3, 10), (6, 90)]:
+            subsampler.add(timestamp, value)
+        results = subsampler.emit(now=10)
+        self.assertEqual(len(results), 2)
+        self.assertAlmostEqual(results[0][0], 2)
+        self.assertAlmostEqual(results[0][1] % 360, 0, delta=1e-6)  # 350, 10
+        self.assertAlmostEqual(results[1][0], 6)
+        self.assertAlmostEqual(results[1][1], 90)
+
+    ############################
+    def test_out_of_order(self):
+        subsampler = Subsampler({'type': 'boxcar_average', 'window': 10, 'interval': 10})
+        for timestamp, value in [(0, 99), (3, 3), (2, 2), (1, 7)]:
+            subsampler.add(timestamp, value)
+        # Windows exclude values at their edges, so the first is left out
+        self.assertEqual(subsampler.emit(now=10), [(5, 4)])
+
+        # Too late for the window we've already emitted, and too early
+        # for the next one
+        subsampler.add(4, 100)
+        subsampler.add(12, 4)
+        self.assertEqual(subsampler.emit(now=20), [(15, 4)])
+
+    ############################
+    def test_bad_input(self):
+        with self.assertRaises(ValueError):
+            Subsampler({'type': 'median'})
+        with self.assertLogs(level='WARNING'):
+            Subsampler({'type': 'max'}).add(1, 'not a number')
+
+    ############################
+    def test_subsample(self):
+        values = [(i, i) for i in range(100)]
+        self.assertEqual(subsample({'type': 'boxcar_average', 'window': 10, 'interval': 20},
+                                   values, 0, 60),
+                         [(20, 20), (40, 40)])
+        # Picks up at the interval after the last one output
+        self.assertEqual(subsample({'type': 'boxcar_average', 'window': 10, 'interval': 20},
+                                   values, 40, 100),
+                         [(60, 60), (80, 80)])
+        self.assertIsNone(subsample({'type': 'boxcar_average'}, [], 0, 60))
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(subsample({'type': 'median'}, values, 0, 60))
+
+
+################################################################################
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--verbosity', dest='verbosity',
+                        default=0, action='count',
+                        help='Increase output verbosity')
+    args = parser.parse_args()
+
+    LOGGING_FORMAT = '%(asctime)-15s %(filename)s:%(lineno)d %(message)s'
+    logging.basicConfig(format=LOGGING_FORMAT)
+
+    LOG_LEVELS = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG}
+    args.verbosity = min(args.verbosity, max(LOG_LEVELS))
+    logging.getLogger().setLevel(LOG_LEVELS[args.verbosity])
+
+    unittest.main(warnings='ignore')
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+sys.path.append('.')
+from logger.utils import wire_format  # noqa: E402
+
+try:
+    import msgpack
+except ImportError:
+    pass
+
+
+class TestWireFormat(unittest.TestCase):
+
+    ############################
+    def test_json(self):
+        message = {'type': 'data', 'data': {'f1': [[1.5, 'a']]}}
+        encoded = wire_format.encode(message)
+        self.assertIsInstance(encoded, str)
+        self.assertEqual(wire_format.decode(encoded), message)
+
+        with self.assertRaises(wire_format.DecodeError):
+            wire_format.decode('{"type": ')
+        with self.assertRaises(ValueError):
+            wire_format.check_encoding('xml')
+
+    ############################
+    @unittest.skipUnless(wire_format.MSGPACK_ENABLED, 'msgpack not installed; skipping test')
+    def test_msgpack(self):
+        message = {'type': 'publish', 'data': [{'timestamp': 1.5, 'fields': {'f1': 2}}]}
+        encoded = wire_format.encode(message, wire_format.MSGPACK)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(wire_format.decode(encoded), message)
+        with self.assertRaises(wire_format.DecodeError):
+            wire_format.decode(encoded[:-1])
+
+    ############################
+    @unittest.skipUnless(wire_format.MSGPACK_ENABLED, 'msgpack not installed; skipping test')
+    def test_data_message(self):
+        # Packed lists are stitched together without repacking
+        encoder = wire_format.FieldIdEncoder()
+        values = [[float(i), i] for i in range(20)]
+        results = {encoder.id('f1'): [wire_format.pack_values(values[:3]),
+                                      wire_format.pack_values(values[3:])],
+                   encoder.id('f2'): [wire_format.pack_values([[1.0, 'x']])]}
+        message = wire_format.pack_data_message(results, encoder.take_new_ids())
+        self.assertEqual(msgpack.unpackb(message, strict_map_key=False),
+                         {'type': 'data', 'status': 200,
+                          'field_ids': {'f1': 0, 'f2': 1},
+                          'data': {0: values, 1: [[1.0, 'x']]}})
+
+        # Ids are only announced once; decoder remembers them
+        decoder = wire_format.FieldIdDecoder()
+        decoder.expand(wire_format.decode(message))
+        self.assertEqual(encoder.id('f2'), 1)
+        self.assertEqual(encoder.take_new_ids(), {})
+        message = wire_format.pack_data_message({1: [wire_format.pack_values([[2.0, 'y']])]})
+        self.assertEqual(decoder.expand(wire_format.decode(message))['data'],
+                         {'f2': [[2.0, 'y']]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ import warnings
 
 sys.path.append('.')
 from logger.writers.text_file_writer import TextFileWriter  # noqa: E402
+from logger.writers.writer import Writer  # noqa: E402
 from logger.writers.composed_writer import ComposedWriter  # noqa: E402
 from logger.transforms.prefix_transform import PrefixTransform  # noqa: E402
 
@@ -17,6 +18,29 @@ SAMPLE_DATA = ['f1 line 1',
                'f1 line 3']
 
 
+class SlowWriter(Writer):
+    """Accumulate records in a list, sleeping a little on each write."""
+    def __init__(self, delay=0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.records = []
+
+    def write(self, record):
+        time.sleep(self.delay)
+        self.records.append(record)
+
+
+class BufferingWriter(SlowWriter):
+    """Hold records back until flushed, like a write-behind writer."""
+    def write(self, record):
+        self.buffered = getattr(self, 'buffered', []) + [record]
+
+    def flush(self, timeout=None):
+        self.records += getattr(self, 'buffered', [])
+        self.buffered = []
+        return True
+
+
 class TestComposedWriter(unittest.TestCase):
 
     ############################
@@ -75,6 +99,65 @@ class TestComposedWriter(unittest.TestCase):
             self.assertEqual('p2 p1 ' + line, f1_line)
             self.assertEqual('p2 p1 ' + line, f2_line)
 
+    ############################
+    def test_queued(self):
+        f1_name = self.tmpdirname + '/f1'
+        f2_name = self.tmpdirname + '/f2'
+        writer = ComposedWriter(writers=[TextFileWriter(f1_name),
+                                         TextFileWriter(f2_name)],
+                                queue_size=10)
+        for line in SAMPLE_DATA:
+            writer.write(line)
+        self.assertTrue(writer.flush(timeout=5))
+
+        with open(f1_name, 'r') as f1, open(f2_name, 'r') as f2:
+            self.assertEqual(SAMPLE_DATA, f1.read().splitlines())
+            self.assertEqual(SAMPLE_DATA, f2.read().splitlines())
+
+    ############################
+    def test_queued_slow_writer(self):
+        # A stalled writer shouldn't hold up the fast one, and should lose
+        # records according to the overflow policy.
+        for policy in ['drop_newest', 'drop_oldest']:
+            fast = SlowWriter()
+            slow = SlowWriter(delay=0.5)
+            writer = ComposedWriter(writers=[fast, slow], queue_size=2,
+                                    overflow_policy=policy)
+            start = time.time()
+            for i in range(10):
+                writer.write(str(i))
+                time.sleep(0.01)
+            self.assertLess(time.time() - start, 0.5)
+            self.assertTrue(writer.flush(timeout=5))
+
+            self.assertEqual(fast.records, [str(i) for i in range(10)])
+            self.assertEqual(writer.dropped[0], 0)
+            self.assertGreater(writer.dropped[1], 0)
+            self.assertEqual(len(slow.records) + writer.dropped[1], 10)
+            if policy == 'drop_newest':
+                self.assertEqual(slow.records[0], '0')
+            else:
+                self.assertEqual(slow.records[-1], '9')
+
+    ############################
+    def test_flush_writers(self):
+        # Writers with flush() methods get flushed; TextFileWriter's 'flush'
+        # is just a flag
+        buffering = BufferingWriter()
+        f1_name = self.tmpdirname + '/f1'
+        for queue_size in [0, 10]:
+            writer = ComposedWriter(writers=[buffering, TextFileWriter(f1_name)],
+                                    queue_size=queue_size)
+            writer.write('a')
+            self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(buffering.records, ['a', 'a'])
+
+    ############################
+    def test_bad_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            ComposedWriter(writers=[SlowWriter()], queue_size=2,
+                           overflow_policy='drop_everything')
+
 
 ################################################################################
 if __name__ == '__main__':
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
 import logging
+import os
 import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
 
 sys.path.append('.')
 from database.settings import DATABASE_ENABLED  # noqa: E402
+from logger.utils.das_record import DASRecord  # noqa: E402
+from logger.writers import database_writer  # noqa: E402
 from logger.writers.database_writer import DatabaseWriter  # noqa: E402
 from logger.utils.record_parser import RecordParser  # noqa: E402
 
@@ -65,8 +71,198 @@ SINGLE_RESULTS = [
 ]
 
 
+class FakeConnector:
+    """Stand-in for a database connector that we can take up and down."""
+    up = True
+    written = []
+    batches = 0
+    kwargs = {}
+
+    def __init__(self, **kwargs):
+        if not FakeConnector.up:
+            raise RuntimeError('Database is down')
+        FakeConnector.kwargs = kwargs
+
+    def write_record(self, record):
+        self.write_records([record])
+
+    def write_records(self, records):
+        if not FakeConnector.up:
+            raise RuntimeError('Database is down')
+        FakeConnector.written.extend(records)
+        FakeConnector.batches += 1
+
+    def close(self):
+        pass
+
+
+class PickyConnector(FakeConnector):
+    """A FakeConnector that won't take records with a 'poison' value, and
+    can tell that apart from the database being down."""
+    RETRYABLE_ERRORS = (RuntimeError,)
+
+    def write_records(self, records):
+        if any(record.fields.get('field') == 'poison' for record in records):
+            raise ValueError('Data too long')
+        super().write_records(records)
+
+
 class TestDatabaseWriter(unittest.TestCase):
 
+    ############################
+    @mock.patch.multiple(database_writer, DATABASE_SETTINGS_FOUND=True,
+                         DATABASE_ENABLED=True, Connector=FakeConnector, create=True)
+    def test_write_behind(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        journal_file = tmpdir.name + '/journal'
+        FakeConnector.up = False
+        FakeConnector.written = []
+        with self.assertLogs(level='WARNING'):
+            writer = DatabaseWriter(queue_size=2, batch_size=10, batch_interval=0.05,
+                                    journal_file=journal_file, retry_interval=0.1)
+
+            # Writes return immediately even though the database is down;
+            # what doesn't fit in the queue goes to the journal.
+            for i in range(5):
+                writer.write(DASRecord(timestamp=i + 1, fields={'field': i}))
+            self.assertTrue(writer.flush(timeout=1))
+            self.assertEqual(FakeConnector.written, [])
+            self.assertTrue(os.path.exists(journal_file))
+
+            # Once it's back, everything journaled gets written
+            FakeConnector.up = True
+            for i in range(50):
+                if len(FakeConnector.written) == 5:
+                    break
+                time.sleep(0.05)
+        self.assertEqual(sorted(r.timestamp for r in FakeConnector.written), [1, 2, 3, 4, 5])
+        self.assertFalse(os.path.exists(journal_file))
+
+    ############################
+    @mock.patch.multiple(database_writer, DATABASE_SETTINGS_FOUND=True,
+                         DATABASE_ENABLED=True, Connector=FakeConnector, create=True)
+    def test_close(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        journal_file = tmpdir.name + '/journal'
+
+        # Queued records get written when we close...
+        FakeConnector.up = True
+        FakeConnector.written = []
+        writer = DatabaseWriter(queue_size=100, batch_size=2, batch_interval=10,
+                                journal_file=journal_file)
+        for i in range(5):
+            writer.write(DASRecord(timestamp=i + 1, fields={'field': i}))
+        writer.close()
+        self.assertEqual(sorted(r.timestamp for r in FakeConnector.written), [1, 2, 3, 4, 5])
+
+        # ...or journaled if the database isn't taking them
+        FakeConnector.written = []
+        writer = DatabaseWriter(queue_size=100, batch_interval=10,
+                                journal_file=journal_file, retry_interval=10)
+        FakeConnector.up = False
+        with self.assertLogs(level='WARNING'):
+            for i in range(5):
+                writer.write(DASRecord(timestamp=i + 1, fields={'field': i}))
+            writer.close(timeout=1)
+            writer.write(DASRecord(timestamp=6, fields={'field': 6}))
+        self.assertEqual(FakeConnector.written, [])
+        with open(journal_file) as journal:
+            self.assertEqual([DASRecord(json_str=line).timestamp for line in journal],
+                             [1, 2, 3, 4, 5, 6])
+
+    ############################
+    @mock.patch.multiple(database_writer, DATABASE_SETTINGS_FOUND=True,
+                         DATABASE_ENABLED=True, Connector=FakeConnector, create=True)
+    def test_connector_batching(self):
+        FakeConnector.up = True
+        FakeConnector.written = []
+
+        # Without a queue, batching is left to the connector
+        writer = DatabaseWriter(batch_size=10, batch_interval=0.5)
+        self.assertEqual(FakeConnector.kwargs['batch_size'], 10)
+        self.assertEqual(FakeConnector.kwargs['batch_interval'], 0.5)
+        DatabaseWriter()
+        self.assertNotIn('batch_size', FakeConnector.kwargs)
+
+        # Connector errors are logged, not raised
+        FakeConnector.up = False
+        with self.assertLogs(level='ERROR'):
+            writer.write(DASRecord(timestamp=1, fields={'field': 1}))
+        self.assertEqual(writer.dropped, 1)
+
+    ############################
+    @mock.patch.multiple(database_writer, DATABASE_SETTINGS_FOUND=True,
+                         DATABASE_ENABLED=True, Connector=FakeConnector, create=True)
+    def test_write_batch(self):
+        FakeConnector.up = True
+        batch = [DASRecord(timestamp=1, fields={'field': 1}),
+                 {'data_id': 'dict', 'timestamp': 2, 'fields': {'field': 2}},
+                 {'fields': {'field': [(3, 3), (4, 4)]}}]
+
+        # Without a queue, the whole batch goes to the connector at once...
+        FakeConnector.written = []
+        FakeConnector.batches = 0
+        writer = DatabaseWriter()
+        writer.write_batch(batch)
+        self.assertEqual(FakeConnector.batches, 1)
+        self.assertEqual([r.timestamp for r in FakeConnector.written], [1, 2, 3, 4])
+        self.assertEqual([r.fields['field'] for r in FakeConnector.written], [1, 2, 3, 4])
+
+        # ...and in write-behind mode, it's queued
+        FakeConnector.written = []
+        writer = DatabaseWriter(queue_size=10, batch_size=10, batch_interval=0.05)
+        writer.write_batch(batch)
+        self.assertTrue(writer.flush(timeout=1))
+        self.assertEqual([r.timestamp for r in FakeConnector.written], [1, 2, 3, 4])
+        writer.close()
+
+    ############################
+    @mock.patch.multiple(database_writer, DATABASE_SETTINGS_FOUND=True,
+                         DATABASE_ENABLED=True, Connector=PickyConnector, create=True)
+    def test_poison_record(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        journal_file = tmpdir.name + '/journal'
+        FakeConnector.up = True
+        poison = DASRecord(timestamp=0, fields={'field': 'poison'})
+        good = [DASRecord(timestamp=i + 1, fields={'field': i}) for i in range(38)]
+
+        # A bad record in write-behind mode doesn't hold up the rest...
+        FakeConnector.written = []
+        writer = DatabaseWriter(queue_size=100, batch_size=10, batch_interval=0.05,
+                                journal_file=journal_file, retry_interval=0.1)
+        with self.assertLogs(level='ERROR'):
+            writer.write(poison)
+            for record in good:
+                writer.write(record)
+            self.assertTrue(writer.flush(timeout=2))
+        writer.close()
+        self.assertEqual(FakeConnector.written, good)
+        self.assertEqual(writer.dropped, 1)
+        self.assertFalse(os.path.exists(journal_file))
+
+        # ...or journal replay...
+        with open(journal_file, 'w') as journal:
+            journal.write(''.join(r.as_json() + '\n' for r in [poison] + good))
+        FakeConnector.written = []
+        writer = DatabaseWriter(queue_size=100, batch_size=10, batch_interval=0.05,
+                                journal_file=journal_file, retry_interval=0.1)
+        with self.assertLogs(level='ERROR'):
+            for i in range(50):
+                if not os.path.exists(journal_file) and len(FakeConnector.written) == 38:
+                    break
+                time.sleep(0.05)
+        writer.close()
+        self.assertEqual([r.timestamp for r in FakeConnector.written], list(range(1, 39)))
+        self.assertFalse(os.path.exists(journal_file + '.replay'))
+
+        # ...or a batch written directly
+        FakeConnector.written = []
+        writer = DatabaseWriter()
+        with self.assertLogs(level='ERROR'):
+            writer.write_batch(good[:5] + [poison] + good[5:])
+        self.assertEqual(FakeConnector.written, good)
+        self.assertEqual(writer.dropped, 1)
+
     ############################
     @unittest.skipUnless(DATABASE_ENABLED, 'Skipping test of DatabaseWriter; '
                          'Database not configured in database/settings.py.')
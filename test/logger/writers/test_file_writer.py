@@ -62,6 +62,16 @@ class TestFileWriter(unittest.TestCase):
                 for line in SAMPLE_DATA:
                     self.assertEqual(line, f.readline().strip())
 
+    ############################
+    def test_write_batch(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            writer = self._cleanup_writer(FileWriter(tmpdirname + '/f'))
+            writer.write_batch(SAMPLE_DATA)
+            writer.write_batch([SAMPLE_DATA[0], None, ''])
+
+            with open(tmpdirname + '/f') as f:
+                self.assertEqual(f.read().splitlines(), SAMPLE_DATA + SAMPLE_DATA[:1])
+
     ############################
     def test_write_with_header(self):
         with tempfile.TemporaryDirectory() as tmpdirname:
@@ -8,6 +8,7 @@ import unittest
 from os.path import exists
 
 sys.path.append('.')
+from logger.utils import logfile_index, timestamp  # noqa: E402
 from logger.utils.das_record import DASRecord  # noqa: E402
 from logger.writers.logfile_writer import LogfileWriter  # noqa: E402
 
@@ -77,6 +78,51 @@ class TestLogfileWriter(unittest.TestCase):
                 for i in r:
                     self.assertEqual(lines[i], outfile.readline().rstrip())
 
+    ############################
+    def test_write_batch(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            lines = SAMPLE_DATA.split('\n')
+            filebase = tmpdirname + '/logfile'
+
+            writer = LogfileWriter(filebase)
+            writer.write_batch(lines[0:9])
+            self.assertTrue(writer.flush)
+
+            with open(filebase + '-2017-11-03', 'r') as outfile:
+                self.assertEqual(outfile.read().splitlines(), lines[0:3])
+            with open(filebase + '-2017-11-04', 'r') as outfile:
+                self.assertEqual(outfile.read().splitlines(), lines[3:9])
+
+    ############################
+    def test_write_index(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            lines = SAMPLE_DATA.split('\n')
+            filebase = tmpdirname + '/logfile'
+
+            writer = LogfileWriter(filebase, index_interval=2)
+            for line in lines[0:9]:
+                writer.write(line)
+
+            # Index entries point just past every second record, and note
+            # the timestamp of the record they follow.
+            for filename, file_lines in [(filebase + '-2017-11-03', lines[0:3]),
+                                         (filebase + '-2017-11-04', lines[3:9])]:
+                self.assertTrue(exists(logfile_index.index_filename(filename)))
+                with open(filename, 'rb') as outfile:
+                    data = outfile.read()
+                entries = logfile_index.read_index(filename)
+                self.assertEqual(len(entries), len(file_lines) // 2)
+                for i, (ts, offset) in enumerate(entries):
+                    line = file_lines[2 * i + 1]
+                    self.assertEqual(ts, timestamp.timestamp(line.split(' ')[0]))
+                    self.assertTrue(data[:offset].decode().endswith(line + '\n'))
+
+            # No index unless asked for
+            writer = LogfileWriter(tmpdirname + '/unindexed')
+            writer.write(lines[0])
+            self.assertFalse(exists(logfile_index.index_filename(
+                tmpdirname + '/unindexed-2017-11-03')))
+
     ############################
     def test_write_with_header(self):
         with tempfile.TemporaryDirectory() as tmpdirname:
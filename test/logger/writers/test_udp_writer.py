@@ -9,7 +9,10 @@ import threading
 import time
 import unittest
 
+from unittest import mock
+
 sys.path.append('.')
+from logger.writers import udp_writer  # noqa E402
 from logger.writers.udp_writer import UDPWriter  # noqa E402
 
 SAMPLE_DATA = ['f1 line 1',
@@ -206,6 +209,104 @@ class TestUDPWriter(unittest.TestCase):
                             '%s open?' % port)
         signal.alarm(0)
 
+    ############################
+    def test_fragmentation(self):
+        port = 8005
+        sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        sock.bind(('localhost', port))
+        sock.settimeout(1)
+
+        record = 'a' * 1014 + 'b' * 1014 + 'c' * 512
+        with mock.patch.object(udp_writer, 'MAXSIZE', 1024):
+            writer = UDPWriter(destination='localhost', port=port)
+            writer.write(record)
+            writer.write('b' * 2028)
+
+        marker = udp_writer.FRAGMENT_MARKER
+        self.assertEqual(sock.recv(65535), b'a' * 1014 + marker)
+        self.assertEqual(sock.recv(65535), b'b' * 1014 + marker)
+        self.assertEqual(sock.recv(65535), b'c' * 512)
+        self.assertEqual(sock.recv(65535), b'b' * 1014 + marker)
+        self.assertEqual(sock.recv(65535), b'b' * 1014)
+        sock.close()
+
+    ############################
+    def test_write_batch_coalesce(self):
+        port = 8006
+        sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        sock.bind(('localhost', port))
+        sock.settimeout(1)
+
+        with self.assertRaises(ValueError):
+            UDPWriter(destination='localhost', port=port, coalesce=True)
+
+        records = ['record %d' % i for i in range(100)]
+        with mock.patch.object(udp_writer, 'MAXSIZE', 100):
+            writer = UDPWriter(destination='localhost', port=port, eol='\\n', coalesce=True)
+            writer.write_batch(records[:50] + ['x' * 150] + records[50:])
+
+        received = b''
+        num_datagrams = 0
+        while len(received) < sum(len(r) + 1 for r in records) + 151:
+            datagram = sock.recv(65535)
+            self.assertLessEqual(len(datagram), 100)
+            received += datagram.replace(udp_writer.FRAGMENT_MARKER, b'')
+            num_datagrams += 1
+        sock.close()
+        self.assertEqual(received.decode().split('\n')[:-1],
+                         records[:50] + ['x' * 150] + records[50:])
+        self.assertLess(num_datagrams, 20)
+
+    ############################
+    def test_coalesce_max_datagram_size(self):
+        port = 8008
+        sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        sock.bind(('localhost', port))
+        sock.settimeout(1)
+
+        with self.assertRaises(ValueError):
+            UDPWriter(destination='localhost', port=port, eol='\\n', coalesce=True,
+                      max_datagram_size=0)
+
+        # Coalesced datagrams fit an Ethernet frame, even though the
+        # loopback interface would take far bigger ones...
+        records = ['record %03d' % i for i in range(400)]
+        big = 'x' * 2000
+        writer = UDPWriter(destination='localhost', port=port, eol='\\n', coalesce=True)
+        writer.write_batch(records[:200] + [big] + records[200:])
+
+        # ...but a record that's bigger on its own is sent whole
+        datagrams = []
+        received = b''
+        while len(received) < sum(len(r) + 1 for r in records) + len(big) + 1:
+            datagrams.append(sock.recv(65535))
+            received += datagrams[-1]
+        sock.close()
+        self.assertIn((big + '\n').encode(), datagrams)
+        self.assertTrue(all(len(datagram) <= udp_writer.MAX_DATAGRAM_SIZE
+                            for datagram in datagrams if datagram[0:1] != b'x'))
+        self.assertEqual(received.decode().split('\n')[:-1],
+                         records[:200] + [big] + records[200:])
+
+    ############################
+    def test_max_rate(self):
+        port = 8007
+        sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        sock.bind(('localhost', port))
+        sock.settimeout(1)
+
+        writer = UDPWriter(destination='localhost', port=port, max_rate=50)
+        start = time.monotonic()
+        writer.write_batch(SAMPLE_DATA * 4)
+        # 12 datagrams at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 11 / 50)
+        for line in SAMPLE_DATA * 4:
+            self.assertEqual(sock.recv(65535), line.encode())
+        sock.close()
+
+        with self.assertRaises(ValueError):
+            UDPWriter(destination='localhost', port=port, max_rate=0)
+
 
 ################################################################################
 if __name__ == '__main__':
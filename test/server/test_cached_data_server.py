@@ -2,17 +2,21 @@
 
 from os import environ
 import asyncio
+import collections
 import json
 import logging
 import sys
 import tempfile
 import time
 import unittest
+import unittest.mock
 import warnings
 import websockets
 
 sys.path.append('.')
-from server.cached_data_server import CachedDataServer  # noqa: E402
+from server.cached_data_server import CachedDataServer, RecordCache  # noqa: E402
+from server.disk_cache import DiskCache  # noqa: E402
+from logger.writers.cached_data_writer import CachedDataPublisher, CachedDataWriter  # noqa: E402
 
 # Django 3 doesn't play nicely when mixing sync and async, so when we
 # try to run the Django 'manage.py test' command, it gets unhappy
@@ -334,6 +338,198 @@ class TestCachedDataServer(unittest.TestCase):
         asyncio.new_event_loop().run_until_complete(run_test())
         time.sleep(1)
 
+    ############################
+    def test_incremental_disk_cache(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        disk_cache = tmpdir.name + '/disk_cache'
+        cache = RecordCache(capacity=10)
+        cache.load_from_disk(disk_cache)
+        cache.cache_record({'timestamp': 1, 'fields': {'field_1': 1.5, 'field_2': 'a'}})
+        cache.save_to_disk(disk_cache)
+
+        # Later saves only append the new values to the journal
+        cache.cache_record({'timestamp': 2, 'fields': {'field_1': 2.5}})
+        cache.save_to_disk(disk_cache)
+        with open(disk_cache + '/journal.1') as journal_file:
+            self.assertEqual([json.loads(line) for line in journal_file],
+                             [['field_1', 2.0, 2.5]])
+
+        reloaded = RecordCache(capacity=10)
+        reloaded.load_from_disk(disk_cache)
+        self.assertEqual(reloaded.data['field_1'].to_list(), [(1.0, 1.5), (2.0, 2.5)])
+        self.assertEqual(reloaded.data['field_2'].to_list(), [(1.0, 'a')])
+
+    ############################
+    def test_disk_cache_failure(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        disk_cache = tmpdir.name + '/disk_cache'
+        cache = RecordCache(capacity=10)
+        cache.load_from_disk(disk_cache)
+        cache.cache_record({'timestamp': 1, 'fields': {'field_1': 1.5}})
+        cache.save_to_disk(disk_cache)
+
+        # A failed save doesn't lose values or let unsaved ones pile up...
+        cache.cache_record({'timestamp': 2, 'fields': {'field_1': 2.5}})
+        with unittest.mock.patch.object(DiskCache, 'append', side_effect=OSError('full')):
+            with self.assertLogs(level='WARNING'):
+                cache.save_to_disk(disk_cache)
+        cache.cache_record({'timestamp': 3, 'fields': {'field_1': 3.5}})
+        self.assertEqual(cache.pending, {})
+
+        # ...and a later one catches up with a new snapshot
+        cache.save_to_disk(disk_cache)
+        cache.cache_record({'timestamp': 4, 'fields': {'field_1': 4.5}})
+        cache.save_to_disk(disk_cache)
+        reloaded = RecordCache(capacity=10)
+        reloaded.load_from_disk(disk_cache)
+        self.assertEqual(reloaded.data['field_1'].to_list(),
+                         [(1.0, 1.5), (2.0, 2.5), (3.0, 3.5), (4.0, 4.5)])
+
+    ############################
+    def test_shared_updates(self):
+        WEBSOCKET_PORT = 8771
+        cds = CachedDataServer(port=WEBSOCKET_PORT, interval=0.1)
+        cds.cache_record({'timestamp': 1, 'fields': {'shared_field': 'value_1'}})
+
+        async def subscribe(seconds):
+            ws = await websockets.connect('ws://localhost:%d' % WEBSOCKET_PORT)
+            await ws.send(json.dumps({'type': 'subscribe', 'interval': 0.1,
+                                      'fields': {'shared_field': {'seconds': seconds}}}))
+            await ws.recv()
+            return ws
+
+        async def ready(ws):
+            await ws.send(json.dumps({'type': 'ready'}))
+            return json.loads(await ws.recv())['data']
+
+        async def run_test():
+            await asyncio.sleep(0.05)
+            ws_1 = await subscribe(0)
+            ws_2 = await subscribe(time.time())
+            self.assertEqual(await ready(ws_1), {})
+            self.assertEqual(await ready(ws_2),
+                             {'shared_field': [[1.0, 'value_1']]})
+
+            # Both clients should get new values exactly once
+            for i in range(2, 5):
+                cds.cache_record({'timestamp': i,
+                                  'fields': {'shared_field': 'value_%d' % i}})
+                expected = {'shared_field': [[float(i), 'value_%d' % i]]}
+                self.assertEqual(await ready(ws_1), expected)
+                self.assertEqual(await ready(ws_2), expected)
+            self.assertEqual(await ready(ws_1), {})
+
+            # Slow client gets everything it missed
+            for i in range(5, 8):
+                cds.cache_record({'timestamp': i,
+                                  'fields': {'shared_field': 'value_%d' % i}})
+                await ready(ws_1)
+            self.assertEqual(await ready(ws_2),
+                             {'shared_field': [[float(i), 'value_%d' % i]
+                                               for i in range(5, 8)]})
+            await ws_1.close()
+            await ws_2.close()
+
+        asyncio.new_event_loop().run_until_complete(run_test())
+        time.sleep(1)
+
+    ############################
+    def test_batched_publish(self):
+        WEBSOCKET_PORT = 8772
+        cds = CachedDataServer(port=WEBSOCKET_PORT, max_records=0)
+
+        async def run_test():
+            await asyncio.sleep(0.05)
+            async with websockets.connect('ws://localhost:%d' % WEBSOCKET_PORT) as ws:
+                # Several publish messages in flight; one response apiece
+                await ws.send(json.dumps(
+                    {'type': 'publish',
+                     'data': [{'timestamp': 1, 'fields': {'batch_field': 1}},
+                              {'timestamp': 2, 'fields': {'batch_field': 2}}]}))
+                await ws.send(json.dumps(
+                    {'type': 'publish',
+                     'data': {'timestamp': 3, 'fields': {'batch_field': 3}}}))
+                await ws.send(json.dumps({'type': 'publish', 'data': [1, 2]}))
+                statuses = [json.loads(await ws.recv())['status'] for i in range(3)]
+                self.assertEqual(statuses, [200, 200, 400])
+
+        asyncio.new_event_loop().run_until_complete(run_test())
+        self.assertEqual(cds.cache.data['batch_field'].to_list(),
+                         [(1.0, 1), (2.0, 2), (3.0, 3)])
+
+        # Writers feeding the same server share a connection
+        writers = [CachedDataWriter(data_server='localhost:%d' % WEBSOCKET_PORT)
+                   for i in range(2)]
+        self.assertIs(writers[0].publisher, writers[1].publisher)
+        for i in range(5000):
+            writers[i % 2].write({'timestamp': 10 + i, 'fields': {'writer_field': i}})
+        for i in range(50):
+            field = cds.cache.data.get('writer_field')
+            if field and len(field) == 5000:
+                break
+            time.sleep(0.1)
+        self.assertEqual([value for timestamp, value in field.to_list()],
+                         list(range(5000)))
+
+    ############################
+    def test_requeue_unacknowledged(self):
+        # Nothing listening here, so the publisher won't send anything
+        publisher = CachedDataPublisher('localhost:1', max_backup=5)
+        publisher.queue.extend([5, 6, 7])
+        batches = collections.deque([[1, 2], [3, 4]])
+        publisher._requeue(batches)
+
+        # Unacknowledged records are older, so they're the ones dropped
+        self.assertEqual(list(publisher.queue), [3, 4, 5, 6, 7])
+        self.assertEqual(batches, collections.deque())
+
+    ############################
+    def test_downsampled_subscription(self):
+        WEBSOCKET_PORT = 8774
+        cds = CachedDataServer(port=WEBSOCKET_PORT, interval=0.1, max_records=0)
+        now = time.time()
+        start = now - now % 10 - 3600
+        for i in range(36000):  # an hour at 10 Hz
+            cds.cache_record({'timestamp': start + i / 10,
+                              'fields': {'ds_field': i % 100}})
+
+        async def run_test():
+            await asyncio.sleep(0.05)
+            async with websockets.connect('ws://localhost:%d' % WEBSOCKET_PORT) as ws:
+                await ws.send(json.dumps(
+                    {'type': 'subscribe',
+                     'fields': {'ds_field': {'seconds': 3600, 'max_points': 360,
+                                             'aggregate': 'min-max'}}}))
+                self.assertEqual(json.loads(await ws.recv())['status'], 200)
+
+                # Ten-second buckets, each with a min and max (the first
+                # may be cut short by the start of the hour)
+                await ws.send(json.dumps({'type': 'ready'}))
+                values = json.loads(await ws.recv())['data']['ds_field']
+                self.assertLessEqual(len(values), 2 * 361)
+                self.assertGreater(len(values), 2 * 355)
+                self.assertEqual([value for ts, value in values[2:6]], [0, 99, 0, 99])
+
+                # Later updates arrive a bucket at a time, once complete;
+                # the last bucket above was held back, as by the data's
+                # clock it hadn't yet ended
+                for offset, value in [(3605, 500), (3615, 7)]:
+                    cds.cache_record({'timestamp': start + offset,
+                                      'fields': {'ds_field': value}})
+                await ws.send(json.dumps({'type': 'ready'}))
+                self.assertEqual(json.loads(await ws.recv())['data'],
+                                 {'ds_field': [[start + 3590, 0],
+                                               [start + 35999 / 10, 99],
+                                               [start + 3605, 500]]})
+
+                # Bad aggregation requests are rejected
+                await ws.send(json.dumps(
+                    {'type': 'subscribe',
+                     'fields': {'ds_field': {'seconds': 60, 'aggregate': 'mean'}}}))
+                self.assertEqual(json.loads(await ws.recv())['status'], 400)
+
+        asyncio.new_event_loop().run_until_complete(run_test())
+
 
 ############################
 if __name__ == '__main__':
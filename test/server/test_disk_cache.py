@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+from array import array
+
+sys.path.append('.')
+from server import disk_cache as disk_cache_module  # noqa: E402
+from server.disk_cache import DiskCache  # noqa: E402
+from server.field_buffer import FieldBuffer  # noqa: E402
+
+
+class TestDiskCache(unittest.TestCase):
+
+    ############################
+    def test_journal_and_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = tmpdir + '/disk_cache'
+            disk_cache = DiskCache(path)
+            self.assertFalse(disk_cache.exists())
+
+            disk_cache.append([('f1', 1, 1.5), ('f2', 1, 'one')])
+            disk_cache.append([('f1', 2, 2.5)])
+            self.assertTrue(disk_cache.exists())
+
+            data = DiskCache(path).load()
+            self.assertEqual(data['f1'].to_list(), [(1.0, 1.5), (2.0, 2.5)])
+            self.assertEqual(data['f2'].to_list(), [(1.0, 'one')])
+
+            # Compacting replaces the journal with a snapshot
+            disk_cache.compact({field: buffer.arrays() for field, buffer in data.items()})
+            self.assertEqual(sorted(os.listdir(path)), ['snapshot'])
+            disk_cache.append([('f2', 3, {'three': 3})])
+            self.assertEqual(sorted(os.listdir(path)), ['journal.1', 'snapshot'])
+
+            reloaded = DiskCache(path)
+            data = reloaded.load(capacity=1)
+            self.assertEqual(reloaded.generation, 1)
+            self.assertEqual(data['f1'].to_list(), [(2.0, 2.5)])
+            self.assertEqual(data['f2'].to_list(), [(3.0, {'three': 3})])
+
+    ############################
+    def test_crash_recovery(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            disk_cache = DiskCache(tmpdir)
+            disk_cache.compact({'f1': FieldBuffer(pairs=[(1, 1.0)]).arrays()})
+            disk_cache.append([('f1', 2, 2.0)])
+
+            # A journal left behind by an earlier generation is ignored,
+            # as is a partially-written final entry.
+            with open(tmpdir + '/journal.0', 'w') as journal_file:
+                journal_file.write('["f1", 0, 0.0]\n')
+            with open(tmpdir + '/journal.1', 'a') as journal_file:
+                journal_file.write('["f1", 3, ')
+
+            with self.assertLogs(level='WARNING'):
+                data = DiskCache(tmpdir).load()
+            self.assertEqual(data['f1'].to_list(), [(1.0, 1.0), (2.0, 2.0)])
+            self.assertFalse(os.path.exists(tmpdir + '/journal.0'))
+
+    ############################
+    def test_needs_compaction(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            disk_cache = DiskCache(tmpdir)
+            disk_cache.MIN_COMPACT_BYTES = 100
+            disk_cache.append([('f1', 1, 1.0)])
+            self.assertFalse(disk_cache.needs_compaction())
+            disk_cache.append([('f1', i, float(i)) for i in range(2, 20)])
+            self.assertTrue(disk_cache.needs_compaction())
+            disk_cache.compact({})
+            self.assertFalse(disk_cache.needs_compaction())
+
+    ############################
+    def test_snapshot_format(self):
+        fields = {'f1': (array('d', [1, 2]), array('d', [1.5, 2.5])),
+                  'f2': (array('d', [3]), ['three'])}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = tmpdir + '/snapshot'
+            with open(filename, 'wb') as snapshot_file:
+                disk_cache_module.write_snapshot(snapshot_file, 7, fields)
+            with open(filename, 'rb') as snapshot_file:
+                self.assertEqual(disk_cache_module.read_snapshot(snapshot_file), (7, fields))
+
+            # Snapshots written on a machine of the other byte order
+            other_order = 'big' if sys.byteorder == 'little' else 'little'
+            with unittest.mock.patch.object(disk_cache_module.sys, 'byteorder', other_order):
+                with open(filename, 'rb') as snapshot_file:
+                    generation, swapped = disk_cache_module.read_snapshot(snapshot_file)
+            self.assertNotEqual(swapped['f1'][0], fields['f1'][0])
+            swapped['f1'][0].byteswap()
+            self.assertEqual(swapped['f1'][0], fields['f1'][0])
+
+            # Anything else, pickles included, is never executed, just ignored
+            with open(filename, 'wb') as snapshot_file:
+                pickle.dump({'generation': 1, 'fields': {}}, snapshot_file)
+            with self.assertLogs(level='WARNING'):
+                self.assertEqual(DiskCache(tmpdir).load(), {})
+
+            with open(filename, 'wb') as snapshot_file:
+                disk_cache_module.write_snapshot(snapshot_file, 7, fields)
+            with open(filename, 'r+b') as snapshot_file:
+                snapshot_file.truncate(os.path.getsize(filename) - 4)
+            with self.assertLogs(level='WARNING'):
+                DiskCache(tmpdir).load()
+
+
+if __name__ == '__main__':
+    unittest.main()
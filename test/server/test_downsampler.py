@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+sys.path.append('.')
+from server.downsampler import Downsampler, downsampler_from_spec  # noqa: E402
+
+
+class TestDownsampler(unittest.TestCase):
+
+    ############################
+    def test_aggregates(self):
+        pairs = [(0.0, 3), (1.0, 9), (2.0, 1), (3.0, 5),
+                 (10.0, 2), (11.0, 4), (20.0, 'x')]
+
+        last = Downsampler(10)
+        self.assertEqual(last.add(pairs), [(3.0, 5), (11.0, 4)])
+        mean = Downsampler(10, 'mean')
+        self.assertEqual(mean.add(pairs), [(5.0, 4.5), (15.0, 3.0)])
+        min_max = Downsampler(10, 'min-max')
+        self.assertEqual(min_max.add(pairs), [(1.0, 9), (2.0, 1), (10.0, 2), (11.0, 4)])
+
+        # Non-numeric buckets fall back to 'last'
+        self.assertEqual(mean.add([(21.0, 'y'), (22.0, 1.5)]), [])
+        self.assertEqual(mean.add([(30.0, 1.0)]), [(22.0, 1.5)])
+
+    ############################
+    def test_incremental(self):
+        downsampler = Downsampler(10, 'mean')
+
+        # Incomplete bucket is held until a later bucket starts...
+        self.assertEqual(downsampler.add([(100.0, 1.0), (104.0, 2.0)]), [])
+        self.assertEqual(downsampler.add([(109.0, 3.0)]), [])
+        self.assertEqual(downsampler.add([(111.0, 5.0)]), [(105.0, 2.0)])
+
+        # ...or the clock passes its end
+        self.assertEqual(downsampler.flush(119.0), [])
+        self.assertEqual(downsampler.flush(120.0), [(115.0, 5.0)])
+        self.assertEqual(downsampler.flush(130.0), [])
+
+    ############################
+    def test_past_timestamps(self):
+        # Replaying values timestamped long ago: buckets aren't sent just
+        # because the wall clock has passed their end...
+        downsampler = Downsampler(10, 'mean')
+        self.assertEqual(downsampler.add([(100.0, 1.0), (104.0, 2.0)], now=10000), [])
+        self.assertEqual(downsampler.flush(10001), [])
+        self.assertEqual(downsampler.add([(109.0, 3.0)], now=10002), [])
+        self.assertEqual(downsampler.flush(10002.5), [])
+
+        # ...but once the data's clock has, or a later bucket starts
+        self.assertEqual(downsampler.flush(10003), [(105.0, 2.0)])
+        self.assertEqual(downsampler.add([(111.0, 5.0)], now=10005), [])
+
+        # Each bucket is sent just once; late values are dropped
+        self.assertEqual(downsampler.add([(108.0, 9.0), (112.0, 7.0)], now=10006), [])
+        self.assertEqual(downsampler.add([(121.0, 1.0)], now=10007), [(115.0, 6.0)])
+        self.assertEqual(downsampler.add([(119.0, 1.0)], now=10008), [])
+        self.assertEqual(downsampler.flush(20000), [(125.0, 1.0)])
+
+        # Including values for a bucket that flush() has just sent
+        downsampler = Downsampler(10, 'mean')
+        self.assertEqual(downsampler.add([(1.0, 1.0), (2.0, 2.0)], now=2), [])
+        self.assertEqual(downsampler.flush(10.5), [(5.0, 1.5)])
+        self.assertEqual(downsampler.add([(9.9, 100.0)], now=10.6), [])
+        self.assertEqual(downsampler.flush(21), [])
+
+    ############################
+    def test_from_spec(self):
+        self.assertIsNone(downsampler_from_spec({'seconds': 3600}))
+        self.assertIsNone(downsampler_from_spec(None))
+
+        downsampler = downsampler_from_spec({'seconds': 3600, 'max_points': 800})
+        self.assertEqual((downsampler.interval, downsampler.aggregate), (4.5, 'last'))
+        downsampler = downsampler_from_spec({'seconds': 3600, 'max_points': 800,
+                                             'min_interval': 10, 'aggregate': 'mean'})
+        self.assertEqual((downsampler.interval, downsampler.aggregate), (10, 'mean'))
+
+        for bad_spec in [{'aggregate': 'mean'},
+                         {'min_interval': 5, 'aggregate': 'median'},
+                         {'min_interval': 'often'}]:
+            with self.assertRaises(ValueError):
+                downsampler_from_spec(bad_spec)
+
+
+if __name__ == '__main__':
+    unittest.main()
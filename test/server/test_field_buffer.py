@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import sys
+import unittest
+
+sys.path.append('.')
+from server.field_buffer import FieldBuffer  # noqa: E402
+
+
+class TestFieldBuffer(unittest.TestCase):
+
+    ############################
+    def test_basic(self):
+        buffer = FieldBuffer()
+        self.assertFalse(buffer)
+        for i in range(100):
+            buffer.append(i, i * 1.5)
+        self.assertEqual(len(buffer), 100)
+        self.assertEqual(buffer[0], (0.0, 0.0))
+        self.assertEqual(buffer[-1], (99.0, 148.5))
+        self.assertEqual(buffer[-2:], [(98.0, 147.0), (99.0, 148.5)])
+        self.assertEqual(list(buffer)[10], (10.0, 15.0))
+        self.assertEqual(buffer.since(97), [(98.0, 147.0), (99.0, 148.5)])
+        self.assertEqual(buffer.since(99), [])
+        with self.assertRaises(IndexError):
+            buffer[100]
+
+    ############################
+    def test_capacity(self):
+        buffer = FieldBuffer(capacity=10)
+        for i in range(25):
+            buffer.append(i, float(i))
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.to_list(), [(float(i), float(i)) for i in range(15, 25)])
+        self.assertEqual(buffer.since(22.5), [(23.0, 23.0), (24.0, 24.0)])
+        self.assertEqual(buffer.index_before(20), 5)
+        self.assertEqual(buffer.index_after(20), 6)
+
+    ############################
+    def test_mixed_values(self):
+        # Non-float values should come back exactly as they went in
+        buffer = FieldBuffer(capacity=4)
+        buffer.append(1, 1.5)
+        buffer.append(2, 2)
+        buffer.append(3, 'three')
+        buffer.append(4, {'four': 4})
+        buffer.append(5, None)
+        self.assertEqual(buffer.to_list(),
+                         [(2.0, 2), (3.0, 'three'), (4.0, {'four': 4}), (5.0, None)])
+        self.assertIs(type(buffer[0][1]), int)
+
+    ############################
+    def test_out_of_order(self):
+        buffer = FieldBuffer(capacity=5)
+        for ts in [1, 2, 4, 5, 3]:
+            buffer.append(ts, float(ts))
+        self.assertEqual([ts for ts, value in buffer], [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(buffer.since(3), [(4.0, 4.0), (5.0, 5.0)])
+
+    ############################
+    def test_cleanup(self):
+        buffer = FieldBuffer(pairs=[(i, i) for i in range(100)])
+
+        # Drop everything at or before 49
+        buffer.cleanup(oldest=49)
+        self.assertEqual(buffer[0], (50.0, 50))
+
+        # Truncate to max_records
+        buffer.cleanup(oldest=0, max_records=20)
+        self.assertEqual(len(buffer), 20)
+        self.assertEqual(buffer[0], (80.0, 80))
+
+        # Keep min_back_records even if they're too old
+        buffer.cleanup(oldest=1000, min_back_records=5)
+        self.assertEqual(len(buffer), 6)
+
+        # But always keep at least one
+        buffer.cleanup(oldest=1000)
+        self.assertEqual(buffer.to_list(), [(99.0, 99)])
+
+        # Appending after wrapping around should still work
+        for i in range(100, 150):
+            buffer.append(i, i)
+        self.assertEqual(len(buffer), 51)
+        self.assertEqual(buffer[-1], (149.0, 149))
+
+    ############################
+    def test_arrays(self):
+        # Wrapped-around numeric buffer round-trips through arrays()
+        buffer = FieldBuffer(capacity=5)
+        for i in range(8):
+            buffer.append(i, i * 0.5)
+        timestamps, values = buffer.arrays()
+        self.assertEqual(list(timestamps), [3.0, 4.0, 5.0, 6.0, 7.0])
+        copy = FieldBuffer.from_arrays(timestamps, values, capacity=3)
+        self.assertEqual(copy.to_list(), buffer[-3:])
+        copy.append(8, 4.0)
+        self.assertEqual(copy[-1], (8.0, 4.0))
+        self.assertEqual(len(copy), 3)
+
+        # As do non-float values
+        buffer = FieldBuffer()
+        buffer.append(1, 'one')
+        buffer.append(2, {'two': 2})
+        timestamps, values = buffer.arrays()
+        copy = FieldBuffer.from_arrays(timestamps, values)
+        self.assertEqual(copy.to_list(), [(1.0, 'one'), (2.0, {'two': 2})])
+        copy.append(3, 3)
+        self.assertEqual(copy.since(2), [(3.0, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
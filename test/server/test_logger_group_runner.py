@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import logging
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+
+sys.path.append('.')
+from logger.readers.reader import Reader  # noqa: E402
+from logger.readers.text_file_reader import TextFileReader  # noqa: E402
+from logger.writers.text_file_writer import TextFileWriter  # noqa: E402
+from server.logger_group_runner import LoggerGroupRunner, GroupedLoggerRunner  # noqa: E402
+from server.logger_supervisor import LoggerSupervisor  # noqa: E402
+
+SAMPLE_DATA = """Permission is hereby granted, free of charge, to any person
+obtaining a copy of this software and associated documentation files
+(the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge,
+publish, distribute, sublicense, and/or sell...""".split('\n')
+
+
+################################################################################
+class StuckReader(Reader):
+    """A reader whose read() never returns, and can't be woken."""
+    def read(self):
+        threading.Event().wait()
+
+
+################################################################################
+class TestLoggerGroupRunner(unittest.TestCase):
+    ############################
+    def setUp(self):
+        # To suppress resource warnings about unclosed files
+        warnings.simplefilter("ignore", ResourceWarning)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_dir_name = self.temp_dir.name
+        self.source_name = self.temp_dir_name + '/source.txt'
+        self.stderr_pattern = self.temp_dir_name + '/{logger}.stderr'
+
+        # Create the source file
+        writer = TextFileWriter(self.source_name)
+        for line in SAMPLE_DATA:
+            writer.write(line)
+
+    ############################
+    def config(self, name):
+        return {
+            'name': name,
+            'readers': {'class': 'TextFileReader',
+                        'kwargs': {'file_spec': self.source_name,
+                                   'interval': 0.01, 'tail': True}},
+            'writers': {'class': 'TextFileWriter',
+                        'kwargs': {'filename': self.dest_name(name)}}
+        }
+
+    ############################
+    def dest_name(self, name):
+        return self.temp_dir_name + '/' + name + '.txt'
+
+    ############################
+    def check_dest(self, name):
+        reader = TextFileReader(self.dest_name(name))
+        for line in SAMPLE_DATA:
+            self.assertEqual(line, reader.read())
+
+    ############################
+    def test_basic(self):
+        group = LoggerGroupRunner(name='group_0', stderr_file_pattern=self.stderr_pattern)
+        runners = [GroupedLoggerRunner(group, config=self.config(name), name=name)
+                   for name in ['logger_1', 'logger_2']]
+        for runner in runners:
+            runner.start()
+        time.sleep(1.0)
+
+        # Both loggers are running, in a single process
+        self.assertEqual(len(group), 2)
+        pid = group.process.pid
+        for runner in runners:
+            self.check_dest(runner.name)
+            self.assertTrue(runner.is_runnable())
+            self.assertTrue(runner.is_alive())
+            self.assertFalse(runner.is_failed())
+
+        # Stopping one logger leaves the other running
+        runners[0].quit()
+        self.assertFalse(runners[0].is_alive())
+        self.assertTrue(runners[1].is_alive())
+        self.assertEqual(group.process.pid, pid)
+
+        # If the process dies, its loggers are dead until restarted
+        group.process.kill()
+        group.process.join()
+        self.assertFalse(runners[1].is_alive())
+        runners[1].start()
+        time.sleep(0.5)
+        self.assertTrue(runners[1].is_alive())
+        self.assertNotEqual(group.process.pid, pid)
+
+        # Stopping the last logger stops the process
+        runners[1].quit()
+        self.assertFalse(runners[1].is_alive())
+        self.assertIsNone(group.process)
+
+    ############################
+    def test_logger_exits(self):
+        # A logger whose reader runs out of input exits and is reported
+        # as dead, without affecting the others in its group.
+        group = LoggerGroupRunner(name='group_0', stderr_file_pattern=self.stderr_pattern)
+        config = self.config('short')
+        config['readers']['kwargs'] = {'file_spec': self.source_name}
+        short = GroupedLoggerRunner(group, config=config, name='short')
+        tail = GroupedLoggerRunner(group, config=self.config('tail'), name='tail')
+        short.start()
+        tail.start()
+        time.sleep(1.0)
+
+        self.check_dest('short')
+        self.assertFalse(short.is_alive())
+        self.assertTrue(tail.is_alive())
+        short.quit()
+        tail.quit()
+
+    ############################
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.05)
+        return condition()
+
+    ############################
+    def test_blocked_reader(self):
+        # A logger waiting on a quiet UDP port is woken when stopped, and
+        # lets go of the port in time for its replacement to use it.
+        port = 8011
+        group = LoggerGroupRunner(name='group_0', stderr_file_pattern=self.stderr_pattern)
+        configs = [{'name': 'udp_' + mode,
+                    'readers': {'class': 'UDPReader',
+                                'kwargs': {'interface': 'localhost', 'port': port}},
+                    'writers': {'class': 'TextFileWriter',
+                                'kwargs': {'filename': self.dest_name(mode)}}}
+                   for mode in ['old', 'new']]
+        old = GroupedLoggerRunner(group, config=configs[0], name='udp')
+        tail = GroupedLoggerRunner(group, config=self.config('tail'), name='tail')
+        old.start()
+        tail.start()
+        time.sleep(0.5)
+        pid = group.process.pid
+
+        new = GroupedLoggerRunner(group, config=configs[1], name='udp')
+        old.quit()
+        new.start()
+        time.sleep(0.5)
+        self.assertTrue(new.is_alive())
+        self.assertEqual(group.process.pid, pid)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(b'hello', ('localhost', port))
+        self.assertTrue(self.wait_for(lambda: TextFileReader(self.dest_name('new')).read()))
+        self.assertEqual(TextFileReader(self.dest_name('new')).read(), 'hello')
+        new.quit()
+        tail.quit()
+
+    ############################
+    def test_stuck_reader(self):
+        # If a logger won't stop, the group gets a fresh process before
+        # it's started again, and the other loggers come along too.
+        group = LoggerGroupRunner(name='group_0', stderr_file_pattern=self.stderr_pattern,
+                                  stop_timeout=0.5)
+        config = {'name': 'stuck',
+                  'readers': {'class': 'StuckReader',
+                              'module': 'test.server.test_logger_group_runner'},
+                  'writers': {'class': 'TextFileWriter'}}
+        stuck = GroupedLoggerRunner(group, config=config, name='stuck')
+        tail = GroupedLoggerRunner(group, config=self.config('tail'), name='tail')
+        stuck.start()
+        tail.start()
+        time.sleep(0.5)
+        pid = group.process.pid
+        self.assertTrue(stuck.is_alive())
+
+        stuck.start()
+        self.assertTrue(self.wait_for(lambda: stuck.is_alive()
+                                      and group.process.pid != pid))
+        time.sleep(0.5)
+        self.assertTrue(stuck.is_alive())
+        self.assertTrue(tail.is_alive())
+        self.check_dest('tail')
+        stuck.quit()
+        tail.quit()
+        self.assertIsNone(group.process)
+
+    ############################
+    def test_supervisor(self):
+        configs = {name: self.config(name) for name in ['a', 'b', 'c']}
+        configs['d'] = {'name': 'off'}
+        supervisor = LoggerSupervisor(configs=configs, group_size=2,
+                                      stderr_file_pattern=self.stderr_pattern)
+        supervisor.update_configs()
+        time.sleep(1.0)
+
+        # The three runnable loggers are split between two processes
+        self.assertEqual([len(group) for group in supervisor.groups], [2, 1])
+        status = supervisor.get_status()
+        for name in ['a', 'b', 'c']:
+            self.check_dest(name)
+            self.assertEqual(status[name]['status'], 'RUNNING')
+        self.assertEqual(status['d']['status'], 'EXITED')
+
+        # Stopping one and starting another reuses the group slot
+        del configs['a']
+        configs['e'] = self.config('e')
+        supervisor.update_configs(configs)
+        time.sleep(1.0)
+        self.assertEqual(len(supervisor.groups), 2)
+        self.check_dest('e')
+        self.assertEqual(supervisor.get_status()['e']['status'], 'RUNNING')
+
+        supervisor.quit()
+        for group in supervisor.groups:
+            self.assertIsNone(group.process)
+
+
+################################################################################
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-v', '--verbosity', dest='verbosity',
+                        default=0, action='count',
+                        help='Increase output verbosity')
+    args = parser.parse_args()
+
+    LOGGING_FORMAT = '%(asctime)-15s %(message)s'
+    logging.basicConfig(format=LOGGING_FORMAT)
+
+    LOG_LEVELS = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG}
+    args.verbosity = min(args.verbosity, max(LOG_LEVELS))
+    logging.getLogger().setLevel(LOG_LEVELS[args.verbosity])
+
+    unittest.main(warnings='ignore')
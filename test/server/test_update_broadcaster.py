@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+import unittest
+
+sys.path.append('.')
+from server.update_broadcaster import UpdateBroadcaster  # noqa: E402
+
+
+class TestUpdateBroadcaster(unittest.TestCase):
+
+    ############################
+    def test_basic(self):
+        broadcaster = UpdateBroadcaster()
+
+        # Not subscribed - no values kept
+        broadcaster.add('f1', 1.0, 'a')
+        self.assertIsNone(broadcaster.get_update('f1', 0))
+
+        broadcaster.subscribe('f1', 1.0)
+        self.assertEqual(broadcaster.get_update('f1', 1.0), ('[]', 1.0))
+        broadcaster.add('f1', 2.0, 'b')
+        broadcaster.add('f1', 3.0, 'c')
+
+        # Two clients at the same point share the same serialized text
+        text_1, latest_1 = broadcaster.get_update('f1', 1.0)
+        text_2, latest_2 = broadcaster.get_update('f1', 1.0)
+        self.assertIs(text_1, text_2)
+        self.assertEqual(json.loads(text_1), [[2.0, 'b'], [3.0, 'c']])
+        self.assertEqual(latest_1, 3.0)
+
+        # A client that is a segment behind gets both segments stitched
+        broadcaster.add('f1', 4.0, 'd')
+        self.assertEqual(json.loads(broadcaster.get_update('f1', 3.0)[0]),
+                         [[4.0, 'd']])
+        broadcaster.add('f1', 5.0, 'e')
+        text, latest = broadcaster.get_update('f1', 1.0)
+        self.assertEqual(json.loads(text),
+                         [[2.0, 'b'], [3.0, 'c'], [4.0, 'd'], [5.0, 'e']])
+        self.assertEqual(latest, 5.0)
+
+        # Asking from the middle of a segment, or before we started
+        # keeping values, means caller must go to the cache.
+        self.assertIsNone(broadcaster.get_update('f1', 2.0))
+        self.assertIsNone(broadcaster.get_update('f1', 0))
+
+        # Values are dropped once the last subscriber goes away
+        broadcaster.subscribe('f1')
+        broadcaster.unsubscribe('f1')
+        self.assertEqual(broadcaster.get_update('f1', 5.0), ('[]', 5.0))
+        broadcaster.unsubscribe('f1')
+        self.assertIsNone(broadcaster.get_update('f1', 5.0))
+
+    ############################
+    def test_max_segments(self):
+        broadcaster = UpdateBroadcaster(max_segments=3)
+        broadcaster.subscribe('f1')
+        for i in range(1, 6):
+            broadcaster.add('f1', float(i), i)
+            broadcaster.seal('f1')
+        self.assertIsNone(broadcaster.get_update('f1', 1.0))
+        text, latest = broadcaster.get_update('f1', 2.0)
+        self.assertEqual(json.loads(text), [[3.0, 3], [4.0, 4], [5.0, 5]])
+
+    ############################
+    def test_out_of_order(self):
+        broadcaster = UpdateBroadcaster()
+        broadcaster.subscribe('f1')
+        broadcaster.add('f1', 2.0, 'b')
+        broadcaster.add('f1', 1.0, 'a')
+        self.assertIsNone(broadcaster.get_update('f1', 0))
+        broadcaster.add('f1', 3.0, 'c')
+        self.assertEqual(broadcaster.get_update('f1', 2.0), ('[[3.0, "c"]]', 3.0))
+
+
+if __name__ == '__main__':
+    unittest.main()